@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "core"
+
+    def ready(self):
+        # Registra os signals que mantêm o saldo dos editais, publicam as notificações
+        # e invalidam o cache de usuários da sessão e o catálogo de atividades.
+        from . import backends, catalogo, notificacoes, saldo  # noqa: F401
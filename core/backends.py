@@ -1,6 +1,17 @@
 # core/backends.py
+from django.conf import settings
 from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import ServidorProfile, Unidade
+
+
+def _chave_usuario(user_id):
+    return f"auth:usuario:{user_id}"
+
 
 class ProfileStatusBackend(ModelBackend):
     def authenticate(self, request, username=None, password=None, **kwargs):
@@ -22,7 +33,40 @@ class ProfileStatusBackend(ModelBackend):
 
     def get_user(self, user_id):
         # Esta função é necessária para o sistema de sessão do Django.
+        # O perfil e a unidade vêm no mesmo JOIN: decorators, views e base.html leem
+        # request.user.servidorprofile em toda requisição.
+        timeout = settings.AUTH_USUARIO_CACHE_TIMEOUT
+        if timeout:
+            user = cache.get(_chave_usuario(user_id))
+            if user is not None:
+                return user
         try:
-            return User.objects.get(pk=user_id)
+            user = User.objects.select_related('servidorprofile__unidade').get(pk=user_id)
         except User.DoesNotExist:
-            return None
\ No newline at end of file
+            return None
+        if timeout:
+            cache.set(_chave_usuario(user_id), user, timeout)
+        return user
+
+
+def invalidar_usuario(user_id):
+    """Remove o usuário do cache de sessão (AUTH_USUARIO_CACHE_TIMEOUT)."""
+    cache.delete(_chave_usuario(user_id))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidar_ao_salvar_usuario(sender, instance, **kwargs):
+    invalidar_usuario(instance.pk)
+
+
+@receiver(post_save, sender=ServidorProfile)
+@receiver(post_delete, sender=ServidorProfile)
+def invalidar_ao_salvar_perfil(sender, instance, **kwargs):
+    invalidar_usuario(instance.user_id)
+
+
+@receiver(post_save, sender=Unidade)
+def invalidar_ao_salvar_unidade(sender, instance, **kwargs):
+    for user_id in ServidorProfile.objects.filter(unidade=instance).values_list('user_id', flat=True):
+        invalidar_usuario(user_id)
@@ -0,0 +1,204 @@
+# core/benchmark.py
+"""
+Benchmark de ponta a ponta das principais telas, pelo cliente de testes do Django.
+
+Cada cenário é uma requisição (com o usuário do papel certo já logado) repetida N vezes:
+mede a latência (p50/p95/p99/máx), o número de consultas SQL e o pico de memória Python
+de uma requisição. Os resultados podem ser gravados em JSON e comparados com uma linha
+de base anterior; `comparar` aponta os cenários que pioraram além da tolerância.
+
+Quem chama precisa do ambiente de testes ativo (setup_test_environment) e de um banco
+com dados, normalmente gerado por core/carga.py: ver o comando benchmark_requests.
+"""
+import shutil
+import time
+import tracemalloc
+from collections import namedtuple
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .models import Edital
+from .relatorios import diretorio_cache
+
+# Quantidades da carga gerada pelo benchmark (ver core/carga.py)
+QUANTIDADES_BENCHMARK = {
+    'unidades': 10,
+    'servidores': 300,
+    'demandantes': 10,
+    'editais': 60,
+    'atividades_por_edital': 4,
+    'alocacoes_por_atividade': 10,
+    'lancamentos': 20000,
+    'notificacoes': 5000,
+}
+
+# `preparar` roda antes de cada requisição (fora da medição); `iteracoes_max` limita os cenários caros
+Cenario = namedtuple('Cenario', ['nome', 'papel', 'metodo', 'url', 'dados', 'preparar', 'iteracoes_max'])
+
+
+def _esvaziar_cache_de_pdfs():
+    # Mede a geração do PDF, não a leitura do arquivo já pronto
+    shutil.rmtree(diretorio_cache(), ignore_errors=True)
+
+
+def escolher_alvos():
+    """
+    Escolhe os usuários e o edital mais carregados do banco: o servidor e a unidade
+    demandante com mais lançamentos, um usuário da PRODGEP e o edital com mais lançamentos.
+    """
+    usuarios = User.objects.filter(servidorprofile__status='Homologado')
+    alvos = {
+        'servidor': usuarios.filter(servidorprofile__funcao='Servidor')
+        .annotate(total=Count('lancamentos')).order_by('-total', 'pk').first(),
+        'demandante': usuarios.filter(servidorprofile__funcao='Unidade Demandante')
+        .annotate(total=Count('editais_criados__lancamentos')).order_by('-total', 'pk').first(),
+        'prodgep': usuarios.filter(servidorprofile__funcao='PRODGEP/PROPEG').order_by('pk').first(),
+        'edital': Edital.objects.annotate(total=Count('lancamentos')).order_by('-total', 'pk').first(),
+    }
+    alvos['atividade'] = (
+        alvos['servidor'].atividades_alocadas.order_by('pk').first() if alvos['servidor'] else None
+    )
+    return alvos
+
+
+def montar_cenarios(alvos):
+    """Monta os cenários possíveis com os alvos encontrados (sem servidor, por exemplo, não há lançar horas)."""
+    cenarios = []
+    if alvos['servidor']:
+        cenarios += [
+            Cenario('lancar_horas_get', 'servidor', 'get', reverse('lancar_horas'), None, None, None),
+            Cenario('historico_lancamentos', 'servidor', 'get', reverse('historico_lancamentos'), None, None, None),
+            Cenario('notificacoes_nao_lidas', 'servidor', 'get', reverse('get_notificacoes_nao_lidas'), None, None, None),
+            Cenario('marcar_notificacoes_como_lidas', 'servidor', 'post',
+                    reverse('marcar_notificacoes_como_lidas'), {}, None, None),
+        ]
+    if alvos['atividade']:
+        cenarios.append(Cenario('lancar_horas_post', 'servidor', 'post', reverse('lancar_horas'), {
+            'atividade_id': alvos['atividade'].pk,
+            'data': date.today().isoformat(),
+            'horas': '00:15',
+            'descricao_justificativa': 'Lançamento do benchmark.',
+        }, None, None))
+    if alvos['demandante']:
+        cenarios.append(Cenario('aprovar_horas', 'demandante', 'get', reverse('aprovar_horas'), None, None, None))
+    if alvos['prodgep']:
+        cenarios += [
+            Cenario('auditoria_horas', 'prodgep', 'get', reverse('auditoria_horas'), None, None, None),
+            Cenario('homologar_editais', 'prodgep', 'get', reverse('homologar_editais'), None, None, None),
+            Cenario('exportar_auditoria_pdf', 'prodgep', 'get', reverse('exportar_auditoria_pdf'),
+                    None, _esvaziar_cache_de_pdfs, 3),
+        ]
+        if alvos['edital']:
+            cenarios.append(Cenario('exportar_edital_pdf', 'prodgep', 'get',
+                                    reverse('exportar_edital_pdf', args=[alvos['edital'].pk]),
+                                    None, _esvaziar_cache_de_pdfs, 5))
+    return cenarios
+
+
+def _requisitar(cliente, cenario):
+    if cenario.preparar:
+        cenario.preparar()
+    inicio = time.perf_counter()
+    if cenario.metodo == 'post':
+        response = cliente.post(cenario.url, cenario.dados)
+    else:
+        response = cliente.get(cenario.url)
+    # O corpo faz parte da medição: respostas em streaming só são geradas ao serem lidas
+    if response.streaming:
+        b''.join(response.streaming_content)
+    response.close()
+    return time.perf_counter() - inicio, response.status_code
+
+
+def percentil(valores, p):
+    """Percentil pelo método do posto mais próximo (valores já em qualquer ordem)."""
+    ordenados = sorted(valores)
+    posto = max(1, -(-len(ordenados) * p // 100))
+    return ordenados[int(posto) - 1]
+
+
+def medir_cenario(cliente, cenario, iteracoes):
+    """
+    Uma requisição de aquecimento, `iteracoes` cronometradas e uma instrumentada, que
+    conta as consultas e o pico de memória (separada para não distorcer a latência).
+    """
+    iteracoes = min(iteracoes, cenario.iteracoes_max or iteracoes)
+    _, status = _requisitar(cliente, cenario)
+    status_vistos = {status}
+
+    tempos = []
+    for _ in range(iteracoes):
+        segundos, status = _requisitar(cliente, cenario)
+        tempos.append(segundos * 1000)
+        status_vistos.add(status)
+
+    tracemalloc.start()
+    try:
+        with CaptureQueriesContext(connection) as consultas:
+            _, status = _requisitar(cliente, cenario)
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    status_vistos.add(status)
+
+    return {
+        'iteracoes': iteracoes,
+        'p50_ms': round(percentil(tempos, 50), 2),
+        'p95_ms': round(percentil(tempos, 95), 2),
+        'p99_ms': round(percentil(tempos, 99), 2),
+        'max_ms': round(max(tempos), 2),
+        'consultas': len(consultas),
+        'pico_memoria_kb': round(pico / 1024, 1),
+        'status': sorted(status_vistos),
+    }
+
+
+def executar(iteracoes=20, nomes=None, relatar=None):
+    """
+    Roda os cenários (todos, ou só os de `nomes`) contra o banco atual e retorna
+    {cenario: métricas}. `relatar(nome, metricas)` recebe cada cenário concluído.
+    """
+    alvos = escolher_alvos()
+    clientes = {}
+    resultados = {}
+    for cenario in montar_cenarios(alvos):
+        if nomes and cenario.nome not in nomes:
+            continue
+        if cenario.papel not in clientes:
+            clientes[cenario.papel] = Client()
+            clientes[cenario.papel].force_login(alvos[cenario.papel])
+        resultados[cenario.nome] = medir_cenario(clientes[cenario.papel], cenario, iteracoes)
+        if relatar:
+            relatar(cenario.nome, resultados[cenario.nome])
+    return resultados
+
+
+def comparar(atual, baseline, tolerancia_latencia=25, tolerancia_memoria=25, tolerancia_consultas=0, folga_ms=5):
+    """
+    Compara os cenários medidos com a linha de base e retorna a lista de regressões
+    (mensagens). Latência (p95) e memória são toleradas em porcentagem; a latência ganha
+    ainda uma folga absoluta em ms, para não acusar ruído nas telas rápidas. Consultas
+    são toleradas em número absoluto. Cenários ausentes da linha de base são ignorados.
+    """
+    regressoes = []
+    for nome, metricas in atual.items():
+        base = baseline.get(nome)
+        if base is None:
+            continue
+        limite = base['p95_ms'] * (1 + tolerancia_latencia / 100) + folga_ms
+        if metricas['p95_ms'] > limite:
+            regressoes.append(f"{nome}: p95 {metricas['p95_ms']} ms > {limite:.2f} ms (base {base['p95_ms']} ms)")
+        if metricas['consultas'] > base['consultas'] + tolerancia_consultas:
+            regressoes.append(f"{nome}: {metricas['consultas']} consultas (base {base['consultas']})")
+        limite = base['pico_memoria_kb'] * (1 + tolerancia_memoria / 100)
+        if metricas['pico_memoria_kb'] > limite:
+            regressoes.append(
+                f"{nome}: pico de memória {metricas['pico_memoria_kb']} KB > {limite:.1f} KB (base {base['pico_memoria_kb']} KB)"
+            )
+    return regressoes
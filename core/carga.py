@@ -0,0 +1,261 @@
+# core/carga.py
+"""
+Geração de dados sintéticos em volume de produção, para testes de carga e benchmarks.
+
+Tudo é inserido com bulk_create em lotes, sem passar pelos signals (criação de perfil,
+saldo dos editais, resumos, notificações) e com a senha criptografada uma única vez.
+No final, os contadores mantidos por signals (SaldoEdital, HorasServidorAno e os
+resumos dos painéis) são reconstruídos de uma vez a partir dos dados, pelas mesmas
+rotinas dos comandos rebuild_*.
+
+Com a mesma semente e as mesmas quantidades, os dados gerados são sempre os mesmos
+(as datas são relativas ao dia da carga).
+Os nomes de usuário e números de edital levam um prefixo, para que várias cargas
+possam conviver no mesmo banco.
+"""
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from .models import (
+    Atividade, Edital, LancamentoHoras, Notificacao, ServidorProfile, TipoAtividade, Unidade
+)
+from .resumos import verificar_resumos
+from .saldo import verificar_horas_servidores, verificar_saldos
+
+# Distribuição dos status dos editais e dos lançamentos (pesos relativos)
+STATUS_EDITAIS = {'Homologado': 60, 'Ativo': 20, 'Aguardando Homologação': 10, 'Rascunho': 5, 'Finalizado': 5}
+STATUS_LANCAMENTOS = {'Homologado': 35, 'Aprovado': 30, 'Pendente': 20, 'Recusado': 10, 'Revertido': 5}
+
+# Prefixo do username de cada função
+PAPEIS = {'Servidor': 'servidor', 'Unidade Demandante': 'demandante', 'PRODGEP/PROPEG': 'prodgep'}
+
+PADROES = {
+    'unidades': 20,
+    'servidores': 2000,
+    'demandantes': 40,
+    'editais': 400,
+    'atividades_por_edital': 5,
+    'alocacoes_por_atividade': 15,
+    'lancamentos': 200000,
+    'notificacoes': 100000,
+}
+
+
+def _em_lotes(itens, tamanho_lote):
+    lote = []
+    for item in itens:
+        lote.append(item)
+        if len(lote) == tamanho_lote:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def _sorteador(pesos, rng):
+    valores, pesos = list(pesos), list(pesos.values())
+    return lambda: rng.choices(valores, weights=pesos)[0]
+
+
+def gerar_carga(semente=42, prefixo='carga', tamanho_lote=5000, senha='password123', anos=3, relatar=None, **quantidades):
+    """
+    Popula o banco com as quantidades pedidas (as ausentes usam PADROES) e retorna um
+    dicionário {tabela: linhas criadas}. `relatar(mensagem)` recebe o andamento.
+    """
+    quantidades = {**PADROES, **quantidades}
+    relatar = relatar or (lambda mensagem: None)
+    rng = random.Random(semente)
+    criados = {}
+    # Editais espalhados pelos últimos `anos` anos
+    inicio_periodo = date.today() - timedelta(days=365 * anos)
+
+    def etapa(nome, funcao):
+        inicio = time.perf_counter()
+        with transaction.atomic():
+            criados[nome] = funcao()
+        relatar(f"{nome}: {criados[nome]} em {time.perf_counter() - inicio:.1f}s")
+
+    # --- Unidades ---
+    unidades = []
+
+    def criar_unidades():
+        unidades.extend(Unidade.objects.bulk_create([
+            Unidade(sigla=f"{prefixo[:12].upper()}-{i + 1}", nome=f"Unidade {i + 1} ({prefixo})")
+            for i in range(quantidades['unidades'])
+        ], batch_size=tamanho_lote))
+        return len(unidades)
+
+    etapa('unidades', criar_unidades)
+
+    # --- Usuários e perfis (sem o signal que cria o perfil) ---
+    servidores, demandantes = [], []
+
+    def criar_usuarios():
+        senha_criptografada = make_password(senha)
+        perfis = [('Servidor', i) for i in range(quantidades['servidores'])]
+        perfis += [('Unidade Demandante', i) for i in range(quantidades['demandantes'])]
+        perfis.append(('PRODGEP/PROPEG', 0))
+
+        total = 0
+        for lote in _em_lotes(perfis, tamanho_lote):
+            usuarios = User.objects.bulk_create([
+                User(
+                    username=f"{prefixo}_{PAPEIS[funcao]}_{i + 1}",
+                    password=senha_criptografada,
+                    first_name=PAPEIS[funcao].title(),
+                    last_name=f"Carga {i + 1}",
+                )
+                for funcao, i in lote
+            ])
+            ServidorProfile.objects.bulk_create([
+                ServidorProfile(
+                    user=usuario,
+                    funcao=funcao,
+                    status='Homologado',
+                    unidade=rng.choice(unidades) if unidades else None,
+                    # Espaço suficiente para os lançamentos de vários anos
+                    limite_horas_anual=100000,
+                )
+                for usuario, (funcao, _) in zip(usuarios, lote)
+            ])
+            for usuario, (funcao, _) in zip(usuarios, lote):
+                if funcao == 'Servidor':
+                    servidores.append(usuario.pk)
+                elif funcao == 'Unidade Demandante':
+                    demandantes.append(usuario.pk)
+            total += len(usuarios)
+        return total
+
+    etapa('usuarios', criar_usuarios)
+
+    # --- Editais ---
+    editais = []
+
+    def criar_editais():
+        if not demandantes:
+            return 0
+        status_edital = _sorteador(STATUS_EDITAIS, rng)
+        for lote in _em_lotes(range(quantidades['editais']), tamanho_lote):
+            novos = []
+            for i in lote:
+                data_inicio = inicio_periodo + timedelta(days=rng.randrange(365 * anos))
+                novos.append(Edital(
+                    numero_edital=f"{i + 1:06d}/{prefixo}"[:50],
+                    titulo=f"Edital de carga {i + 1}",
+                    unidade_demandante_nome=f"Unidade {i % max(quantidades['unidades'], 1) + 1}",
+                    data_inicio=data_inicio,
+                    data_fim=data_inicio + timedelta(days=rng.randint(30, 365)),
+                    status=status_edital(),
+                    valor_empenho=Decimal(rng.randrange(100000, 10000000)),
+                    criado_por_id=demandantes[i % len(demandantes)],
+                ))
+            editais.extend(Edital.objects.bulk_create(novos))
+        return len(editais)
+
+    etapa('editais', criar_editais)
+
+    # --- Atividades e alocações ---
+    atividades = []  # (pk, edital, [servidores alocados])
+
+    def criar_atividades():
+        tipos = list(TipoAtividade.objects.values_list('pk', flat=True))
+        if not tipos:
+            tipos = [TipoAtividade.objects.create(grupo='Banca', nome=f'Atividade de carga ({prefixo})', valor_hora=25).pk]
+        por_atividade = min(quantidades['alocacoes_por_atividade'], len(servidores))
+        novas = [
+            (edital, Atividade(tipo_id=rng.choice(tipos), edital_id=edital.pk, descricao='Atividade gerada para teste de carga'))
+            for edital in editais
+            for _ in range(quantidades['atividades_por_edital'])
+        ]
+        for lote in _em_lotes(novas, tamanho_lote):
+            Atividade.objects.bulk_create([atividade for _, atividade in lote])
+            for edital, atividade in lote:
+                atividades.append((atividade.pk, edital, rng.sample(servidores, por_atividade)))
+        return len(atividades)
+
+    def criar_alocacoes():
+        Alocacao = Atividade.servidores_alocados.through
+        alocacoes = (
+            Alocacao(atividade_id=atividade_id, user_id=servidor_id)
+            for atividade_id, _, alocados in atividades
+            for servidor_id in alocados
+        )
+        total = 0
+        for lote in _em_lotes(alocacoes, tamanho_lote):
+            Alocacao.objects.bulk_create(lote)
+            total += len(lote)
+        return total
+
+    etapa('atividades', criar_atividades)
+    etapa('alocacoes', criar_alocacoes)
+
+    # --- Lançamentos (gerados sob demanda, um lote por vez na memória) ---
+    def criar_lancamentos():
+        com_alocados = [atividade for atividade in atividades if atividade[2]]
+        if not com_alocados:
+            return 0
+        status_lancamento = _sorteador(STATUS_LANCAMENTOS, rng)
+
+        def lancamentos():
+            for _ in range(quantidades['lancamentos']):
+                atividade_id, edital, alocados = rng.choice(com_alocados)
+                status = status_lancamento()
+                # Sempre dentro da vigência do edital
+                dias_de_vigencia = (edital.data_fim - edital.data_inicio).days
+                yield LancamentoHoras(
+                    servidor_id=rng.choice(alocados),
+                    edital_id=edital.pk,
+                    atividade_id=atividade_id,
+                    data=edital.data_inicio + timedelta(days=rng.randint(0, dias_de_vigencia)),
+                    horas=Decimal(rng.randint(2, 32)) / 4,
+                    descricao_justificativa='Lançamento gerado para teste de carga.',
+                    status=status,
+                    comentario_recusa='Recusado na carga de teste.' if status == 'Recusado' else '',
+                    validado_por_id=None if status == 'Pendente' else edital.criado_por_id,
+                )
+
+        total = 0
+        for lote in _em_lotes(lancamentos(), tamanho_lote):
+            LancamentoHoras.objects.bulk_create(lote)
+            total += len(lote)
+        return total
+
+    etapa('lancamentos', criar_lancamentos)
+
+    # --- Notificações ---
+    def criar_notificacoes():
+        destinatarios = servidores + demandantes
+        if not destinatarios:
+            return 0
+        notificacoes = (
+            Notificacao(
+                usuario_id=rng.choice(destinatarios),
+                mensagem=f'Notificação de carga {i + 1}.',
+                lida=rng.random() < 0.8,
+            )
+            for i in range(quantidades['notificacoes'])
+        )
+        total = 0
+        for lote in _em_lotes(notificacoes, tamanho_lote):
+            Notificacao.objects.bulk_create(lote)
+            total += len(lote)
+        return total
+
+    etapa('notificacoes', criar_notificacoes)
+
+    # --- Contadores que os signals manteriam ---
+    def reconstruir_contadores():
+        return (
+            len(verificar_saldos(corrigir=True))
+            + len(verificar_horas_servidores(corrigir=True))
+            + len(verificar_resumos(corrigir=True))
+        )
+
+    etapa('contadores_reconstruidos', reconstruir_contadores)
+    return criados
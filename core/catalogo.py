@@ -0,0 +1,136 @@
+# core/catalogo.py
+"""
+Catálogo de tipos de atividade (TipoAtividade) em memória.
+
+O catálogo vem da Resolução CONSU 67 (migração 0007) e quase nunca muda, mas era lido a
+cada formulário de atividade e a cada listagem de atividades (join com TipoAtividade). Cada
+processo guarda uma cópia, identificada por uma versão que fica no cache do Django
+(compartilhado entre processos com REDIS_URL). Salvar ou remover um TipoAtividade troca a
+versão depois do commit, e os processos recarregam o catálogo (uma consulta) na próxima
+leitura. Cada leitura custa só a consulta da versão no cache.
+
+Sem cache compartilhado (CATALOGO_VERSAO_NO_BANCO), a versão é a linha de VersaoCatalogo,
+incrementada na mesma transação da alteração. Cada processo a relê no máximo a cada
+CATALOGO_VERIFICAR_SEGUNDOS, então uma alteração feita em outro worker vale ali depois
+desse intervalo.
+
+Um catálogo montado dentro de uma transação pode ter visto alterações ainda não gravadas,
+então é provisório: a primeira leitura fora de transação o monta de novo.
+
+O catálogo serve só para escolhas de formulário e exibição. Valores que vão para o saldo
+(core/saldo.py, core/lancamentos.py) leem o valor/hora do banco, na própria transação.
+
+As instâncias de TipoAtividade do catálogo são compartilhadas: trate-as como somente leitura.
+"""
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import TipoAtividade, VersaoCatalogo
+
+CHAVE_VERSAO = 'catalogo_atividades:versao'
+
+_catalogo = None
+# Última versão lida do banco e quando (time.monotonic), no modo CATALOGO_VERSAO_NO_BANCO
+_versao_banco = None
+_verificado_em = 0.0
+
+
+class Catalogo:
+    def __init__(self, versao, tipos, provisorio=False):
+        self.versao = versao
+        self.provisorio = provisorio
+        self.tipos = {tipo.pk: tipo for tipo in tipos}
+        # Na ordem do formulário de atividade (mais barato primeiro)
+        self.choices = [
+            (tipo.pk, str(tipo)) for tipo in sorted(tipos, key=lambda tipo: (tipo.valor_hora, tipo.pk))
+        ]
+
+
+def _versao_no_banco():
+    global _versao_banco, _verificado_em
+    agora = time.monotonic()
+    if _versao_banco is None or agora - _verificado_em >= settings.CATALOGO_VERIFICAR_SEGUNDOS:
+        versao = VersaoCatalogo.objects.filter(pk=VersaoCatalogo.UNICA).values_list('versao', flat=True).first()
+        _versao_banco = f"banco:{versao or 0}"
+        _verificado_em = agora
+    return _versao_banco
+
+
+def versao_atual():
+    if settings.CATALOGO_VERSAO_NO_BANCO:
+        return _versao_no_banco()
+    versao = cache.get(CHAVE_VERSAO)
+    if versao is None:
+        # Cache vazio (reinício, expulsão): uma versão nova força todos a recarregar
+        cache.add(CHAVE_VERSAO, uuid.uuid4().hex, None)
+        versao = cache.get(CHAVE_VERSAO)
+    return versao
+
+
+def obter_catalogo():
+    global _catalogo
+    versao = versao_atual()
+    catalogo = _catalogo
+    if catalogo is None or catalogo.versao != versao or (catalogo.provisorio and not connection.in_atomic_block):
+        catalogo = _catalogo = Catalogo(
+            versao, list(TipoAtividade.objects.all()), provisorio=connection.in_atomic_block
+        )
+    return catalogo
+
+
+def obter_tipo(tipo_id, catalogo=None):
+    """TipoAtividade pelo id, sem consulta ao banco quando o catálogo está carregado."""
+    global _catalogo
+    tipo = (catalogo or obter_catalogo()).tipos.get(tipo_id)
+    if tipo is None:
+        # Criado em outro processo, antes da troca de versão chegar aqui
+        _catalogo = None
+        tipo = obter_catalogo().tipos.get(tipo_id)
+        if tipo is None:
+            raise TipoAtividade.DoesNotExist(f"TipoAtividade {tipo_id} não existe.")
+    return tipo
+
+
+def valor_hora(tipo_id):
+    return obter_tipo(tipo_id).valor_hora
+
+
+def nome(tipo_id):
+    return obter_tipo(tipo_id).nome
+
+
+def anexar_tipos(atividades):
+    """Preenche atividade.tipo a partir do catálogo, no lugar de select_related('tipo')."""
+    catalogo = obter_catalogo()
+    for atividade in atividades:
+        atividade.tipo = obter_tipo(atividade.tipo_id, catalogo)
+    return atividades
+
+
+def invalidar():
+    global _catalogo, _versao_banco
+    # Este processo recarrega já, com um catálogo provisório enquanto a transação não termina
+    # (se ela for desfeita, a próxima leitura fora de transação volta ao que está gravado);
+    # os outros processos, quando a versão trocar.
+    _catalogo = None
+    if settings.CATALOGO_VERSAO_NO_BANCO:
+        # Na mesma transação da alteração: os outros processos veem a versão nova junto com o
+        # commit, e um rollback desfaz as duas
+        _versao_banco = None
+        if not VersaoCatalogo.objects.filter(pk=VersaoCatalogo.UNICA).update(versao=F('versao') + 1):
+            VersaoCatalogo.objects.create(pk=VersaoCatalogo.UNICA, versao=1)
+        return
+    transaction.on_commit(lambda: cache.set(CHAVE_VERSAO, uuid.uuid4().hex, None))
+
+
+@receiver(post_save, sender=TipoAtividade)
+@receiver(post_delete, sender=TipoAtividade)
+def invalidar_ao_alterar(sender, **kwargs):
+    invalidar()
@@ -0,0 +1,12 @@
+# core/context_processors.py
+
+from django.core.handlers.asgi import ASGIRequest
+
+
+def notificacoes(request):
+    """
+    Diz ao base.html se o sino pode abrir o stream de notificações. Só sob ASGI a
+    stream_notificacoes mantém a conexão aberta; sob WSGI ela responderia 204, então a
+    página nem abre o EventSource e faz uma única busca em get_notificacoes_nao_lidas.
+    """
+    return {'notificacoes_em_tempo_real': isinstance(request, ASGIRequest)}
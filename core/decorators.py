@@ -1,6 +1,17 @@
 from django.contrib.auth.decorators import user_passes_test
 from django.shortcuts import redirect
 
+
+def obter_funcao(request):
+    """
+    Retorna a função do usuário logado (ou None, sem perfil/anônimo), guardada na
+    própria requisição depois da primeira leitura.
+    """
+    if not hasattr(request, '_funcao'):
+        perfil = getattr(request.user, 'servidorprofile', None) if request.user.is_authenticated else None
+        request._funcao = perfil.funcao if perfil is not None else None
+    return request._funcao
+
 def role_required(allowed_roles=[]):
     """
     Decorator para checar se o usuário tem uma das funções permitidas.
@@ -11,13 +22,9 @@ def role_required(allowed_roles=[]):
             if not request.user.is_authenticated:
                 return redirect('login')
             
-            try:
-                if request.user.servidorprofile.funcao in allowed_roles:
-                    return view_func(request, *args, **kwargs)
-                else:
-                    return redirect('painel')
-            except AttributeError:
-                
+            if obter_funcao(request) in allowed_roles:
+                return view_func(request, *args, **kwargs)
+            else:
                 return redirect('painel')
         return wrapper
     return decorator
@@ -0,0 +1,230 @@
+# core/exportacao.py
+"""
+Exportação dos dados de auditoria em CSV e XLSX, gerados linha a linha.
+
+As linhas vêm de values_list(...).iterator(), então nem o queryset nem o arquivo
+final ficam inteiros na memória: cada linha é convertida e enviada ao cliente
+pelo StreamingHttpResponse assim que sai do banco.
+"""
+import csv
+import zipfile
+from datetime import date
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.db.models import Q
+
+from .models import LancamentoHoras
+from .relatorios import STATUS_AUDITAVEIS
+
+CABECALHO = [
+    'Data', 'Servidor', 'Usuário', 'Unidade', 'Edital', 'Atividade',
+    'Horas', 'Valor Hora', 'Status', 'Validado por (U.D.)',
+]
+
+CAMPOS = (
+    'data',
+    'servidor__first_name',
+    'servidor__last_name',
+    'servidor__username',
+    'servidor__servidorprofile__unidade__sigla',
+    'edital__numero_edital',
+    'atividade__tipo__nome',
+    'horas',
+    'atividade__tipo__valor_hora',
+    'status',
+    'validado_por__first_name',
+    'validado_por__last_name',
+)
+
+
+def condicoes_auditoria(prefixo='', edital=None, data_inicio=None, data_fim=None, status=None, unidade=None):
+    """
+    Monta o Q dos filtros da auditoria sobre lançamentos. `prefixo` permite aplicá-lo a
+    partir de outro modelo (ex.: 'lancamentos__' para filtrar e agregar a partir do Edital).
+    """
+    condicoes = {f'{prefixo}status__in': STATUS_AUDITAVEIS}
+    if edital:
+        condicoes[f'{prefixo}edital'] = edital
+    if data_inicio:
+        condicoes[f'{prefixo}data__gte'] = data_inicio
+    if data_fim:
+        condicoes[f'{prefixo}data__lte'] = data_fim
+    if status:
+        condicoes[f'{prefixo}status'] = status
+    if unidade:
+        condicoes[f'{prefixo}servidor__servidorprofile__unidade'] = unidade
+    return Q(**condicoes)
+
+
+def filtrar_lancamentos(edital=None, data_inicio=None, data_fim=None, status=None, unidade=None):
+    return LancamentoHoras.objects.filter(
+        condicoes_auditoria(edital=edital, data_inicio=data_inicio, data_fim=data_fim, status=status, unidade=unidade)
+    )
+
+
+def linhas_auditoria(lancamentos):
+    """Gera as linhas da exportação (sem o cabeçalho), lendo o banco em blocos."""
+    tamanho_bloco = settings.EXPORTACAO_LINHAS_POR_BLOCO
+    consulta = lancamentos.order_by('edital__numero_edital', 'data', 'pk').values_list(*CAMPOS)
+
+    for (data, nome, sobrenome, username, unidade, edital, atividade,
+         horas, valor_hora, status, validador_nome, validador_sobrenome) in consulta.iterator(chunk_size=tamanho_bloco):
+        yield [
+            data,
+            f"{nome} {sobrenome}".strip() or username,
+            username,
+            unidade or '',
+            edital,
+            atividade,
+            horas,
+            valor_hora,
+            status,
+            f"{validador_nome or ''} {validador_sobrenome or ''}".strip() or '-',
+        ]
+
+
+# --- CSV ---
+
+class _Eco:
+    """Buffer de mentira: write() devolve o texto, que o gerador repassa direto para a resposta."""
+
+    def write(self, valor):
+        return valor
+
+
+def gerar_csv(linhas):
+    escritor = csv.writer(_Eco(), delimiter=';')
+    # BOM para o Excel reconhecer o UTF-8 ao abrir o arquivo direto
+    yield '\ufeff' + escritor.writerow(CABECALHO)
+    for linha in linhas:
+        yield escritor.writerow([
+            valor.strftime('%d/%m/%Y') if isinstance(valor, date) else valor
+            for valor in linha
+        ])
+
+
+# --- XLSX ---
+#
+# Um .xlsx é um zip com alguns XMLs. A planilha é escrita como um único membro do
+# zip em modo streaming (zipfile aceita destino sem seek e usa data descriptors),
+# então cada linha vira XML, é comprimida e sai pela resposta sem acumular nada.
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+
+_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="Auditoria" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+    'Target="styles.xml"/>'
+    '</Relationships>'
+)
+
+# Estilo 0 é o padrão; estilo 1 formata o número de série como data (formato embutido 14)
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs>'
+    '</styleSheet>'
+)
+
+_INICIO_PLANILHA = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+_FIM_PLANILHA = '</sheetData></worksheet>'
+
+_EPOCA_EXCEL = date(1899, 12, 30)
+
+
+def _celula(valor):
+    if isinstance(valor, date):
+        return f'<c s="1"><v>{(valor - _EPOCA_EXCEL).days}</v></c>'
+    if isinstance(valor, (int, float)) or hasattr(valor, 'as_tuple'):
+        return f'<c><v>{valor}</v></c>'
+    return f'<c t="inlineStr"><is><t>{escape(str(valor))}</t></is></c>'
+
+
+def _linha_xml(linha):
+    return '<row>' + ''.join(_celula(valor) for valor in linha) + '</row>'
+
+
+class _BufferDeSaida:
+    """Recebe o que o zipfile escreve; o gerador esvazia o buffer depois de cada linha."""
+
+    def __init__(self):
+        self.partes = []
+
+    def write(self, dados):
+        self.partes.append(bytes(dados))
+        return len(dados)
+
+    def flush(self):
+        pass
+
+    def esvaziar(self):
+        dados = b''.join(self.partes)
+        self.partes = []
+        return dados
+
+
+def gerar_xlsx(linhas):
+    saida = _BufferDeSaida()
+    with zipfile.ZipFile(saida, mode='w', compression=zipfile.ZIP_DEFLATED) as arquivo:
+        arquivo.writestr('[Content_Types].xml', _CONTENT_TYPES)
+        arquivo.writestr('_rels/.rels', _RELS)
+        arquivo.writestr('xl/workbook.xml', _WORKBOOK)
+        arquivo.writestr('xl/_rels/workbook.xml.rels', _WORKBOOK_RELS)
+        arquivo.writestr('xl/styles.xml', _STYLES)
+        yield saida.esvaziar()
+
+        # O tamanho da planilha só é conhecido no fim; force_zip64 evita o erro
+        # "File size too large" quando a exportação passa de 2 GiB descomprimidos
+        with arquivo.open('xl/worksheets/sheet1.xml', mode='w', force_zip64=True) as planilha:
+            planilha.write((_INICIO_PLANILHA + _linha_xml(CABECALHO)).encode())
+            for linha in linhas:
+                planilha.write(_linha_xml(linha).encode())
+                dados = saida.esvaziar()
+                if dados:
+                    yield dados
+            planilha.write(_FIM_PLANILHA.encode())
+    yield saida.esvaziar()
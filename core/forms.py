@@ -2,7 +2,11 @@
 from django import forms
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
-from .models import Edital, Atividade, TipoAtividade, LancamentoHoras, Unidade, ServidorProfile
+from django.db import transaction
+from django.utils.choices import BaseChoiceIterator
+from .catalogo import obter_catalogo, obter_tipo
+from .models import Edital, Atividade, TipoAtividade, LancamentoHoras, Unidade, ServidorProfile, sem_perfil_automatico
+from .saldo import calcular_valor, saldo_disponivel, valor_hora_da_atividade
 
 
 class EditalForm(forms.ModelForm):
@@ -23,11 +27,37 @@ class EditalForm(forms.ModelForm):
         }
 
 
+class _EscolhasDoCatalogo(BaseChoiceIterator):
+    # Lidas só na renderização, como o ModelChoiceIterator, mas do catálogo em memória
+    def __init__(self, field):
+        self.field = field
+
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ("", self.field.empty_label)
+        yield from obter_catalogo().choices
+
+
+class TipoAtividadeField(forms.ModelChoiceField):
+    """Escolhe um TipoAtividade a partir do catálogo em memória (core/catalogo.py), sem consultas."""
+    iterator = _EscolhasDoCatalogo
+
+    def __init__(self, **kwargs):
+        super().__init__(queryset=TipoAtividade.objects.order_by("valor_hora"), **kwargs)
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        try:
+            return obter_tipo(int(value))
+        except (TypeError, ValueError, TipoAtividade.DoesNotExist):
+            raise ValidationError(
+                self.error_messages["invalid_choice"], code="invalid_choice", params={"value": value}
+            )
+
+
 class AtividadeForm(forms.ModelForm):
-    tipo = forms.ModelChoiceField(
-        queryset=TipoAtividade.objects.order_by("valor_hora"),
-        label="Selecione o Tipo da Atividade",
-    )
+    tipo = TipoAtividadeField(label="Selecione o Tipo da Atividade")
 
     class Meta:
         model = Atividade
@@ -73,15 +103,11 @@ class LancamentoHorasForm(forms.ModelForm):
             raise ValidationError("Atividade não encontrada para validação de orçamento.")
 
         edital = self.atividade.edital
-        valor_hora = self.atividade.tipo.valor_hora
-        custo_atual = decimal_horas * float(valor_hora)
-        
-        total_gasto = 0
-        lancamentos_do_edital = LancamentoHoras.objects.filter(edital=edital).exclude(status='Recusado')
-        for lancamento in lancamentos_do_edital:
-            total_gasto += lancamento.horas * lancamento.atividade.tipo.valor_hora
-            
-        saldo_restante = edital.valor_empenho - total_gasto
+        valor_hora = valor_hora_da_atividade(self.atividade.pk)
+        custo_atual = calcular_valor(round(decimal_horas, 2), valor_hora)
+
+        # O saldo é mantido incrementalmente (core/saldo.py): uma leitura, independente do tamanho do edital.
+        saldo_restante = saldo_disponivel(edital)
 
         if custo_atual > saldo_restante:
             raise ValidationError(
@@ -101,6 +127,45 @@ class LancamentoHorasForm(forms.ModelForm):
             'descricao_justificativa': 'Descrição da Atividade/Justificativa',
         }
 
+
+class FiltroAuditoriaForm(forms.Form):
+    edital = forms.ModelChoiceField(
+        label="Edital", queryset=Edital.objects.order_by("numero_edital"), required=False
+    )
+    data_inicio = forms.DateField(
+        label="De", required=False, widget=forms.DateInput(attrs={"type": "date"})
+    )
+    data_fim = forms.DateField(
+        label="Até", required=False, widget=forms.DateInput(attrs={"type": "date"})
+    )
+    status = forms.ChoiceField(
+        label="Status",
+        required=False,
+        choices=[("", "Todos")] + [
+            (valor, nome) for valor, nome in LancamentoHoras.STATUS_CHOICES if valor != "Pendente"
+        ],
+    )
+    unidade = forms.ModelChoiceField(
+        label="Unidade do Servidor", queryset=Unidade.objects.all(), required=False
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        data_inicio = cleaned_data.get("data_inicio")
+        data_fim = cleaned_data.get("data_fim")
+        if data_inicio and data_fim and data_inicio > data_fim:
+            raise ValidationError("A data inicial não pode ser posterior à data final.")
+        return cleaned_data
+
+
+class ImportarServidoresForm(forms.Form):
+    arquivo = forms.FileField(
+        label="Arquivo CSV",
+        help_text="Colunas: nome, email, cpf, siape, titulacao e unidade (sigla). O login de cada servidor é o SIAPE.",
+    )
+    somente_validar = forms.BooleanField(label="Apenas validar, sem importar", required=False)
+
+
 class AdicionarServidorForm(forms.Form):
     # Campos do modelo User
     first_name = forms.CharField(label="Nome", max_length=150)
@@ -122,23 +187,25 @@ class AdicionarServidorForm(forms.Form):
         return username
 
     def save(self):
-        # Cria o User
-        user = User.objects.create_user(
-            username=self.cleaned_data['username'],
-            email=self.cleaned_data['email'],
-            first_name=self.cleaned_data['first_name'],
-            last_name=self.cleaned_data['last_name'],
-            password='password123' # Senha padrão, o usuário pode alterar depois
-        )
-
-        # Atualiza o ServidorProfile criado pelo signal
-        profile = user.servidorprofile
-        profile.funcao = self.cleaned_data['funcao']
-        profile.cpf = self.cleaned_data['cpf']
-        profile.siape = self.cleaned_data['siape']
-        profile.titulacao = self.cleaned_data['titulacao']
-        profile.unidade = self.cleaned_data['unidade']
-        profile.status = 'Aguardando Homologação' # Já entra como homologado, pois foi criado por um admin
-        profile.save()
+        # O perfil entra já preenchido, em um único INSERT, no lugar do perfil vazio do signal
+        with transaction.atomic(), sem_perfil_automatico():
+            # Cria o User
+            user = User.objects.create_user(
+                username=self.cleaned_data['username'],
+                email=self.cleaned_data['email'],
+                first_name=self.cleaned_data['first_name'],
+                last_name=self.cleaned_data['last_name'],
+                password='password123' # Senha padrão, o usuário pode alterar depois
+            )
+
+            ServidorProfile.objects.create(
+                user=user,
+                funcao=self.cleaned_data['funcao'],
+                cpf=self.cleaned_data['cpf'],
+                siape=self.cleaned_data['siape'],
+                titulacao=self.cleaned_data['titulacao'],
+                unidade=self.cleaned_data['unidade'],
+                status='Aguardando Homologação',  # Aguarda a homologação, mesmo criado pela unidade
+            )
 
         return user
\ No newline at end of file
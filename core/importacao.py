@@ -0,0 +1,210 @@
+# core/importacao.py
+"""
+Importação de servidores em massa a partir de um CSV.
+
+Colunas (cabeçalho obrigatório, sem diferenciar maiúsculas nem acentos; vírgula ou ponto e
+vírgula): nome, email, cpf, siape, titulacao, unidade (sigla ou nome da Unidade).
+O login de cada servidor é o SIAPE e a senha inicial é a mesma do cadastro individual.
+
+Todas as linhas são validadas antes de gravar: formato de cada campo, duplicidade dentro do
+arquivo e, com consultas por conjunto (uma por lote de valores), duplicidade de login, CPF
+e SIAPE no banco. As senhas são criptografadas em um pool de processos (cada uma custa
+centenas de milissegundos) e User e ServidorProfile entram com bulk_create em lotes, na
+mesma transação e sem os signals por linha. As linhas com erro não são importadas e
+voltam com o número da linha e o motivo.
+"""
+import csv
+import io
+import unicodedata
+from collections import Counter, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+
+from .models import ServidorProfile, Unidade
+
+SENHA_PADRAO = 'password123'
+COLUNAS = ('nome', 'email', 'cpf', 'siape', 'titulacao', 'unidade')
+TAMANHO_CONSULTA = 500
+
+Resultado = namedtuple('Resultado', ['criados', 'erros', 'total'])
+
+
+def _normalizar(texto):
+    sem_acentos = unicodedata.normalize('NFKD', texto).encode('ascii', 'ignore').decode('ascii')
+    return sem_acentos.strip().lower()
+
+
+def ler_csv(arquivo):
+    """Lê o CSV (texto ou bytes) e retorna [(número da linha, {coluna: valor})]."""
+    if isinstance(arquivo, bytes):
+        try:
+            arquivo = arquivo.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            # Planilhas salvas como "CSV" pelo Excel em Windows
+            arquivo = arquivo.decode('cp1252', errors='replace')
+    try:
+        dialeto = csv.Sniffer().sniff(arquivo.split('\n', 1)[0], delimiters=',;')
+    except csv.Error:
+        dialeto = csv.excel
+    leitor = csv.reader(io.StringIO(arquivo), dialeto)
+    cabecalho = [_normalizar(coluna) for coluna in next(leitor, [])]
+    faltantes = [coluna for coluna in COLUNAS if coluna not in cabecalho]
+    if faltantes:
+        raise ValidationError(f"Colunas obrigatórias ausentes no cabeçalho: {', '.join(faltantes)}.")
+    return [
+        (numero, {**dict.fromkeys(COLUNAS, ''), **{coluna: valor.strip() for coluna, valor in zip(cabecalho, valores)}})
+        for numero, valores in enumerate(leitor, start=2)
+        if any(valor.strip() for valor in valores)
+    ]
+
+
+def _em_lotes(valores, tamanho=TAMANHO_CONSULTA):
+    valores = list(valores)
+    for inicio in range(0, len(valores), tamanho):
+        yield valores[inicio:inicio + tamanho]
+
+
+def _existentes(queryset, campo, valores):
+    encontrados = set()
+    for lote in _em_lotes(valores):
+        encontrados.update(queryset.filter(**{f'{campo}__in': lote}).values_list(campo, flat=True))
+    return encontrados
+
+
+def validar_linhas(linhas):
+    """
+    Valida as linhas lidas e retorna (válidas, erros). Cada válida é (número, dados
+    normalizados); cada erro é (número, mensagem).
+    """
+    titulacoes = {_normalizar(valor): valor for valor, _ in ServidorProfile.TITULACAO_CHOICES}
+    unidades = {}
+    for unidade in Unidade.objects.all():
+        unidades.setdefault(_normalizar(unidade.sigla), unidade)
+        unidades.setdefault(_normalizar(unidade.nome), unidade)
+
+    repetidos = {
+        coluna: {valor for valor, vezes in Counter(dados[coluna] for _, dados in linhas if dados[coluna]).items() if vezes > 1}
+        for coluna in ('cpf', 'siape', 'email')
+    }
+    siapes = {dados['siape'] for _, dados in linhas if dados['siape']}
+    cpfs = {dados['cpf'] for _, dados in linhas if dados['cpf']}
+    logins_existentes = _existentes(User.objects, 'username', siapes)
+    siapes_existentes = _existentes(ServidorProfile.objects, 'siape', siapes)
+    cpfs_existentes = _existentes(ServidorProfile.objects, 'cpf', cpfs)
+
+    validas, erros = [], []
+    for numero, dados in linhas:
+        problemas = [f"{coluna} é obrigatório" for coluna in COLUNAS if not dados.get(coluna)]
+        if not problemas:
+            try:
+                validate_email(dados['email'])
+            except ValidationError:
+                problemas.append(f"email inválido ({dados['email']})")
+            if len(dados['cpf']) > 14:
+                problemas.append("CPF com mais de 14 caracteres")
+            if len(dados['siape']) > 20:
+                problemas.append("SIAPE com mais de 20 caracteres")
+            titulacao = titulacoes.get(_normalizar(dados['titulacao']))
+            if titulacao is None:
+                problemas.append(f"titulação desconhecida ({dados['titulacao']})")
+            unidade = unidades.get(_normalizar(dados['unidade']))
+            if unidade is None:
+                problemas.append(f"unidade não encontrada ({dados['unidade']})")
+            for coluna in ('cpf', 'siape', 'email'):
+                if dados[coluna] in repetidos[coluna]:
+                    problemas.append(f"{coluna} repetido no arquivo ({dados[coluna]})")
+            if dados['siape'] in logins_existentes or dados['siape'] in siapes_existentes:
+                problemas.append(f"SIAPE já cadastrado ({dados['siape']})")
+            if dados['cpf'] in cpfs_existentes:
+                problemas.append(f"CPF já cadastrado ({dados['cpf']})")
+
+        if problemas:
+            erros.append((numero, '; '.join(problemas)))
+            continue
+
+        primeiro_nome, _, sobrenome = dados['nome'].partition(' ')
+        validas.append((numero, {
+            'username': dados['siape'],
+            'first_name': primeiro_nome[:150],
+            'last_name': sobrenome.strip()[:150],
+            'email': dados['email'],
+            'cpf': dados['cpf'],
+            'siape': dados['siape'],
+            'titulacao': titulacao,
+            'unidade': unidade,
+        }))
+    return validas, erros
+
+
+def _iniciar_processo():
+    # Com spawn/forkserver, o processo filho precisa carregar as configurações (PASSWORD_HASHERS)
+    django.setup()
+
+
+def criptografar_senhas(senhas, processos=None):
+    """make_password de cada senha, distribuído em um pool de processos (1 = sem pool)."""
+    processos = processos or settings.IMPORTACAO_PROCESSOS
+    if processos <= 1 or len(senhas) <= 1:
+        return [make_password(senha) for senha in senhas]
+    with ProcessPoolExecutor(max_workers=processos, initializer=_iniciar_processo) as executor:
+        return list(executor.map(make_password, senhas, chunksize=max(1, len(senhas) // (processos * 4))))
+
+
+def importar_servidores(arquivo, senha=SENHA_PADRAO, somente_validar=False, tamanho_lote=1000, processos=None,
+                        max_linhas=None):
+    """
+    Importa os servidores válidos do CSV e retorna Resultado(criados, erros, total de linhas).
+    Com `somente_validar`, nada é gravado (criados é o número de linhas que seriam importadas).
+    Levanta ValidationError se o arquivo for ilegível ou tiver mais de `max_linhas` linhas.
+    """
+    linhas = ler_csv(arquivo)
+    if max_linhas and len(linhas) > max_linhas:
+        raise ValidationError(
+            f"O arquivo tem {len(linhas)} linhas; o limite aqui é {max_linhas}. Use o comando import_servidores."
+        )
+    validas, erros = validar_linhas(linhas)
+    if somente_validar or not validas:
+        return Resultado(len(validas), erros, len(linhas))
+
+    senhas = criptografar_senhas([senha] * len(validas), processos)
+
+    try:
+        with transaction.atomic():
+            _gravar(zip(validas, senhas), tamanho_lote)
+    except IntegrityError:
+        # Outro cadastro com o mesmo login, CPF ou SIAPE entrou entre a validação e a gravação
+        raise ValidationError("Outro cadastro usou um dos logins, CPFs ou SIAPEs durante a importação. Nada foi gravado; tente novamente.")
+    return Resultado(len(validas), erros, len(linhas))
+
+
+def _gravar(linhas_e_senhas, tamanho_lote):
+    for lote in _em_lotes(linhas_e_senhas, tamanho_lote):
+        usuarios = User.objects.bulk_create([
+            User(
+                username=dados['username'],
+                first_name=dados['first_name'],
+                last_name=dados['last_name'],
+                email=dados['email'],
+                password=senha_criptografada,
+            )
+            for (_, dados), senha_criptografada in lote
+        ])
+        ServidorProfile.objects.bulk_create([
+            ServidorProfile(
+                user=usuario,
+                funcao='Servidor',
+                status='Aguardando Homologação',
+                cpf=dados['cpf'],
+                siape=dados['siape'],
+                titulacao=dados['titulacao'],
+                unidade=dados['unidade'],
+            )
+            for usuario, ((_, dados), _) in zip(usuarios, lote)
+        ])
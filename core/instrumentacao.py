@@ -0,0 +1,150 @@
+# core/instrumentacao.py
+"""
+Instrumentação das requisições em produção: tempo total, número de consultas, tempo no
+banco, consultas repetidas (mesmo SQL com os mesmos parâmetros) e tamanho da resposta,
+agrupados pelo nome da rota.
+
+As consultas são observadas com connection.execute_wrapper, sem DEBUG. As últimas
+INSTRUMENTACAO_AMOSTRAS_POR_VIEW medições de cada rota ficam em um buffer circular em
+memória (um por processo), resumido em percentis por `estatisticas()`. Requisições mais
+lentas que INSTRUMENTACAO_LENTA_MS geram uma linha de log em JSON.
+
+Views podem declarar um orçamento de consultas com @orcamento_consultas(n). Estourar o
+orçamento gera um aviso no log ou, com INSTRUMENTACAO_ORCAMENTO_ESTRITO (ligado ao rodar
+os testes), um erro OrcamentoConsultasExcedido.
+"""
+import json
+import logging
+import time
+from collections import Counter, deque
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+# {nome da rota: deque de medições}; cada medição é uma tupla na ordem de CAMPOS
+_amostras = {}
+CAMPOS = ('duracao_ms', 'consultas', 'banco_ms', 'duplicadas', 'bytes')
+
+
+class OrcamentoConsultasExcedido(AssertionError):
+    pass
+
+
+def orcamento_consultas(maximo):
+    """
+    Declara o número máximo de consultas SQL de uma requisição à view (incluindo sessão
+    e usuário). Deve ser o decorator mais externo, para a marca chegar à rota.
+    """
+    def decorator(view_func):
+        view_func.orcamento_consultas = maximo
+        return view_func
+    return decorator
+
+
+class _Coletor:
+    """execute_wrapper que conta as consultas, o tempo gasto nelas e as repetidas."""
+
+    def __init__(self):
+        self.consultas = 0
+        self.segundos = 0.0
+        self.vistas = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.segundos += time.perf_counter() - inicio
+            self.consultas += 1
+            self.vistas[(sql, repr(params))] += 1
+
+    @property
+    def duplicadas(self):
+        return self.consultas - len(self.vistas)
+
+
+def _tamanho(response):
+    if response.streaming:
+        # Streaming: só sabemos o tamanho se a resposta o declarou (ex.: FileResponse)
+        return int(response.get('Content-Length') or 0)
+    return len(response.content)
+
+
+def registrar(rota, duracao_ms, consultas, banco_ms, duplicadas, tamanho):
+    amostras = _amostras.get(rota)
+    if amostras is None:
+        amostras = _amostras.setdefault(rota, deque(maxlen=settings.INSTRUMENTACAO_AMOSTRAS_POR_VIEW))
+    amostras.append((duracao_ms, consultas, banco_ms, duplicadas, tamanho))
+
+
+def limpar():
+    _amostras.clear()
+
+
+def _percentil(ordenados, p):
+    return ordenados[max(0, -(-len(ordenados) * p // 100) - 1)]
+
+
+def estatisticas():
+    """Resumo por rota: total de amostras e p50/p95/p99/máx de cada métrica."""
+    resumo = {}
+    for rota, amostras in list(_amostras.items()):
+        medicoes = list(amostras)
+        if not medicoes:
+            continue
+        resumo[rota] = {'amostras': len(medicoes)}
+        for indice, campo in enumerate(CAMPOS):
+            valores = sorted(medicao[indice] for medicao in medicoes)
+            resumo[rota][campo] = {
+                'p50': _percentil(valores, 50),
+                'p95': _percentil(valores, 95),
+                'p99': _percentil(valores, 99),
+                'max': valores[-1],
+            }
+    return resumo
+
+
+def _verificar_orcamento(request, rota, consultas):
+    match = getattr(request, 'resolver_match', None)
+    maximo = getattr(match.func, 'orcamento_consultas', None) if match else None
+    if maximo is None or consultas <= maximo:
+        return
+    mensagem = f"{rota} fez {consultas} consultas, acima do orçamento de {maximo}."
+    if settings.INSTRUMENTACAO_ORCAMENTO_ESTRITO:
+        raise OrcamentoConsultasExcedido(mensagem)
+    logger.warning(mensagem)
+
+
+def instrumentar(request, get_response):
+    """Executa a requisição medindo-a; chamado pelo instrumentacao_middleware."""
+    coletor = _Coletor()
+    inicio = time.perf_counter()
+    with connection.execute_wrapper(coletor):
+        response = get_response(request)
+    duracao_ms = (time.perf_counter() - inicio) * 1000
+
+    match = getattr(request, 'resolver_match', None)
+    rota = match.view_name if match else 'sem_rota'
+    banco_ms = coletor.segundos * 1000
+    tamanho = _tamanho(response)
+    registrar(rota, round(duracao_ms, 2), coletor.consultas, round(banco_ms, 2), coletor.duplicadas, tamanho)
+
+    if duracao_ms > settings.INSTRUMENTACAO_LENTA_MS:
+        logger.warning(json.dumps({
+            'evento': 'requisicao_lenta',
+            'rota': rota,
+            'metodo': request.method,
+            'caminho': request.path,
+            'status': response.status_code,
+            'duracao_ms': round(duracao_ms, 2),
+            'consultas': coletor.consultas,
+            'banco_ms': round(banco_ms, 2),
+            'duplicadas': coletor.duplicadas,
+            'bytes': tamanho,
+            'usuario_id': getattr(getattr(request, 'user', None), 'pk', None),
+        }))
+
+    _verificar_orcamento(request, rota, coletor.consultas)
+    return response
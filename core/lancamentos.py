@@ -0,0 +1,105 @@
+# core/lancamentos.py
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import LancamentoHoras
+from .notificacoes import notificar
+from .saldo import (
+    aplicar_transicoes, calcular_valor, reservar_horas, reservar_saldo, trava_local, valor_hora_da_atividade
+)
+from .templatetags.hour_filters import decimal_to_hhmm
+
+
+def registrar_lancamento(servidor, atividade, data, horas, descricao_justificativa):
+    """
+    Cria um lançamento de horas reservando, na mesma transação, o valor no saldo do
+    edital e as horas no limite anual do servidor.
+
+    A validação do formulário dá o retorno rápido ao usuário, mas só a reserva garante
+    que submissões simultâneas não ultrapassem o empenho nem o limite de horas.
+    Levanta ValidationError se o saldo ou o limite não comportarem o lançamento.
+    """
+    edital = atividade.edital
+    ano = data.year
+
+    # Ordem fixa das travas (edital, depois servidor) para não haver espera circular.
+    with trava_local(('edital', edital.pk)), trava_local(('servidor', servidor.pk)), transaction.atomic():
+        # Valor/hora lido do banco na mesma transação da reserva, não do catálogo em memória
+        valor = calcular_valor(horas, valor_hora_da_atividade(atividade.pk))
+        if not reservar_saldo(edital, valor):
+            raise ValidationError(
+                f"Este lançamento de R$ {valor:.2f} ultrapassa o saldo de empenho restante do edital."
+            )
+        if not reservar_horas(servidor, ano, horas):
+            raise ValidationError(
+                f"Este lançamento ultrapassa o limite anual de horas do servidor em {ano}."
+            )
+
+        lancamento = LancamentoHoras(
+            servidor=servidor,
+            atividade=atividade,
+            edital=edital,
+            data=data,
+            horas=horas,
+            descricao_justificativa=descricao_justificativa,
+        )
+        # Valor e horas já entraram como pendentes na reserva; o signal não deve somá-los de novo.
+        lancamento._saldo_reservado = True
+        lancamento.save()
+
+    return lancamento
+
+
+def validar_em_massa(lancamentos, novo_status, validado_por, comentario_recusa="", ids_solicitados=None):
+    """
+    Aprova ou recusa de uma vez todos os lançamentos pendentes de `lancamentos`.
+
+    Tudo acontece em uma transação: um UPDATE para os lançamentos, um UPDATE por edital
+    e por (servidor, ano) nos contadores e um bulk_create para as notificações.
+    Retorna um dicionário {pk: resultado}, onde resultado é o novo status, "nao_pendente"
+    ou "nao_encontrado" (estes dois apenas para os `ids_solicitados` que não foram processados).
+    """
+    with transaction.atomic():
+        pendentes = list(
+            lancamentos.filter(status='Pendente')
+            .select_for_update(of=('self',))
+            .values(
+                'pk', 'status', 'horas', 'data', 'edital_id', 'servidor_id',
+                # Valor/hora lido do banco na mesma transação: é ele que vai para o saldo
+                valor_hora=F('atividade__tipo__valor_hora'), nome_atividade=F('atividade__tipo__nome'),
+            )
+        )
+        ids = [linha['pk'] for linha in pendentes]
+
+        if ids:
+            campos = {'status': novo_status, 'validado_por': validado_por, 'updated_at': timezone.now()}
+            if novo_status == 'Recusado':
+                campos['comentario_recusa'] = comentario_recusa
+            # status='Pendente' também no UPDATE: um lançamento validado por outra transação nunca é sobrescrito
+            LancamentoHoras.objects.filter(pk__in=ids, status='Pendente').update(**campos)
+
+            aplicar_transicoes(pendentes, novo_status)
+
+            link = reverse('historico_lancamentos')
+            for linha in pendentes:
+                # Vários lançamentos do mesmo servidor viram uma única notificação
+                notificar(
+                    linha['servidor_id'],
+                    f'Seu lançamento de {decimal_to_hhmm(linha["horas"])} na atividade "{linha["nome_atividade"]}" foi {novo_status.upper()}.',
+                    link=link,
+                    grupo=('lancamentos', novo_status),
+                    mensagem_grupo=f'{{total}} lançamentos seus foram {novo_status.upper()}S.',
+                )
+
+    resultados = {pk: novo_status for pk in ids}
+
+    faltantes = [pk for pk in (ids_solicitados or []) if pk not in resultados]
+    if faltantes:
+        encontrados = set(lancamentos.filter(pk__in=faltantes).values_list('pk', flat=True))
+        for pk in faltantes:
+            resultados[pk] = 'nao_pendente' if pk in encontrados else 'nao_encontrado'
+
+    return resultados
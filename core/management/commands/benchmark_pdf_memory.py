@@ -0,0 +1,104 @@
+# core/management/commands/benchmark_pdf_memory.py
+
+import json
+import resource
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from core.relatorios import renderizar_pdf_em_blocos
+
+
+class _Pessoa:
+    def __init__(self, nome):
+        self.username = nome
+        self.nome = nome
+
+    def get_full_name(self):
+        return self.nome
+
+
+class _Edital:
+    def __init__(self, numero):
+        self.numero_edital = numero
+
+
+class _Lancamento:
+    """Linha sintética com os mesmos atributos que o template de auditoria lê de LancamentoHoras."""
+
+    def __init__(self, i):
+        self.data = date(2025, 1, 1) + timedelta(days=i % 365)
+        self.servidor = _Pessoa(f"Servidor Sintético {i % 997}")
+        self.edital = _Edital(f"{i % 50:03d}/2025")
+        self.horas = Decimal(i % 8 + 1) + Decimal("0.50")
+        self.status = ("Aprovado", "Recusado", "Homologado")[i % 3]
+        self.validado_por = _Pessoa(f"Unidade {i % 20}")
+
+
+def _medir(linhas, tamanho_bloco):
+    # Roda em um processo novo: o pico de RSS (ru_maxrss) não pode ser zerado dentro do mesmo processo.
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    pdf = renderizar_pdf_em_blocos(
+        "relatorios/auditoria_pdf.html",
+        (_Lancamento(i) for i in range(linhas)),
+        tamanho_bloco=tamanho_bloco,
+    )
+    segundos = time.perf_counter() - inicio
+    _, pico_python = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "linhas": linhas,
+        "tamanho_bloco": tamanho_bloco,
+        "segundos": round(segundos, 2),
+        "pico_python_mb": round(pico_python / 1024 / 1024, 1),
+        "pico_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "tamanho_pdf_kb": round(len(pdf) / 1024, 1),
+    }
+
+
+class Command(BaseCommand):
+    help = "Mede o pico de memória da geração do PDF de auditoria em função do número de linhas, com e sem blocos."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--linhas",
+            type=int,
+            nargs="+",
+            default=[500, 2000, 8000],
+            help="Quantidades de linhas a medir.",
+        )
+        parser.add_argument(
+            "--blocos",
+            type=int,
+            nargs="+",
+            default=[0, 500],
+            help="Tamanhos de bloco a comparar (0 = documento único, como antes).",
+        )
+        parser.add_argument(
+            "--json",
+            type=str,
+            help="Caminho de um arquivo para gravar os resultados em JSON.",
+        )
+
+    def handle(self, *args, **kwargs):
+        resultados = []
+        self.stdout.write(f"{'linhas':>8} {'bloco':>6} {'seg':>7} {'python MB':>10} {'RSS MB':>8} {'PDF KB':>8}")
+
+        for linhas in kwargs["linhas"]:
+            for tamanho_bloco in kwargs["blocos"]:
+                with ProcessPoolExecutor(max_workers=1) as executor:
+                    r = executor.submit(_medir, linhas, tamanho_bloco).result()
+                resultados.append(r)
+                self.stdout.write(
+                    f"{r['linhas']:>8} {r['tamanho_bloco']:>6} {r['segundos']:>7} "
+                    f"{r['pico_python_mb']:>10} {r['pico_rss_mb']:>8} {r['tamanho_pdf_kb']:>8}"
+                )
+
+        if kwargs["json"]:
+            with open(kwargs["json"], "w") as arquivo:
+                json.dump(resultados, arquivo, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Resultados gravados em {kwargs['json']}."))
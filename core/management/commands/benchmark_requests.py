@@ -0,0 +1,122 @@
+# core/management/commands/benchmark_requests.py
+
+import json
+import platform
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from core import benchmark
+from core.carga import gerar_carga
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede latência (p50/p95/p99), consultas SQL e pico de memória das principais telas em um banco "
+        "descartável populado com dados sintéticos. Grava os resultados em JSON e, com --baseline, termina "
+        "com erro se algum cenário piorou além da tolerância."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iteracoes", type=int, default=20, help="Requisições cronometradas por cenário (padrão: 20).")
+        parser.add_argument(
+            "--cenarios",
+            nargs="+",
+            help="Roda apenas estes cenários (ex.: lancar_horas_get auditoria_horas).",
+        )
+        parser.add_argument(
+            "--escala",
+            type=float,
+            default=1.0,
+            help="Multiplica as quantidades da carga sintética (padrão: 1.0, cerca de 20 mil lançamentos).",
+        )
+        parser.add_argument("--seed", type=int, default=42, help="Semente da carga sintética (padrão: 42).")
+        parser.add_argument(
+            "--banco-atual",
+            action="store_true",
+            help="Usa o banco configurado, com os dados que já tem, em vez de um banco descartável. "
+                 "Atenção: os cenários de POST gravam lançamentos e marcam notificações como lidas.",
+        )
+        parser.add_argument("--saida", type=str, help="Arquivo JSON onde gravar os resultados (pode virar a nova linha de base).")
+        parser.add_argument("--baseline", type=str, help="Arquivo JSON de uma execução anterior para comparar.")
+        parser.add_argument("--tolerancia-latencia", type=float, default=25, help="Piora tolerada no p95, em %% (padrão: 25).")
+        parser.add_argument("--tolerancia-memoria", type=float, default=25, help="Piora tolerada no pico de memória, em %% (padrão: 25).")
+        parser.add_argument("--tolerancia-consultas", type=int, default=0, help="Consultas a mais toleradas por requisição (padrão: 0).")
+        parser.add_argument("--folga-ms", type=float, default=5, help="Folga absoluta somada ao limite do p95, em ms (padrão: 5).")
+
+    def handle(self, *args, **kwargs):
+        if kwargs["iteracoes"] < 1 or kwargs["escala"] <= 0:
+            raise CommandError("--iteracoes deve ser pelo menos 1 e --escala deve ser positiva.")
+
+        baseline = None
+        if kwargs["baseline"]:
+            try:
+                with open(kwargs["baseline"], encoding="utf-8") as arquivo:
+                    baseline = json.load(arquivo)
+            except (OSError, ValueError) as erro:
+                raise CommandError(f"Não foi possível ler a linha de base: {erro}")
+
+        quantidades = None
+        if not kwargs["banco_atual"]:
+            quantidades = {
+                nome: max(1, round(valor * kwargs["escala"]))
+                for nome, valor in benchmark.QUANTIDADES_BENCHMARK.items()
+            }
+
+        setup_test_environment()
+        nome_original = connection.settings_dict["NAME"]
+        try:
+            if quantidades:
+                connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+                self.stdout.write("Gerando a carga sintética...")
+                gerar_carga(semente=kwargs["seed"], prefixo="bench", **quantidades)
+            # PDFs e cache de PDFs em um diretório temporário, descartado no final
+            with tempfile.TemporaryDirectory() as diretorio, override_settings(RELATORIOS_DIR=diretorio):
+                self.stdout.write(f"{'cenário':<32} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'consultas':>10} {'pico KB':>10}")
+                cenarios = benchmark.executar(kwargs["iteracoes"], kwargs["cenarios"], relatar=self._relatar)
+        finally:
+            if quantidades:
+                connection.creation.destroy_test_db(nome_original, verbosity=0)
+            teardown_test_environment()
+
+        falhas = [f"{nome}: status {m['status']}" for nome, m in cenarios.items() if max(m["status"]) >= 400]
+
+        resultado = {
+            "gerado_em": timezone.now().isoformat(),
+            "banco": settings.DATABASES["default"]["ENGINE"],
+            "python": platform.python_version(),
+            "quantidades": quantidades,
+            "seed": kwargs["seed"] if quantidades else None,
+            "iteracoes": kwargs["iteracoes"],
+            "cenarios": cenarios,
+        }
+        if kwargs["saida"]:
+            with open(kwargs["saida"], "w", encoding="utf-8") as arquivo:
+                json.dump(resultado, arquivo, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Resultados gravados em {kwargs['saida']}."))
+
+        if baseline is not None:
+            if (baseline.get("quantidades"), baseline.get("seed")) != (resultado["quantidades"], resultado["seed"]):
+                self.stdout.write(self.style.WARNING("A linha de base foi medida com outra carga; a comparação pode não ser justa."))
+            falhas += benchmark.comparar(
+                cenarios,
+                baseline.get("cenarios", {}),
+                tolerancia_latencia=kwargs["tolerancia_latencia"],
+                tolerancia_memoria=kwargs["tolerancia_memoria"],
+                tolerancia_consultas=kwargs["tolerancia_consultas"],
+                folga_ms=kwargs["folga_ms"],
+            )
+
+        for falha in falhas:
+            self.stdout.write(self.style.ERROR(falha))
+        if falhas:
+            raise CommandError(f"{len(falhas)} problema(s) encontrado(s) no benchmark.")
+        self.stdout.write(self.style.SUCCESS(f"{len(cenarios)} cenário(s) medido(s) sem regressões."))
+
+    def _relatar(self, nome, m):
+        self.stdout.write(
+            f"{nome:<32} {m['p50_ms']:>9} {m['p95_ms']:>9} {m['p99_ms']:>9} {m['consultas']:>10} {m['pico_memoria_kb']:>10}"
+        )
@@ -0,0 +1,42 @@
+# core/management/commands/collapse_perfis.py
+
+from django.core.management.base import BaseCommand, CommandError
+from core.perfilador import agregar, carregar_perfis
+
+
+class Command(BaseCommand):
+    help = (
+        "Junta os perfis gravados pelo perfilador em um arquivo de pilhas no formato collapsed "
+        "(entrada do flamegraph.pl, do speedscope ou do inferno) e resume o tempo por fase."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rota", type=str, help="Usa só os perfis desta rota (ex.: auditoria_horas).")
+        parser.add_argument(
+            "--saida",
+            type=str,
+            help="Arquivo onde gravar as pilhas. Sem ele, as pilhas vão para a saída padrão e o resumo para a de erro.",
+        )
+
+    def handle(self, *args, **kwargs):
+        pilhas, resumo = agregar(carregar_perfis(kwargs["rota"]))
+        if not resumo["perfis"]:
+            raise CommandError("Nenhum perfil encontrado.")
+
+        linhas = "".join(f"{pilha} {amostras}\n" for pilha, amostras in pilhas.most_common())
+        if kwargs["saida"]:
+            with open(kwargs["saida"], "w", encoding="utf-8") as arquivo:
+                arquivo.write(linhas)
+            relatorio = self.stdout
+        else:
+            self.stdout.write(linhas, ending="")
+            relatorio = self.stderr
+
+        relatorio.write(
+            f"{resumo['perfis']} perfil(is), {resumo['duracao_ms']:.0f} ms no total, "
+            f"{resumo['banco_ms']:.0f} ms medidos no banco."
+        )
+        for fase, ms in sorted(resumo["fases_ms"].items(), key=lambda item: -item[1]):
+            relatorio.write(f"  {fase:<10} {ms:>10.0f} ms ({ms / resumo['duracao_ms']:.0%})")
+        if kwargs["saida"]:
+            self.stdout.write(self.style.SUCCESS(f"Pilhas gravadas em {kwargs['saida']}."))
@@ -0,0 +1,51 @@
+# core/management/commands/import_servidores.py
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from core.importacao import SENHA_PADRAO, importar_servidores
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa servidores em massa de um CSV com as colunas nome, email, cpf, siape, titulacao e unidade. "
+        "O login é o SIAPE. Linhas com erro são listadas e não são importadas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("arquivo", type=str, help="Caminho do arquivo CSV.")
+        parser.add_argument("--validar", action="store_true", help="Apenas valida o arquivo, sem gravar nada.")
+        parser.add_argument("--senha", type=str, default=SENHA_PADRAO, help=f"Senha inicial dos servidores (padrão: {SENHA_PADRAO}).")
+        parser.add_argument("--lote", type=int, default=1000, help="Linhas por bulk_create (padrão: 1000).")
+        parser.add_argument(
+            "--processos",
+            type=int,
+            help="Processos usados para criptografar as senhas (padrão: IMPORTACAO_PROCESSOS).",
+        )
+
+    def handle(self, *args, **kwargs):
+        if kwargs["lote"] < 1:
+            raise CommandError("--lote deve ser pelo menos 1.")
+        try:
+            with open(kwargs["arquivo"], "rb") as arquivo:
+                conteudo = arquivo.read()
+        except OSError as erro:
+            raise CommandError(f"Não foi possível ler o arquivo: {erro}")
+
+        try:
+            resultado = importar_servidores(
+                conteudo,
+                senha=kwargs["senha"],
+                somente_validar=kwargs["validar"],
+                tamanho_lote=kwargs["lote"],
+                processos=kwargs["processos"],
+            )
+        except ValidationError as erro:
+            raise CommandError(" ".join(erro.messages))
+
+        for numero, mensagem in resultado.erros:
+            self.stdout.write(self.style.WARNING(f"Linha {numero}: {mensagem}"))
+
+        acao = "válido(s) para importar" if kwargs["validar"] else "importado(s)"
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado.criados} de {resultado.total} servidor(es) {acao}; {len(resultado.erros)} linha(s) com erro."
+        ))
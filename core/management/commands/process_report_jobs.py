@@ -0,0 +1,142 @@
+# core/management/commands/process_report_jobs.py
+
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from core.relatorios import (
+    devolver_jobs, devolver_jobs_abandonados, falhar_jobs, limpar_jobs_antigos, processar_job,
+    reservar_proximos_jobs,
+)
+
+MOTIVO_POOL_QUEBRADO = (
+    "O processo que gerava este relatório foi encerrado inesperadamente (por exemplo, por falta de memória)."
+)
+
+
+def _inicializar_processo():
+    # Cada processo do pool precisa do Django configurado e de conexões próprias com o banco.
+    django.setup()
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = "Worker da fila de relatórios: gera em segundo plano os PDFs solicitados pelos usuários."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=2,
+            help="Número de processos gerando PDFs em paralelo (0 processa no próprio processo do comando).",
+        )
+        parser.add_argument(
+            "--intervalo",
+            type=float,
+            default=2.0,
+            help="Segundos de espera entre as consultas à fila quando não há jobs pendentes.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Processa os jobs pendentes no momento e termina.",
+        )
+
+    def handle(self, *args, **kwargs):
+        workers = kwargs["workers"]
+        intervalo = kwargs["intervalo"]
+        uma_vez = kwargs["once"]
+
+        self.proxima_limpeza = 0.0
+        self.manutencao()
+
+        if workers == 0:
+            self.processar_em_serie(intervalo, uma_vez)
+            return
+
+        # Um processo do pool que morre (ex.: falta de memória) quebra o pool inteiro: os jobs
+        # afetados são resolvidos e um pool novo é criado.
+        while not self.processar_com_pool(workers, intervalo, uma_vez):
+            self.stderr.write(self.style.ERROR("Pool de processos quebrado; criando um novo."))
+
+        self.stdout.write(self.style.SUCCESS("Fila de relatórios processada."))
+
+    def processar_com_pool(self, workers, intervalo, uma_vez):
+        """Processa a fila com um pool de processos. Retorna False se o pool quebrou."""
+        # As conexões abertas não podem ser herdadas pelos processos filhos.
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_inicializar_processo) as executor:
+            em_andamento = {}
+            while True:
+                quebrados = [
+                    job_id for futuro, job_id in em_andamento.items()
+                    if futuro.done() and isinstance(futuro.exception(), BrokenProcessPool)
+                ]
+                em_andamento = {futuro: job_id for futuro, job_id in em_andamento.items() if not futuro.done()}
+                if quebrados:
+                    self.resolver_pool_quebrado(quebrados + list(em_andamento.values()), [])
+                    return False
+
+                vagas = workers - len(em_andamento)
+                job_ids = reservar_proximos_jobs(vagas) if vagas > 0 else []
+
+                for indice, job_id in enumerate(job_ids):
+                    try:
+                        futuro = executor.submit(processar_job, job_id)
+                    except BrokenProcessPool:
+                        self.resolver_pool_quebrado(list(em_andamento.values()), job_ids[indice:])
+                        return False
+                    futuro.add_done_callback(self.relatar(job_id))
+                    em_andamento[futuro] = job_id
+
+                if uma_vez and not job_ids and not em_andamento:
+                    return True
+                if not job_ids:
+                    self.manutencao()
+                    time.sleep(intervalo if not uma_vez else 0.1)
+
+    def resolver_pool_quebrado(self, em_execucao, nao_enviados):
+        # Não dá para saber qual job derrubou o processo: os que estavam em execução viram erro
+        # (voltar à fila repetiria a queda), os que nem foram enviados voltam para a fila.
+        falhos = falhar_jobs(em_execucao, MOTIVO_POOL_QUEBRADO)
+        devolvidos = devolver_jobs(nao_enviados)
+        self.stderr.write(self.style.ERROR(
+            f"{falhos} job(s) marcado(s) com erro e {devolvidos} devolvido(s) à fila após a queda do pool."
+        ))
+
+    def processar_em_serie(self, intervalo, uma_vez):
+        while True:
+            job_ids = reservar_proximos_jobs(1)
+            for job_id in job_ids:
+                self.stdout.write(f"Job {job_id}: {processar_job(job_id)}")
+            if not job_ids:
+                if uma_vez:
+                    break
+                self.manutencao()
+                time.sleep(intervalo)
+        self.stdout.write(self.style.SUCCESS("Fila de relatórios processada."))
+
+    def manutencao(self):
+        # Só os jobs parados há mais de RELATORIOS_JOB_TIMEOUT: os recentes podem estar com outro worker vivo.
+        recuperados = devolver_jobs_abandonados()
+        if recuperados:
+            self.stdout.write(self.style.WARNING(f"{recuperados} job(s) abandonado(s) devolvido(s) à fila."))
+
+        # A retenção percorre o diretório dos relatórios: roda no máximo a cada RELATORIOS_LIMPEZA_INTERVALO
+        if time.monotonic() >= self.proxima_limpeza:
+            self.proxima_limpeza = time.monotonic() + settings.RELATORIOS_LIMPEZA_INTERVALO
+            removidos = limpar_jobs_antigos()
+            if removidos:
+                self.stdout.write(f"{removidos} relatório(s) antigo(s) removido(s).")
+
+    def relatar(self, job_id):
+        def callback(futuro):
+            if futuro.exception():
+                self.stderr.write(self.style.ERROR(f"Job {job_id}: {futuro.exception()}"))
+            else:
+                self.stdout.write(f"Job {job_id}: {futuro.result()}")
+        return callback
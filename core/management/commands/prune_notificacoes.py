@@ -0,0 +1,44 @@
+# core/management/commands/prune_notificacoes.py
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from core.notificacoes import expurgar_lidas
+
+
+class Command(BaseCommand):
+    help = "Remove (opcionalmente arquivando) as notificações já lidas mais antigas que N dias."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dias",
+            type=int,
+            default=90,
+            help="Idade mínima, em dias, das notificações lidas a remover (padrão: 90).",
+        )
+        parser.add_argument(
+            "--lote",
+            type=int,
+            default=1000,
+            help="Quantidade de notificações removidas por transação (padrão: 1000).",
+        )
+        parser.add_argument(
+            "--arquivo",
+            type=str,
+            help="Arquivo .jsonl onde as notificações removidas são acrescentadas antes da remoção.",
+        )
+
+    def handle(self, *args, **kwargs):
+        if kwargs["dias"] < 0 or kwargs["lote"] < 1:
+            raise CommandError("--dias não pode ser negativo e --lote deve ser pelo menos 1.")
+
+        antes_de = timezone.now() - timedelta(days=kwargs["dias"])
+
+        if kwargs["arquivo"]:
+            with open(kwargs["arquivo"], "a", encoding="utf-8") as arquivo:
+                total = expurgar_lidas(antes_de, kwargs["lote"], arquivo)
+        else:
+            total = expurgar_lidas(antes_de, kwargs["lote"])
+
+        self.stdout.write(self.style.SUCCESS(f"{total} notificação(ões) lida(s) removida(s)."))
@@ -0,0 +1,22 @@
+# core/management/commands/prune_report_jobs.py
+
+from django.core.management.base import BaseCommand, CommandError
+from core.relatorios import limpar_jobs_antigos
+
+
+class Command(BaseCommand):
+    help = "Remove os relatórios gerados (jobs e PDFs) concluídos há mais de N dias."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dias",
+            type=int,
+            help="Idade mínima, em dias, dos relatórios a remover (padrão: RELATORIOS_RETENCAO_DIAS).",
+        )
+
+    def handle(self, *args, **kwargs):
+        if kwargs["dias"] is not None and kwargs["dias"] < 0:
+            raise CommandError("--dias não pode ser negativo.")
+
+        total = limpar_jobs_antigos(kwargs["dias"])
+        self.stdout.write(self.style.SUCCESS(f"{total} relatório(s) antigo(s) removido(s)."))
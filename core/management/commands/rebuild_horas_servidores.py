@@ -0,0 +1,32 @@
+# core/management/commands/rebuild_horas_servidores.py
+
+from django.core.management.base import BaseCommand, CommandError
+from core.saldo import verificar_horas_servidores
+
+
+class Command(BaseCommand):
+    help = "Reconcilia os contadores anuais de horas dos servidores com os lançamentos."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Apenas relata as divergências e termina com erro se houver alguma, sem gravar nada.",
+        )
+
+    def handle(self, *args, **kwargs):
+        somente_verificar = kwargs["check"]
+
+        divergencias = verificar_horas_servidores(corrigir=not somente_verificar)
+
+        for descricao, persistido, esperado in divergencias:
+            self.stdout.write(
+                self.style.WARNING(f"{descricao} persistido={persistido} esperado={esperado}")
+            )
+
+        if not divergencias:
+            self.stdout.write(self.style.SUCCESS("Todos os contadores de horas estão consistentes."))
+        elif somente_verificar:
+            raise CommandError(f"{len(divergencias)} divergência(s) encontrada(s) nos contadores de horas.")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"{len(divergencias)} divergência(s) corrigida(s)."))
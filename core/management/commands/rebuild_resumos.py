@@ -0,0 +1,33 @@
+# core/management/commands/rebuild_resumos.py
+
+from django.core.management.base import BaseCommand, CommandError
+from core.resumos import verificar_resumos
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstrói (ou apenas verifica) os resumos dos painéis, por edital e por unidade demandante, "
+        "a partir dos lançamentos, editais e saldos. Rode rebuild_saldos antes se os saldos também divergirem."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Apenas verifica os resumos e termina com erro se houver divergência, sem gravar nada.",
+        )
+
+    def handle(self, *args, **kwargs):
+        somente_verificar = kwargs["check"]
+
+        divergencias = verificar_resumos(corrigir=not somente_verificar)
+
+        for descricao, persistido, esperado in divergencias:
+            self.stdout.write(self.style.WARNING(f"{descricao} persistido={persistido} esperado={esperado}"))
+
+        if not divergencias:
+            self.stdout.write(self.style.SUCCESS("Todos os resumos estão consistentes."))
+        elif somente_verificar:
+            raise CommandError(f"{len(divergencias)} divergência(s) encontrada(s) nos resumos.")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"{len(divergencias)} divergência(s) corrigida(s)."))
@@ -0,0 +1,34 @@
+# core/management/commands/rebuild_saldos.py
+
+from django.core.management.base import BaseCommand, CommandError
+from core.saldo import verificar_saldos
+
+
+class Command(BaseCommand):
+    help = "Reconstrói (ou apenas verifica) o saldo corrente de empenho de cada edital a partir dos lançamentos."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Apenas verifica os saldos e termina com erro se houver divergência, sem gravar nada.",
+        )
+
+    def handle(self, *args, **kwargs):
+        somente_verificar = kwargs["check"]
+
+        divergencias = verificar_saldos(corrigir=not somente_verificar)
+
+        for edital_id, coluna, persistido, esperado in divergencias:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"Edital {edital_id}: {coluna} persistido={persistido} esperado={esperado}"
+                )
+            )
+
+        if not divergencias:
+            self.stdout.write(self.style.SUCCESS("Todos os saldos estão consistentes."))
+        elif somente_verificar:
+            raise CommandError(f"{len(divergencias)} divergência(s) encontrada(s) nos saldos.")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"{len(divergencias)} divergência(s) corrigida(s)."))
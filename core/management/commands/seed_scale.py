@@ -0,0 +1,50 @@
+# core/management/commands/seed_scale.py
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from core.carga import PADROES, gerar_carga
+
+
+class Command(BaseCommand):
+    help = (
+        "Gera dados sintéticos em volume de produção (unidades, usuários, editais, atividades, alocações, "
+        "lançamentos e notificações) com bulk_create, para testes de carga. Sem signals por linha: os saldos, "
+        "contadores de horas e resumos são reconstruídos no final."
+    )
+
+    def add_arguments(self, parser):
+        for nome, padrao in PADROES.items():
+            parser.add_argument(
+                f"--{nome.replace('_', '-')}",
+                dest=nome,
+                type=int,
+                default=padrao,
+                help=f"Quantidade de {nome.replace('_', ' ')} (padrão: {padrao}).",
+            )
+        parser.add_argument("--seed", type=int, default=42, help="Semente do gerador; a mesma semente gera os mesmos dados (padrão: 42).")
+        parser.add_argument("--prefixo", type=str, default="carga", help="Prefixo dos usernames e números de edital (padrão: carga).")
+        parser.add_argument("--lote", type=int, default=5000, help="Quantidade de linhas por bulk_create (padrão: 5000).")
+        parser.add_argument("--anos", type=int, default=3, help="Quantos anos para trás os editais são espalhados (padrão: 3).")
+        parser.add_argument("--senha", type=str, default="password123", help="Senha de todos os usuários gerados (padrão: password123).")
+
+    def handle(self, *args, **kwargs):
+        quantidades = {nome: kwargs[nome] for nome in PADROES}
+        if any(valor < 0 for valor in quantidades.values()) or kwargs["lote"] < 1 or kwargs["anos"] < 1:
+            raise CommandError("As quantidades não podem ser negativas; --lote e --anos devem ser pelo menos 1.")
+
+        if User.objects.filter(username__startswith=f"{kwargs['prefixo']}_").exists():
+            raise CommandError(f"Já existem usuários com o prefixo '{kwargs['prefixo']}'. Use outro --prefixo.")
+
+        criados = gerar_carga(
+            semente=kwargs["seed"],
+            prefixo=kwargs["prefixo"],
+            tamanho_lote=kwargs["lote"],
+            senha=kwargs["senha"],
+            anos=kwargs["anos"],
+            relatar=self.stdout.write,
+            **quantidades,
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Carga '{kwargs['prefixo']}' gerada: {criados['lancamentos']} lançamento(s) em {criados['editais']} edital(is)."
+        ))
@@ -0,0 +1,62 @@
+# core/middleware.py
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.utils.decorators import sync_and_async_middleware
+
+from .instrumentacao import instrumentar
+from .notificacoes import agendar_gravacao, encerrar_buffer, iniciar_buffer
+from .perfilador import deve_perfilar, perfilar
+
+
+@sync_and_async_middleware
+def notificacoes_middleware(get_response):
+    """Abre um buffer de notificações por requisição e grava tudo de uma vez no final."""
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            token = iniciar_buffer()
+            try:
+                return await get_response(request)
+            finally:
+                await sync_to_async(agendar_gravacao)(encerrar_buffer(token))
+    else:
+        def middleware(request):
+            token = iniciar_buffer()
+            try:
+                return get_response(request)
+            finally:
+                agendar_gravacao(encerrar_buffer(token))
+
+    return middleware
+
+
+@sync_and_async_middleware
+def instrumentacao_middleware(get_response):
+    """Mede tempo, consultas e tamanho de cada requisição síncrona (ver core/instrumentacao.py)."""
+    if iscoroutinefunction(get_response):
+        # As consultas das views assíncronas rodam em outras threads (sync_to_async), fora do
+        # execute_wrapper desta conexão, e o stream dura o tempo que o usuário ficar na página.
+        async def middleware(request):
+            return await get_response(request)
+    else:
+        def middleware(request):
+            if not settings.INSTRUMENTACAO_ATIVA:
+                return get_response(request)
+            return instrumentar(request, get_response)
+
+    return middleware
+
+
+@sync_and_async_middleware
+def perfilador_middleware(get_response):
+    """Perfila as requisições sorteadas ou pedidas pela equipe (ver core/perfilador.py)."""
+    if iscoroutinefunction(get_response):
+        # O amostrador acompanha uma thread; as views assíncronas pulam de thread em thread
+        async def middleware(request):
+            return await get_response(request)
+    else:
+        def middleware(request):
+            if not deve_perfilar(request):
+                return get_response(request)
+            return perfilar(request, get_response)
+
+    return middleware
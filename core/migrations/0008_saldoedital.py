@@ -0,0 +1,60 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import DecimalField, ExpressionWrapper, F, Q, Sum
+
+
+def popular_saldos(apps, schema_editor):
+    Edital = apps.get_model('core', 'Edital')
+    LancamentoHoras = apps.get_model('core', 'LancamentoHoras')
+    SaldoEdital = apps.get_model('core', 'SaldoEdital')
+
+    valor = ExpressionWrapper(
+        F('horas') * F('atividade__tipo__valor_hora'),
+        output_field=DecimalField(max_digits=16, decimal_places=4),
+    )
+    totais = {
+        linha['edital_id']: linha
+        for linha in LancamentoHoras.objects.values('edital_id').annotate(
+            valor_pendente=Sum(valor, filter=Q(status='Pendente')),
+            valor_recusado=Sum(valor, filter=Q(status='Recusado')),
+            valor_comprometido=Sum(valor, filter=~Q(status__in=['Pendente', 'Recusado'])),
+        ).order_by()
+    }
+
+    SaldoEdital.objects.bulk_create([
+        SaldoEdital(
+            edital_id=edital_id,
+            valor_comprometido=totais.get(edital_id, {}).get('valor_comprometido') or 0,
+            valor_pendente=totais.get(edital_id, {}).get('valor_pendente') or 0,
+            valor_recusado=totais.get(edital_id, {}).get('valor_recusado') or 0,
+        )
+        for edital_id in Edital.objects.values_list('pk', flat=True)
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_popular_catalogo_atividades'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaldoEdital',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('valor_comprometido', models.DecimalField(decimal_places=4, default=0, max_digits=16)),
+                ('valor_pendente', models.DecimalField(decimal_places=4, default=0, max_digits=16)),
+                ('valor_recusado', models.DecimalField(decimal_places=4, default=0, max_digits=16)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('edital', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='saldo', to='core.edital')),
+            ],
+            options={
+                'verbose_name': 'Saldo do Edital',
+                'verbose_name_plural': 'Saldos dos Editais',
+            },
+        ),
+        migrations.RunPython(popular_saldos, reverse_code=migrations.RunPython.noop),
+    ]
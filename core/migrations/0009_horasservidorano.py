@@ -0,0 +1,73 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:16
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Q, Sum
+from django.db.models.functions import ExtractYear
+from django.utils import timezone
+
+
+def popular_horas_servidores(apps, schema_editor):
+    LancamentoHoras = apps.get_model('core', 'LancamentoHoras')
+    HorasServidorAno = apps.get_model('core', 'HorasServidorAno')
+    ServidorProfile = apps.get_model('core', 'ServidorProfile')
+
+    linhas = LancamentoHoras.objects.annotate(ano=ExtractYear('data')).values('servidor_id', 'ano').annotate(
+        horas_pendentes=Sum('horas', filter=Q(status='Pendente')),
+        horas_recusadas=Sum('horas', filter=Q(status='Recusado')),
+        horas_comprometidas=Sum('horas', filter=~Q(status__in=['Pendente', 'Recusado'])),
+    ).order_by()
+
+    contadores = [
+        HorasServidorAno(
+            servidor_id=linha['servidor_id'],
+            ano=linha['ano'],
+            horas_pendentes=linha['horas_pendentes'] or 0,
+            horas_recusadas=linha['horas_recusadas'] or 0,
+            horas_comprometidas=linha['horas_comprometidas'] or 0,
+        )
+        for linha in linhas
+    ]
+    HorasServidorAno.objects.bulk_create(contadores)
+
+    ano_corrente = timezone.localdate().year
+    for contador in contadores:
+        if contador.ano == ano_corrente:
+            ServidorProfile.objects.filter(user_id=contador.servidor_id).update(
+                horas_utilizadas=contador.horas_pendentes + contador.horas_comprometidas
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_saldoedital'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='servidorprofile',
+            name='horas_utilizadas',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=7),
+        ),
+        migrations.CreateModel(
+            name='HorasServidorAno',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ano', models.PositiveSmallIntegerField()),
+                ('horas_comprometidas', models.DecimalField(decimal_places=2, default=0, max_digits=9)),
+                ('horas_pendentes', models.DecimalField(decimal_places=2, default=0, max_digits=9)),
+                ('horas_recusadas', models.DecimalField(decimal_places=2, default=0, max_digits=9)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('servidor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='horas_por_ano', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Horas do Servidor no Ano',
+                'verbose_name_plural': 'Horas dos Servidores por Ano',
+                'constraints': [models.UniqueConstraint(fields=('servidor', 'ano'), name='horas_servidor_ano_unico')],
+            },
+        ),
+        migrations.RunPython(popular_horas_servidores, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_relatoriojob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='edital',
+            index=models.Index(fields=['status', 'data_inicio'], name='edital_status_inicio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='edital',
+            index=models.Index(fields=['criado_por', '-created_at'], name='edital_criador_criacao_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lancamentohoras',
+            index=models.Index(condition=models.Q(('status', 'Pendente')), fields=['edital', '-data', '-id'], name='lanc_pendente_edital_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lancamentohoras',
+            index=models.Index(fields=['servidor', '-data', '-id'], name='lanc_servidor_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notificacao',
+            index=models.Index(condition=models.Q(('lida', False)), fields=['usuario', '-created_at'], name='notif_nao_lidas_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='relatoriojob',
+            index=models.Index(condition=models.Q(('status', 'Pendente')), fields=['created_at'], name='relatorio_job_pendente_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servidorprofile',
+            index=models.Index(fields=['status'], name='servidor_status_idx'),
+        ),
+    ]
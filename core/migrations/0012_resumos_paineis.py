@@ -0,0 +1,108 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:49
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, Q, Sum
+
+
+def popular_resumos(apps, schema_editor):
+    Edital = apps.get_model('core', 'Edital')
+    LancamentoHoras = apps.get_model('core', 'LancamentoHoras')
+    SaldoEdital = apps.get_model('core', 'SaldoEdital')
+    ResumoEdital = apps.get_model('core', 'ResumoEdital')
+    ResumoUnidade = apps.get_model('core', 'ResumoUnidade')
+
+    totais_lancamentos = dict(
+        lancamentos_pendentes=Count('pk', filter=Q(status='Pendente')),
+        lancamentos_aprovados=Count('pk', filter=Q(status='Aprovado')),
+        horas_pendentes=Sum('horas', filter=Q(status='Pendente')),
+        horas_comprometidas=Sum('horas', filter=~Q(status__in=['Pendente', 'Recusado'])),
+    )
+    colunas = list(totais_lancamentos)
+
+    por_edital = {
+        linha['edital_id']: linha
+        for linha in LancamentoHoras.objects.values('edital_id').annotate(**totais_lancamentos).order_by()
+    }
+    ResumoEdital.objects.bulk_create([
+        ResumoEdital(edital_id=edital_id, **{c: por_edital.get(edital_id, {}).get(c) or 0 for c in colunas})
+        for edital_id in Edital.objects.values_list('pk', flat=True)
+    ])
+
+    por_demandante = {
+        linha['demandante_id']: linha
+        for linha in LancamentoHoras.objects.values(demandante_id=F('edital__criado_por_id'))
+        .annotate(**totais_lancamentos).order_by()
+    }
+    saldos = {
+        linha['demandante_id']: linha
+        for linha in SaldoEdital.objects.values(demandante_id=F('edital__criado_por_id')).annotate(
+            total_pendente=Sum('valor_pendente'), total_comprometido=Sum('valor_comprometido'),
+        ).order_by()
+    }
+    ResumoUnidade.objects.bulk_create([
+        ResumoUnidade(
+            demandante_id=linha['demandante_id'],
+            editais_aguardando_homologacao=linha['total_aguardando'],
+            editais_ativos=linha['total_ativos'],
+            valor_empenho=linha['total_empenho'] or 0,
+            valor_pendente=saldos.get(linha['demandante_id'], {}).get('total_pendente') or 0,
+            valor_comprometido=saldos.get(linha['demandante_id'], {}).get('total_comprometido') or 0,
+            **{c: por_demandante.get(linha['demandante_id'], {}).get(c) or 0 for c in colunas},
+        )
+        for linha in Edital.objects.values(demandante_id=F('criado_por_id')).annotate(
+            total_aguardando=Count('pk', filter=Q(status='Aguardando Homologação')),
+            total_ativos=Count('pk', filter=Q(status__in=['Homologado', 'Ativo'])),
+            total_empenho=Sum('valor_empenho', filter=~Q(status='Recusado')),
+        ).order_by()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_indices_consultas_frequentes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumoEdital',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lancamentos_pendentes', models.IntegerField(default=0)),
+                ('lancamentos_aprovados', models.IntegerField(default=0)),
+                ('horas_pendentes', models.DecimalField(decimal_places=2, default=0, max_digits=9)),
+                ('horas_comprometidas', models.DecimalField(decimal_places=2, default=0, max_digits=9)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('edital', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='resumo', to='core.edital')),
+            ],
+            options={
+                'verbose_name': 'Resumo do Edital',
+                'verbose_name_plural': 'Resumos dos Editais',
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumoUnidade',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('editais_aguardando_homologacao', models.IntegerField(default=0)),
+                ('editais_ativos', models.IntegerField(default=0)),
+                ('lancamentos_pendentes', models.IntegerField(default=0)),
+                ('lancamentos_aprovados', models.IntegerField(default=0)),
+                ('horas_pendentes', models.DecimalField(decimal_places=2, default=0, max_digits=11)),
+                ('horas_comprometidas', models.DecimalField(decimal_places=2, default=0, max_digits=11)),
+                ('valor_empenho', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('valor_comprometido', models.DecimalField(decimal_places=4, default=0, max_digits=18)),
+                ('valor_pendente', models.DecimalField(decimal_places=4, default=0, max_digits=18)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('demandante', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='resumo_unidade', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Resumo da Unidade Demandante',
+                'verbose_name_plural': 'Resumos das Unidades Demandantes',
+            },
+        ),
+        migrations.RunPython(popular_resumos, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-18 17:02
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_resumos_paineis'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='servidorprofile',
+            name='horas_utilizadas',
+        ),
+    ]
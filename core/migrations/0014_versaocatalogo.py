@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:06
+
+from django.db import migrations, models
+
+
+def criar_versao(apps, schema_editor):
+    VersaoCatalogo = apps.get_model('core', 'VersaoCatalogo')
+    VersaoCatalogo.objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_remove_servidorprofile_horas_utilizadas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersaoCatalogo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('versao', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Versão do Catálogo',
+                'verbose_name_plural': 'Versão do Catálogo',
+            },
+        ),
+        migrations.RunPython(criar_versao, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0014_versaocatalogo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeracaoNotificacoes',
+            fields=[
+                ('usuario', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('geracao', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Geração das Notificações',
+                'verbose_name_plural': 'Gerações das Notificações',
+            },
+        ),
+    ]
@@ -1,8 +1,12 @@
 # core/models.py
-from django.db import models
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.db.models.signals import post_save
 from django.dispatch import receiver
+from django.utils import timezone
 from django.core.validators import MinValueValidator
 
 # NOVO MODELO PARA UNIDADES ORGANIZACIONAIS
@@ -48,17 +52,64 @@ class ServidorProfile(models.Model):
     status = models.CharField(max_length=30, choices=STATUS_CHOICES, default="Aguardando Homologação")
     telefone = models.CharField(max_length=20, blank=True)
     limite_horas_anual = models.IntegerField(default=120)
-    horas_utilizadas = models.IntegerField(default=0)
     
     # NOVOS CAMPOS ADICIONADOS
     titulacao = models.CharField(max_length=20, choices=TITULACAO_CHOICES, null=True, blank=True)
     unidade = models.ForeignKey(Unidade, on_delete=models.SET_NULL, null=True, blank=True, related_name='servidores')
 
+    class Meta:
+        indexes = [
+            # homologar_servidores: fila de cadastros aguardando homologação
+            models.Index(fields=["status"], name="servidor_status_idx"),
+        ]
+
     def __str__(self):
         return self.user.get_full_name() or self.user.username
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.capturar_estado_original()
+        return instance
+
+    def capturar_estado_original(self):
+        """
+        Guarda os campos carregados (ou gravados), para que salvar o User só regrave o
+        perfil quando algum campo dele mudou (ver salvar_perfil_alterado).
+        """
+        self._estado_original = {
+            campo.attname: self.__dict__.get(campo.attname) for campo in self._meta.concrete_fields
+            if campo.attname in self.__dict__
+        }
+
+    def campos_alterados(self):
+        estado = getattr(self, '_estado_original', None)
+        if estado is None:
+            return None
+        return [attname for attname, valor in estado.items() if self.__dict__.get(attname) != valor]
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.capturar_estado_original()
+
+    @property
+    def horas_utilizadas(self):
+        """
+        Horas do ano corrente que já consomem o limite (pendentes ou aprovadas), lidas do
+        contador anual: na virada do ano o valor passa sozinho para o contador do ano novo.
+
+        Cada acesso faz uma consulta a HorasServidorAno (o valor não é guardado, para não
+        ir desatualizado no usuário em cache da sessão). Em listagens, não leia por perfil:
+        busque os contadores do ano numa só consulta (HorasServidorAno filtrado por
+        servidor__in e ano), e quem já tem o contador em mãos calcula a partir dele, como
+        faz resumos.indicadores_servidor.
+        """
+        contador = HorasServidorAno.objects.filter(servidor_id=self.user_id, ano=timezone.localdate().year).first()
+        return contador.horas_utilizadas if contador else 0
+
     @property
     def horas_disponiveis(self):
+        # Também consulta o contador anual, via horas_utilizadas
         return self.limite_horas_anual - self.horas_utilizadas
 
 class Edital(models.Model):
@@ -94,10 +145,33 @@ class Edital(models.Model):
         verbose_name = "Edital"
         verbose_name_plural = "Editais"
         ordering = ["-data_inicio"]
+        indexes = [
+            # homologar_editais (status + ordenação padrão) e auditoria_horas
+            models.Index(fields=["status", "data_inicio"], name="edital_status_inicio_idx"),
+            # listar_editais: editais do usuário ordenados por criação
+            models.Index(fields=["criado_por", "-created_at"], name="edital_criador_criacao_idx"),
+        ]
 
     def __str__(self):
         return f"{self.numero_edital} - {self.titulo}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.capturar_estado_original()
+        return instance
+
+    def capturar_estado_original(self):
+        """
+        Guarda os campos que entram no resumo da unidade demandante, para que o
+        signal de post_save saiba exatamente o que mudou (ver core/resumos.py).
+        """
+        self._estado_original = (
+            self.__dict__.get('status'),
+            self.__dict__.get('valor_empenho'),
+            self.__dict__.get('criado_por_id'),
+        )
+
 
 class TipoAtividade(models.Model):
     GRUPO_CHOICES = [
@@ -127,6 +201,36 @@ class TipoAtividade(models.Model):
     def __str__(self):
         return f"{self.nome} (R$ {self.valor_hora:.2f}/h)"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.capturar_estado_original()
+        return instance
+
+    def capturar_estado_original(self):
+        """
+        Guarda o valor/hora carregado, para que o signal de post_save saiba se o valor
+        dos lançamentos deste tipo mudou (ver core/saldo.py).
+        """
+        self._estado_original = self.__dict__.get('valor_hora')
+
+
+class VersaoCatalogo(models.Model):
+    """
+    Linha única com a versão do catálogo de tipos de atividade. Usada por core/catalogo.py
+    quando o cache do Django não é compartilhado entre os processos (CATALOGO_VERSAO_NO_BANCO).
+    """
+    UNICA = 1
+
+    versao = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Versão do Catálogo"
+        verbose_name_plural = "Versão do Catálogo"
+
+    def __str__(self):
+        return f"Catálogo v{self.versao}"
+
 
 class Atividade(models.Model):
     tipo = models.ForeignKey(TipoAtividade, on_delete=models.PROTECT, related_name="atividades_criadas")
@@ -144,6 +248,19 @@ class Atividade(models.Model):
     def __str__(self):
         return self.tipo.nome
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.capturar_estado_original()
+        return instance
+
+    def capturar_estado_original(self):
+        """
+        Guarda o tipo carregado, para que o signal de post_save saiba se o valor/hora
+        dos lançamentos desta atividade mudou (ver core/saldo.py).
+        """
+        self._estado_original = self.__dict__.get('tipo_id')
+
 
 class LancamentoHoras(models.Model):
     STATUS_CHOICES = [
@@ -175,10 +292,199 @@ class LancamentoHoras(models.Model):
         verbose_name = "Lançamento de Hora"
         verbose_name_plural = "Lançamentos de Horas"
         ordering = ["-data"]
+        indexes = [
+            # aprovar_horas: pendentes dos editais da unidade, por data (pk desempata a paginação)
+            models.Index(
+                fields=["edital", "-data", "-id"],
+                condition=models.Q(status="Pendente"),
+                name="lanc_pendente_edital_data_idx",
+            ),
+            # historico_lancamentos e validações de limite de horas do servidor
+            models.Index(fields=["servidor", "-data", "-id"], name="lanc_servidor_data_idx"),
+        ]
 
     def __str__(self):
         return f"Lançamento de {self.servidor.username} em {self.data}"
-    
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.capturar_estado_original()
+        return instance
+
+    def capturar_estado_original(self):
+        """
+        Guarda os campos que afetam o saldo do edital e as horas do servidor, para
+        que o signal de post_save saiba exatamente o que mudou (ver core/saldo.py).
+        """
+        self._estado_original = (
+            self.__dict__.get('status'),
+            self.__dict__.get('horas'),
+            self.__dict__.get('atividade_id'),
+            self.__dict__.get('edital_id'),
+            self.__dict__.get('servidor_id'),
+            self.__dict__.get('data'),
+        )
+
+    def save(self, *args, **kwargs):
+        # O saldo do edital é atualizado no post_save: ambos precisam estar na mesma transação.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
+
+
+class SaldoEdital(models.Model):
+    """
+    Saldo corrente de um edital, mantido incrementalmente a cada lançamento
+    criado ou alterado. Os valores são a soma de horas * valor_hora dos
+    lançamentos em cada situação.
+    """
+    edital = models.OneToOneField(Edital, on_delete=models.CASCADE, related_name="saldo")
+    valor_comprometido = models.DecimalField(max_digits=16, decimal_places=4, default=0)
+    valor_pendente = models.DecimalField(max_digits=16, decimal_places=4, default=0)
+    valor_recusado = models.DecimalField(max_digits=16, decimal_places=4, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Saldo do Edital"
+        verbose_name_plural = "Saldos dos Editais"
+
+    def __str__(self):
+        return f"Saldo de {self.edital.numero_edital}"
+
+    @property
+    def valor_utilizado(self):
+        # Tudo que não foi recusado consome o empenho (inclusive o que ainda está pendente).
+        return self.valor_comprometido + self.valor_pendente
+
+
+class HorasServidorAno(models.Model):
+    """
+    Contador das horas lançadas por um servidor em um ano (pela data do lançamento),
+    separado por situação, mantido incrementalmente como o SaldoEdital.
+    """
+    servidor = models.ForeignKey(User, on_delete=models.CASCADE, related_name="horas_por_ano")
+    ano = models.PositiveSmallIntegerField()
+    horas_comprometidas = models.DecimalField(max_digits=9, decimal_places=2, default=0)
+    horas_pendentes = models.DecimalField(max_digits=9, decimal_places=2, default=0)
+    horas_recusadas = models.DecimalField(max_digits=9, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Horas do Servidor no Ano"
+        verbose_name_plural = "Horas dos Servidores por Ano"
+        constraints = [
+            models.UniqueConstraint(fields=["servidor", "ano"], name="horas_servidor_ano_unico"),
+        ]
+
+    def __str__(self):
+        return f"Horas de {self.servidor.username} em {self.ano}"
+
+    @property
+    def horas_utilizadas(self):
+        return self.horas_comprometidas + self.horas_pendentes
+
+
+class ResumoEdital(models.Model):
+    """
+    Números de um edital para os painéis, mantidos incrementalmente junto com o
+    SaldoEdital (ver core/resumos.py). Os valores em R$ ficam no próprio SaldoEdital.
+    """
+    edital = models.OneToOneField(Edital, on_delete=models.CASCADE, related_name="resumo")
+    # Aguardando a aprovação da unidade demandante
+    lancamentos_pendentes = models.IntegerField(default=0)
+    # Aprovados pela unidade, aguardando a auditoria da PRODGEP
+    lancamentos_aprovados = models.IntegerField(default=0)
+    horas_pendentes = models.DecimalField(max_digits=9, decimal_places=2, default=0)
+    horas_comprometidas = models.DecimalField(max_digits=9, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Resumo do Edital"
+        verbose_name_plural = "Resumos dos Editais"
+
+    def __str__(self):
+        return f"Resumo de {self.edital.numero_edital}"
+
+
+class ResumoUnidade(models.Model):
+    """
+    Totais de todos os editais criados por um usuário da unidade demandante, para
+    que os painéis leiam uma única linha (ver core/resumos.py).
+    """
+    demandante = models.OneToOneField(User, on_delete=models.CASCADE, related_name="resumo_unidade")
+    editais_aguardando_homologacao = models.IntegerField(default=0)
+    editais_ativos = models.IntegerField(default=0)
+    lancamentos_pendentes = models.IntegerField(default=0)
+    lancamentos_aprovados = models.IntegerField(default=0)
+    horas_pendentes = models.DecimalField(max_digits=11, decimal_places=2, default=0)
+    horas_comprometidas = models.DecimalField(max_digits=11, decimal_places=2, default=0)
+    # Empenho dos editais que não foram recusados e o quanto dele já foi consumido
+    valor_empenho = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    valor_comprometido = models.DecimalField(max_digits=18, decimal_places=4, default=0)
+    valor_pendente = models.DecimalField(max_digits=18, decimal_places=4, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Resumo da Unidade Demandante"
+        verbose_name_plural = "Resumos das Unidades Demandantes"
+
+    def __str__(self):
+        return f"Resumo de {self.demandante.username}"
+
+    @property
+    def valor_utilizado(self):
+        return self.valor_comprometido + self.valor_pendente
+
+    @property
+    def saldo_restante(self):
+        return self.valor_empenho - self.valor_utilizado
+
+
+class RelatorioJob(models.Model):
+    """Pedido de geração de relatório em PDF, processado em segundo plano pelo comando process_report_jobs."""
+    TIPO_CHOICES = [
+        ("auditoria", "Auditoria completa"),
+        ("edital", "Relatório do edital"),
+    ]
+    STATUS_CHOICES = [
+        ("Pendente", "Pendente"),
+        ("Processando", "Processando"),
+        ("Concluído", "Concluído"),
+        ("Erro", "Erro"),
+    ]
+    tipo = models.CharField(max_length=20, choices=TIPO_CHOICES)
+    edital = models.ForeignKey(Edital, on_delete=models.CASCADE, null=True, blank=True, related_name="relatorios")
+    solicitado_por = models.ForeignKey(User, on_delete=models.CASCADE, related_name="relatorios_solicitados")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="Pendente")
+    arquivo = models.CharField(max_length=255, blank=True)
+    erro = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    iniciado_em = models.DateTimeField(null=True, blank=True)
+    concluido_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Relatório em Geração"
+        verbose_name_plural = "Relatórios em Geração"
+        ordering = ["-created_at"]
+        indexes = [
+            # process_report_jobs: próximos jobs da fila
+            models.Index(fields=["created_at"], condition=models.Q(status="Pendente"), name="relatorio_job_pendente_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} ({self.status})"
+
+    @property
+    def nome_arquivo(self):
+        if self.tipo == "edital" and self.edital_id:
+            return f'relatorio_edital_{self.edital.numero_edital.replace("/", "-")}.pdf'
+        return "relatorio_auditoria_horas.pdf"
+
+
 class Notificacao(models.Model):
     usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notificacoes')
     mensagem = models.TextField()
@@ -190,18 +496,73 @@ class Notificacao(models.Model):
         verbose_name = "Notificação"
         verbose_name_plural = "Notificações"
         ordering = ['-created_at']
+        indexes = [
+            # sino de notificações: não lidas do usuário, mais recentes primeiro
+            models.Index(fields=['usuario', '-created_at'], condition=models.Q(lida=False), name='notif_nao_lidas_idx'),
+        ]
 
     def __str__(self):
         return f"Notificação para {self.usuario.username}: {self.mensagem[:30]}..."
 
+
+class GeracaoNotificacoes(models.Model):
+    """
+    Geração do resumo do sino de um usuário, incrementada a cada notificação criada ou
+    marcada como lida. Usada por core/notificacoes.py quando o cache do Django não é
+    compartilhado entre os processos (NOTIFICACOES_GERACAO_NO_BANCO).
+    """
+    usuario = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='+')
+    geracao = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Geração das Notificações"
+        verbose_name_plural = "Gerações das Notificações"
+
+    def __str__(self):
+        return f"Notificações de {self.usuario_id} v{self.geracao}"
+
+
+_perfil_automatico = ContextVar('perfil_automatico', default=True)
+
+
+@contextmanager
+def sem_perfil_automatico():
+    """
+    Desliga a criação do ServidorProfile ao criar Users (ex.: cargas em massa que criam
+    os perfis elas mesmas, já preenchidos).
+    """
+    token = _perfil_automatico.set(False)
+    try:
+        yield
+    finally:
+        _perfil_automatico.reset(token)
+
+
 @receiver(post_save, sender=User)
-def create_or_update_user_profile(sender, instance, created, **kwargs):
+def criar_perfil_do_usuario(sender, instance, created, raw=False, **kwargs):
     """
-    Cria um ServidorProfile se o User é novo, ou apenas garante que ele exista.
+    Cria o ServidorProfile uma única vez, junto com o User. Não roda ao carregar fixtures
+    (raw), que trazem os perfis, nem dentro de sem_perfil_automatico().
     """
-    if created:
-        # get_or_create é a forma mais segura: ele cria o perfil somente se ele não existir.
-        ServidorProfile.objects.get_or_create(user=instance)
+    if created and not raw and _perfil_automatico.get():
+        # O User acabou de ser inserido: não há perfil a procurar. O create já deixa o perfil
+        # em user.servidorprofile, sem nova consulta.
+        ServidorProfile.objects.create(user=instance)
+
 
-    # Garante que, em qualquer salvamento do User, o profile associado também seja salvo.
-    instance.servidorprofile.save()
\ No newline at end of file
+@receiver(post_save, sender=User)
+def salvar_perfil_alterado(sender, instance, created, raw=False, **kwargs):
+    """
+    Mantém o costume de alterar user.servidorprofile e salvar o User, sem regravar o perfil
+    a cada salvamento do User (ex.: o last_login de cada login): o perfil só é gravado se
+    já estiver carregado no User e algum campo dele tiver mudado, e só com esses campos.
+    """
+    if created or raw:
+        return
+    # None também quando o perfil foi procurado e não existe
+    perfil = User.servidorprofile.related.get_cached_value(instance, default=None)
+    if perfil is None:
+        return
+    alterados = perfil.campos_alterados()
+    if alterados:
+        perfil.save(update_fields=alterados)
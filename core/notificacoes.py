@@ -0,0 +1,265 @@
+# core/notificacoes.py
+"""
+Serviço de notificações do sino: envio, cache por usuário e entrega em tempo real.
+
+Todo envio passa por notificar(). Durante uma requisição (NotificacoesMiddleware) os
+avisos ficam num buffer e são gravados juntos, com um único bulk_create, no fim da
+requisição e depois do commit; avisos repetidos para o mesmo usuário e grupo viram
+uma única notificação ("5 lançamentos seus foram APROVADOS.").
+
+O resumo do sino (total de não lidas e as NOTIFICACOES_LISTA_MAX mais recentes) fica
+no cache do Django, guardado sob uma geração por usuário. Depois do commit, criar
+notificações ou marcar como lidas incrementa a geração (cache.incr, atômico) e publica
+no canal do usuário (core/pubsub.py); a próxima leitura monta o resumo de novo a partir
+do banco. Nenhum processo reescreve o resumo de outro, então escritas concorrentes não
+se perdem, e um resumo montado antes da escrita fica na geração antiga e não é mais
+lido. Sem cache compartilhado (NOTIFICACOES_GERACAO_NO_BANCO), o incremento no cache de
+um processo não chegaria aos outros: a geração fica então em GeracaoNotificacoes, lida
+do banco a cada consulta ao sino (uma consulta pela chave primária), e só o resumo fica
+no cache local. A view stream_notificacoes repassa as publicações ao
+navegador como Server-Sent Events. Criações com bulk_create não disparam signals,
+então quem usa bulk_create chama registrar_criadas diretamente.
+"""
+import json
+import uuid
+from collections import defaultdict, namedtuple
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import GeracaoNotificacoes, Notificacao
+from .pubsub import obter_pubsub
+
+
+def canal_do_usuario(usuario_id):
+    return f"notificacoes:{usuario_id}"
+
+
+def serializar(notificacao):
+    return {'id': notificacao.id, 'mensagem': notificacao.mensagem, 'link': notificacao.link}
+
+
+# --- RESUMO EM CACHE ---
+
+def _chave_geracao(usuario_id):
+    return f"notificacoes:geracao:{usuario_id}"
+
+
+def _chave_resumo(usuario_id, geracao):
+    return f"notificacoes:resumo:{usuario_id}:{geracao}"
+
+
+def _nova_versao():
+    return uuid.uuid4().hex[:16]
+
+
+def _geracao(usuario_id):
+    if settings.NOTIFICACOES_GERACAO_NO_BANCO:
+        geracao = GeracaoNotificacoes.objects.filter(usuario_id=usuario_id).values_list('geracao', flat=True).first()
+        return f"banco:{geracao or 0}"
+    chave = _chave_geracao(usuario_id)
+    geracao = cache.get(chave)
+    if geracao is None:
+        # Começa num valor aleatório: se a chave for descartada pelo cache, a contagem
+        # recomeça longe das gerações antigas e não reaproveita um resumo velho
+        cache.add(chave, uuid.uuid4().int >> 80, timeout=None)
+        geracao = cache.get(chave)
+    return geracao
+
+
+def resumo_nao_lidas(usuario_id):
+    """
+    Retorna {'count', 'notificacoes', 'versao'} do sino do usuário. Só consulta o banco
+    quando o resumo não está em cache; 'versao' muda a cada alteração e serve de ETag.
+    """
+    geracao = _geracao(usuario_id)
+    chave = _chave_resumo(usuario_id, geracao)
+    resumo = cache.get(chave)
+    if resumo is None:
+        notificacoes = Notificacao.objects.filter(usuario_id=usuario_id, lida=False)
+        resumo = {
+            'count': notificacoes.count(),
+            'notificacoes': [serializar(n) for n in notificacoes[:settings.NOTIFICACOES_LISTA_MAX]],
+            # Com a geração no banco, todos os processos dão a mesma versão (e o mesmo ETag) ao resumo
+            'versao': geracao if settings.NOTIFICACOES_GERACAO_NO_BANCO else _nova_versao(),
+        }
+        cache.set(chave, resumo, settings.NOTIFICACOES_CACHE_TIMEOUT)
+    return resumo
+
+
+def _invalidar_resumo(usuario_id):
+    if settings.NOTIFICACOES_GERACAO_NO_BANCO:
+        geracoes = GeracaoNotificacoes.objects.filter(usuario_id=usuario_id)
+        if not geracoes.update(geracao=F('geracao') + 1):
+            try:
+                with transaction.atomic():
+                    GeracaoNotificacoes.objects.create(usuario_id=usuario_id, geracao=1)
+            except IntegrityError:
+                # Criada por outro processo ao mesmo tempo
+                geracoes.update(geracao=F('geracao') + 1)
+        return
+    try:
+        cache.incr(_chave_geracao(usuario_id))
+    except ValueError:
+        # Geração ainda não existe: a próxima leitura cria uma nova e consulta o banco
+        pass
+
+
+# --- ESCRITA ---
+
+def registrar_criadas(notificacoes):
+    """
+    Depois do commit, invalida o resumo em cache de cada destinatário e publica as
+    notificações no canal do usuário. Chamado pelo post_save e por quem usa bulk_create.
+    """
+    por_usuario = defaultdict(list)
+    for notificacao in notificacoes:
+        por_usuario[notificacao.usuario_id].append(serializar(notificacao))
+
+    def aplicar():
+        pubsub = obter_pubsub()
+        for usuario_id, novas in por_usuario.items():
+            _invalidar_resumo(usuario_id)
+            for dados in novas:
+                pubsub.publicar(canal_do_usuario(usuario_id), {'tipo': 'nova', **dados})
+
+    transaction.on_commit(aplicar)
+
+
+def registrar_lidas(usuario_id):
+    """Invalida o resumo em cache e avisa as outras abas abertas do usuário, depois do commit."""
+    def aplicar():
+        _invalidar_resumo(usuario_id)
+        obter_pubsub().publicar(canal_do_usuario(usuario_id), {'tipo': 'lidas'})
+
+    transaction.on_commit(aplicar)
+
+
+@receiver(post_save, sender=Notificacao)
+def registrar_ao_criar(sender, instance, created, **kwargs):
+    if created:
+        registrar_criadas([instance])
+
+
+# --- ENVIO ---
+
+Aviso = namedtuple('Aviso', ['usuario_id', 'mensagem', 'link', 'grupo', 'mensagem_grupo'])
+
+_buffer = ContextVar('notificacoes_buffer', default=None)
+
+
+def notificar(usuario, mensagem, link=None, grupo=None, mensagem_grupo=None):
+    """
+    Agenda uma notificação para `usuario` (User ou id); ela só é gravada se a transação
+    atual confirmar. Avisos do mesmo `grupo` para o mesmo usuário são juntados em uma
+    notificação com `mensagem_grupo`, formatada com {total}.
+    """
+    aviso = Aviso(getattr(usuario, 'pk', usuario), mensagem, link, grupo, mensagem_grupo)
+    buffer = _buffer.get()
+    if buffer is None:
+        # Fora de uma requisição (comandos, worker de relatórios): grava no commit
+        transaction.on_commit(lambda: gravar([aviso]))
+    else:
+        transaction.on_commit(lambda: buffer.append(aviso))
+
+
+def compactar(avisos):
+    """Junta avisos do mesmo usuário e grupo (ou idênticos) e devolve as Notificacao a gravar."""
+    grupos = {}
+    for aviso in avisos:
+        chave = (aviso.usuario_id, aviso.grupo) if aviso.grupo else (aviso.usuario_id, None, aviso.mensagem, aviso.link)
+        grupos.setdefault(chave, []).append(aviso)
+
+    notificacoes = []
+    for iguais in grupos.values():
+        primeiro = iguais[0]
+        mensagem = primeiro.mensagem
+        if len(iguais) > 1 and primeiro.mensagem_grupo:
+            mensagem = primeiro.mensagem_grupo.format(total=len(iguais))
+        notificacoes.append(Notificacao(usuario_id=primeiro.usuario_id, mensagem=mensagem, link=primeiro.link))
+    return notificacoes
+
+
+def gravar(avisos):
+    notificacoes = Notificacao.objects.bulk_create(compactar(avisos))
+    registrar_criadas(notificacoes)
+    return notificacoes
+
+
+def iniciar_buffer():
+    return _buffer.set([])
+
+
+def encerrar_buffer(token):
+    """Fecha o buffer da requisição e devolve a lista de avisos acumulados."""
+    avisos = _buffer.get()
+    _buffer.reset(token)
+    return avisos
+
+
+def agendar_gravacao(avisos):
+    """
+    Grava os avisos do buffer depois do commit. Como os avisos entram no buffer por
+    on_commit, esta gravação (registrada por último) vê todos os das transações que confirmaram.
+    """
+    transaction.on_commit(lambda: avisos and gravar(avisos))
+
+
+# --- RETENÇÃO ---
+
+def expurgar_lidas(antes_de, tamanho_lote=1000, arquivo=None):
+    """
+    Remove, em lotes de `tamanho_lote`, as notificações lidas criadas antes de `antes_de`.
+    Com `arquivo` (aberto para escrita de texto), cada notificação é gravada antes como
+    uma linha JSON. Não lidas nunca são removidas. Retorna o total removido.
+    """
+    antigas = Notificacao.objects.filter(lida=True, created_at__lt=antes_de).order_by('pk')
+    total = 0
+    while True:
+        lote = list(antigas.values('pk', 'usuario_id', 'mensagem', 'link', 'created_at')[:tamanho_lote])
+        if not lote:
+            return total
+        if arquivo is not None:
+            for linha in lote:
+                arquivo.write(json.dumps({**linha, 'created_at': linha['created_at'].isoformat()}) + "\n")
+            arquivo.flush()
+        # Uma transação curta por lote, para não segurar locks na tabela inteira
+        with transaction.atomic():
+            total += Notificacao.objects.filter(pk__in=[linha['pk'] for linha in lote]).delete()[0]
+
+
+def _evento(tipo, dados, id_evento=None):
+    linhas = []
+    if id_evento is not None:
+        linhas.append(f"id: {id_evento}")
+    linhas.append(f"event: {tipo}")
+    linhas.append(f"data: {json.dumps(dados)}")
+    return "\n".join(linhas) + "\n\n"
+
+
+async def eventos_do_usuario(usuario_id):
+    """
+    Gera o stream SSE de um usuário: primeiro o estado atual do sino, depois cada
+    notificação publicada. Um comentário de keep-alive sai a cada
+    NOTIFICACOES_SSE_KEEPALIVE segundos para proxies não derrubarem a conexão ociosa.
+    """
+    # Assina antes de ler o estado para não perder nada criado entre as duas coisas
+    with obter_pubsub().assinar(canal_do_usuario(usuario_id)) as assinatura:
+        resumo = await sync_to_async(resumo_nao_lidas)(usuario_id)
+        yield f"retry: {settings.NOTIFICACOES_SSE_RETRY_MS}\n\n"
+        yield _evento('estado', {'count': resumo['count'], 'notificacoes': resumo['notificacoes']})
+
+        while True:
+            mensagem = await assinatura.receber(timeout=settings.NOTIFICACOES_SSE_KEEPALIVE)
+            if mensagem is None:
+                yield ": keep-alive\n\n"
+                continue
+            dados = dict(mensagem)
+            tipo = dados.pop('tipo')
+            yield _evento(tipo, dados, dados.get('id'))
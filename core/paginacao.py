@@ -0,0 +1,142 @@
+# core/paginacao.py
+"""
+Paginação por cursor (keyset) para as listagens.
+
+Em vez de OFFSET, cada página continua a partir dos valores de ordenação do último
+item da página anterior ("data < X, ou data = X e pk < Y"), então a página 400 custa
+o mesmo que a primeira. O desempate é sempre pelo pk, para a ordem ser estável mesmo
+com valores repetidos no campo de ordenação.
+
+O cursor que vai na URL é assinado (django.core.signing): o cliente não consegue
+montar nem alterar um cursor; um cursor inválido simplesmente volta para a primeira página.
+"""
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import F, Q
+
+SALT_CURSOR = 'core.paginacao'
+CURSOR_ULTIMA = 'ultima'
+
+
+def ordenacao_permitida(sort_param, campos_permitidos, padrao):
+    """Valida o parâmetro `sort` da URL contra a lista de campos permitidos (com ou sem '-')."""
+    if sort_param and sort_param.lstrip('-') in campos_permitidos:
+        return sort_param
+    return padrao
+
+
+def _serializar(valor):
+    # isoformat() preserva os microssegundos, necessários para comparar created_at por igualdade
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return str(valor)
+    return valor
+
+
+def codificar_cursor(ordenacao, valor, pk, direcao):
+    return signing.dumps([ordenacao, _serializar(valor), pk, direcao], salt=SALT_CURSOR, compress=True)
+
+
+def decodificar_cursor(cursor, ordenacao):
+    """Retorna (valor, pk, direcao) ou None se o cursor for inválido ou de outra ordenação."""
+    try:
+        ordenacao_cursor, valor, pk, direcao = signing.loads(cursor, salt=SALT_CURSOR)
+    except (signing.BadSignature, ValueError, TypeError):
+        return None
+    if ordenacao_cursor != ordenacao or direcao not in ('proxima', 'anterior'):
+        return None
+    return valor, pk, direcao
+
+
+class PaginaCursor:
+    """Página de resultados; tem a mesma cara de um Page do Paginator onde os templates precisam."""
+
+    def __init__(self, object_list, has_next, has_previous, next_cursor=None, previous_cursor=None,
+                 total=None, total_aproximado=False):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.total = total
+        self.total_aproximado = total_aproximado
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+
+def _filtro_apos(campo, descendente, valor, pk):
+    # Itens que vêm depois de (valor, pk) na ordem (campo, pk), ambos no mesmo sentido
+    operador = 'lt' if descendente else 'gt'
+    return Q(**{f'{campo}__{operador}': valor}) | Q(**{campo: valor, f'pk__{operador}': pk})
+
+
+def paginar_por_cursor(queryset, ordenacao, cursor=None, por_pagina=15, limite_contagem=None):
+    """
+    Pagina `queryset` pela `ordenacao` (um campo, com '-' para decrescente) a partir de `cursor`.
+
+    `cursor` pode ser um valor gerado por uma página anterior (next_cursor/previous_cursor)
+    ou CURSOR_ULTIMA, para ir direto ao fim da lista. Com limite_contagem > 0 a página traz
+    também o total de itens, contado só até esse limite (total_aproximado indica que passou dele).
+    O campo de ordenação não pode ser nulo.
+    """
+    if limite_contagem is None:
+        limite_contagem = settings.PAGINACAO_LIMITE_CONTAGEM
+
+    descendente = ordenacao.startswith('-')
+    campo = ordenacao.lstrip('-')
+    base = queryset.annotate(valor_cursor=F(campo))
+
+    if cursor == CURSOR_ULTIMA:
+        posicao = (None, None, 'anterior')
+    else:
+        posicao = decodificar_cursor(cursor, ordenacao) if cursor else None
+    valor, pk, direcao = posicao or (None, None, 'proxima')
+
+    # Para voltar, percorre a lista no sentido inverso e desvira o resultado no final
+    invertida = direcao == 'anterior'
+    sentido_desc = descendente != invertida
+    prefixo = '-' if sentido_desc else ''
+    consulta = base.order_by(f'{prefixo}{campo}', f'{prefixo}pk')
+    if pk is not None:
+        consulta = consulta.filter(_filtro_apos(campo, sentido_desc, valor, pk))
+
+    itens = list(consulta[:por_pagina + 1])
+    tem_mais = len(itens) > por_pagina
+    itens = itens[:por_pagina]
+
+    if invertida:
+        itens.reverse()
+        has_previous = tem_mais
+        has_next = pk is not None
+    else:
+        has_next = tem_mais
+        has_previous = pk is not None
+
+    next_cursor = previous_cursor = None
+    if itens:
+        if has_next:
+            next_cursor = codificar_cursor(ordenacao, itens[-1].valor_cursor, itens[-1].pk, 'proxima')
+        if has_previous:
+            previous_cursor = codificar_cursor(ordenacao, itens[0].valor_cursor, itens[0].pk, 'anterior')
+
+    total = None
+    total_aproximado = False
+    if limite_contagem:
+        # COUNT sobre um subselect com LIMIT: para de contar ao passar do limite
+        total = queryset.order_by()[:limite_contagem + 1].count()
+        if total > limite_contagem:
+            total = limite_contagem
+            total_aproximado = True
+
+    return PaginaCursor(itens, has_next, has_previous, next_cursor, previous_cursor, total, total_aproximado)
@@ -0,0 +1,229 @@
+# core/perfilador.py
+"""
+Perfilador por amostragem, opcional, para investigar telas lentas em produção.
+
+Uma requisição é perfilada quando sorteada (PERFILADOR_TAXA, entre 0 e 1) ou quando um
+usuário da equipe (is_staff) envia o cabeçalho "X-Perfilar: 1". PERFILADOR_ROTAS limita
+o sorteio a algumas rotas (ex.: auditoria_horas, exportar_auditoria_pdf).
+
+Durante a requisição, uma thread anota a pilha de chamadas da thread da requisição a
+cada PERFILADOR_INTERVALO_MS. Cada amostra é classificada na fase em que estava (consultas,
+template, pdf ou python) pelo quadro mais interno reconhecido. O tempo exato no banco vem
+de connection.execute_wrapper. Em respostas em streaming, a amostragem continua enquanto
+o servidor consome o conteúdo, parte a parte. O perfil vai para um JSON em PERFILADOR_DIR, com as pilhas
+no formato "collapsed" (quadro;quadro;quadro → amostras); os mais antigos além de
+PERFILADOR_MAX_ARQUIVOS são apagados. O comando collapse_perfis junta os perfis em um
+arquivo pronto para o flamegraph.pl, o speedscope ou o inferno.
+"""
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection
+from django.urls import Resolver404, resolve
+from django.utils import timezone
+
+# Fase de cada amostra: o primeiro trecho de caminho encontrado, do quadro mais interno para fora
+FASES = (
+    ('pdf', ('/weasyprint/', '/pydyf/', '/fontTools/', '/tinycss2/', '/cssselect2/')),
+    ('consultas', ('/django/db/',)),
+    ('template', ('/django/template/',)),
+)
+
+
+def deve_perfilar(request):
+    if request.headers.get('X-Perfilar') == '1':
+        usuario = getattr(request, 'user', None)
+        return bool(usuario and usuario.is_staff)
+    if settings.PERFILADOR_TAXA <= 0 or random.random() >= settings.PERFILADOR_TAXA:
+        return False
+    if not settings.PERFILADOR_ROTAS:
+        return True
+    # O middleware roda antes da view: a rota ainda não foi resolvida na requisição
+    try:
+        return resolve(request.path_info).view_name in settings.PERFILADOR_ROTAS
+    except Resolver404:
+        return False
+
+
+def _nome_do_quadro(quadro):
+    arquivo = quadro.f_code.co_filename
+    if 'site-packages/' in arquivo:
+        arquivo = arquivo.split('site-packages/', 1)[1]
+    elif arquivo.startswith(str(settings.BASE_DIR)):
+        arquivo = arquivo[len(str(settings.BASE_DIR)) + 1:]
+    modulo = arquivo[:-3] if arquivo.endswith('.py') else arquivo
+    return f"{modulo.replace('/', '.')}:{quadro.f_code.co_name}"
+
+
+def _fase(arquivos):
+    for arquivo in reversed(arquivos):
+        for fase, trechos in FASES:
+            if any(trecho in arquivo for trecho in trechos):
+                return fase
+    return 'python'
+
+
+class Amostrador(threading.Thread):
+    """Thread que anota, a cada intervalo, a pilha de chamadas de outra thread."""
+
+    def __init__(self, thread_id, intervalo):
+        super().__init__(daemon=True, name='perfilador')
+        self.thread_id = thread_id
+        self.intervalo = intervalo
+        self.pilhas = Counter()
+        self.fases = Counter()
+        self._parar = threading.Event()
+
+    def run(self):
+        while not self._parar.wait(self.intervalo):
+            quadro = sys._current_frames().get(self.thread_id)
+            if quadro is None:
+                continue
+            nomes, arquivos = [], []
+            while quadro is not None:
+                nomes.append(_nome_do_quadro(quadro))
+                arquivos.append(quadro.f_code.co_filename)
+                quadro = quadro.f_back
+            # Da raiz para o quadro mais interno, como o formato collapsed espera
+            nomes.reverse()
+            arquivos.reverse()
+            self.pilhas[';'.join(nomes)] += 1
+            self.fases[_fase(arquivos)] += 1
+
+    def parar(self):
+        self._parar.set()
+        self.join()
+
+
+class _TempoNoBanco:
+    def __init__(self):
+        self.segundos = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.segundos += time.perf_counter() - inicio
+
+
+def diretorio_perfis():
+    diretorio = Path(settings.PERFILADOR_DIR)
+    diretorio.mkdir(parents=True, exist_ok=True)
+    return diretorio
+
+
+def rotacionar(limite=None):
+    """Mantém só os `limite` perfis mais recentes (padrão: PERFILADOR_MAX_ARQUIVOS)."""
+    if limite is None:
+        limite = settings.PERFILADOR_MAX_ARQUIVOS
+    arquivos = sorted(diretorio_perfis().glob('perfil-*.json'), key=lambda caminho: caminho.name, reverse=True)
+    for caminho in arquivos[limite:]:
+        caminho.unlink(missing_ok=True)
+
+
+def perfilar(request, get_response):
+    """Executa a requisição sob o amostrador e grava o perfil; chamado pelo perfilador_middleware."""
+    intervalo = settings.PERFILADOR_INTERVALO_MS / 1000
+    amostrador = Amostrador(threading.get_ident(), intervalo)
+    banco = _TempoNoBanco()
+
+    iniciado_em = timezone.now()
+    inicio = time.perf_counter()
+    amostrador.start()
+    try:
+        with connection.execute_wrapper(banco):
+            response = get_response(request)
+    except BaseException:
+        amostrador.parar()
+        raise
+
+    def finalizar():
+        amostrador.parar()
+        _gravar_perfil(request, response, amostrador, banco, iniciado_em, inicio)
+
+    if response.streaming and not response.is_async:
+        # O trabalho das respostas em streaming acontece ao consumi-las: o perfil só é
+        # fechado quando o servidor esgota ou fecha o iterador, e o conteúdo segue em partes.
+        response.streaming_content = _consumir_perfilando(response.streaming_content, amostrador, banco, finalizar)
+    else:
+        finalizar()
+    return response
+
+
+def _consumir_perfilando(conteudo, amostrador, banco, finalizar):
+    try:
+        iterador = iter(conteudo)
+        while True:
+            # O servidor pode consumir o iterador em outra thread que não a da view
+            amostrador.thread_id = threading.get_ident()
+            with connection.execute_wrapper(banco):
+                try:
+                    parte = next(iterador)
+                except StopIteration:
+                    return
+            yield parte
+    finally:
+        finalizar()
+
+
+def _gravar_perfil(request, response, amostrador, banco, iniciado_em, inicio):
+    duracao_ms = (time.perf_counter() - inicio) * 1000
+    total = sum(amostrador.fases.values())
+    match = getattr(request, 'resolver_match', None)
+    rota = match.view_name if match else 'sem_rota'
+    perfil = {
+        'rota': rota,
+        'metodo': request.method,
+        'caminho': request.path,
+        'status': response.status_code,
+        'inicio': iniciado_em.isoformat(),
+        'duracao_ms': round(duracao_ms, 2),
+        'banco_ms': round(banco.segundos * 1000, 2),
+        'intervalo_ms': settings.PERFILADOR_INTERVALO_MS,
+        'amostras': total,
+        # Tempo estimado por fase: a fração das amostras aplicada à duração total
+        'fases_ms': {
+            fase: round(duracao_ms * quantidade / total, 2) for fase, quantidade in amostrador.fases.items()
+        } if total else {},
+        'pilhas': dict(amostrador.pilhas),
+    }
+
+    nome = f"perfil-{iniciado_em:%Y%m%d-%H%M%S}-{rota.replace(':', '-')}-{uuid.uuid4().hex[:8]}.json"
+    with open(diretorio_perfis() / nome, 'w', encoding='utf-8') as arquivo:
+        json.dump(perfil, arquivo)
+    rotacionar()
+
+
+def carregar_perfis(rota=None):
+    """Lê os perfis gravados, do mais antigo ao mais recente, opcionalmente só de uma rota."""
+    for caminho in sorted(diretorio_perfis().glob('perfil-*.json')):
+        try:
+            with open(caminho, encoding='utf-8') as arquivo:
+                perfil = json.load(arquivo)
+        except (OSError, ValueError):
+            # Apagado pela rotação ou ainda sendo gravado
+            continue
+        if rota is None or perfil['rota'] == rota:
+            yield perfil
+
+
+def agregar(perfis):
+    """Soma as pilhas e os tempos por fase de vários perfis: (Counter de pilhas, resumo)."""
+    pilhas, fases = Counter(), Counter()
+    resumo = {'perfis': 0, 'duracao_ms': 0.0, 'banco_ms': 0.0}
+    for perfil in perfis:
+        pilhas.update(perfil['pilhas'])
+        fases.update(perfil['fases_ms'])
+        resumo['perfis'] += 1
+        resumo['duracao_ms'] += perfil['duracao_ms']
+        resumo['banco_ms'] += perfil['banco_ms']
+    resumo['fases_ms'] = dict(fases)
+    return pilhas, resumo
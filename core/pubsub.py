@@ -0,0 +1,106 @@
+# core/pubsub.py
+"""
+Publish/subscribe em memória usado para empurrar notificações aos navegadores (SSE).
+
+O publicador normalmente é código síncrono (views, signals, o worker de relatórios);
+o assinante é a resposta em streaming, que roda no event loop do servidor ASGI.
+Por isso cada assinatura guarda o seu loop e recebe as mensagens com
+call_soon_threadsafe.
+
+PubSubLocal só entrega mensagens dentro do mesmo processo. Com vários processos
+de servidor, troque NOTIFICACOES_PUBSUB por uma implementação com a mesma interface
+apoiada em um broker (ex.: Redis); enquanto isso, quem não recebe o evento continua
+vendo o estado correto na próxima carga de página.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class Assinatura:
+    """Fila de mensagens de um assinante; use como context manager para cancelar ao sair."""
+
+    def __init__(self, pubsub, canal, tamanho_maximo=100):
+        self.pubsub = pubsub
+        self.canal = canal
+        self.loop = asyncio.get_running_loop()
+        self.fila = asyncio.Queue(maxsize=tamanho_maximo)
+
+    def entregar(self, mensagem):
+        try:
+            self.loop.call_soon_threadsafe(self._colocar, mensagem)
+        except RuntimeError:
+            # Loop já encerrado: o cliente foi embora sem cancelar a assinatura
+            self.cancelar()
+
+    def _colocar(self, mensagem):
+        if self.fila.full():
+            # Cliente lento: descarta a mensagem mais antiga em vez de crescer sem limite
+            self.fila.get_nowait()
+        self.fila.put_nowait(mensagem)
+
+    async def receber(self, timeout=None):
+        """Retorna a próxima mensagem ou None se nada chegar dentro de `timeout` segundos."""
+        try:
+            return await asyncio.wait_for(self.fila.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def cancelar(self):
+        self.pubsub.cancelar(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cancelar()
+
+
+class PubSubLocal:
+    """Implementação em memória, restrita ao processo atual."""
+
+    def __init__(self):
+        self._assinantes = defaultdict(set)
+        self._trava = threading.Lock()
+
+    def publicar(self, canal, mensagem):
+        with self._trava:
+            assinantes = list(self._assinantes.get(canal, ()))
+        for assinatura in assinantes:
+            assinatura.entregar(mensagem)
+
+    def assinar(self, canal):
+        """Cria uma assinatura; precisa ser chamado de dentro de um event loop."""
+        assinatura = Assinatura(self, canal)
+        with self._trava:
+            self._assinantes[canal].add(assinatura)
+        return assinatura
+
+    def cancelar(self, assinatura):
+        with self._trava:
+            assinantes = self._assinantes.get(assinatura.canal)
+            if assinantes is not None:
+                assinantes.discard(assinatura)
+                if not assinantes:
+                    del self._assinantes[assinatura.canal]
+
+    def total_assinantes(self, canal):
+        with self._trava:
+            return len(self._assinantes.get(canal, ()))
+
+
+_instancia = None
+_trava_instancia = threading.Lock()
+
+
+def obter_pubsub():
+    """Retorna a instância configurada em settings.NOTIFICACOES_PUBSUB (uma por processo)."""
+    global _instancia
+    if _instancia is None:
+        with _trava_instancia:
+            if _instancia is None:
+                _instancia = import_string(settings.NOTIFICACOES_PUBSUB)()
+    return _instancia
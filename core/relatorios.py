@@ -0,0 +1,376 @@
+# core/relatorios.py
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import traceback
+import uuid
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Count, Max, Q
+from django.template.loader import get_template, render_to_string
+from django.urls import reverse
+from django.utils import timezone
+from pypdf import PdfWriter
+from weasyprint import HTML
+
+from .models import LancamentoHoras, RelatorioJob
+from .notificacoes import notificar
+
+STATUS_AUDITAVEIS = ['Aprovado', 'Recusado', 'Homologado', 'Revertido']
+
+
+def renderizar_pdf_em_blocos(template, linhas, contexto=None, tamanho_bloco=None):
+    """
+    Gera um PDF a partir de `linhas` renderizando cada bloco de `tamanho_bloco` linhas
+    como um documento WeasyPrint separado, gravado em um PDF temporário assim que é
+    diagramado. No final, as páginas dos PDFs temporários são concatenadas com o pypdf.
+
+    Só um bloco diagramado (árvore HTML, CSS e layout) existe em memória por vez; a
+    junção lida apenas com páginas já prontas e comprimidas, então o pico de memória
+    acompanha o tamanho do bloco mais o do PDF final, e não o layout do relatório inteiro.
+    O template recebe `lancamentos` (as linhas do bloco) e `continuacao` (False só no primeiro).
+    Com tamanho_bloco 0, tudo é renderizado em um único documento.
+    """
+    if tamanho_bloco is None:
+        tamanho_bloco = settings.RELATORIOS_LINHAS_POR_BLOCO
+    contexto = contexto or {}
+
+    if not tamanho_bloco:
+        html_string = render_to_string(template, {**contexto, 'lancamentos': list(linhas), 'continuacao': False})
+        return HTML(string=html_string).write_pdf()
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        arquivos = []
+
+        def renderizar(bloco):
+            html_string = render_to_string(
+                template, {**contexto, 'lancamentos': bloco, 'continuacao': bool(arquivos)}
+            )
+            caminho = os.path.join(diretorio, f"bloco-{len(arquivos)}.pdf")
+            # O documento diagramado é descartado assim que o PDF do bloco é gravado
+            HTML(string=html_string).write_pdf(caminho)
+            arquivos.append(caminho)
+
+        bloco = []
+        for linha in linhas:
+            bloco.append(linha)
+            if len(bloco) >= tamanho_bloco:
+                renderizar(bloco)
+                bloco = []
+        if bloco or not arquivos:
+            renderizar(bloco)
+
+        if len(arquivos) == 1:
+            return Path(arquivos[0]).read_bytes()
+
+        juncao = PdfWriter()
+        for caminho in arquivos:
+            juncao.append(caminho)
+        saida = io.BytesIO()
+        juncao.write(saida)
+        juncao.close()
+        return saida.getvalue()
+
+
+def gerar_pdf_auditoria(tamanho_bloco=None):
+    lancamentos = LancamentoHoras.objects.filter(
+        status__in=STATUS_AUDITAVEIS
+    ).select_related('servidor', 'edital', 'atividade__tipo', 'validado_por').order_by('-data')
+
+    # iterator() evita que o queryset inteiro fique em cache na memória enquanto os blocos são gerados
+    return renderizar_pdf_em_blocos(
+        'relatorios/auditoria_pdf.html',
+        lancamentos.iterator(chunk_size=settings.RELATORIOS_LINHAS_POR_BLOCO or 2000),
+        tamanho_bloco=tamanho_bloco,
+    )
+
+
+def gerar_pdf_edital(edital):
+    lancamentos = LancamentoHoras.objects.filter(
+        edital=edital,
+        status__in=STATUS_AUDITAVEIS
+    ).select_related('servidor', 'atividade__tipo', 'validado_por').order_by('servidor__first_name', 'data')
+
+    html_string = render_to_string('relatorios/edital_pdf.html', {'lancamentos': lancamentos, 'edital': edital})
+    return HTML(string=html_string).write_pdf()
+
+
+# --- CACHE DOS PDFs EM DISCO ---
+#
+# Cada PDF é guardado com um nome derivado da versão dos dados que ele mostra
+# (último updated_at e quantidade de lançamentos auditáveis, mais a data de
+# modificação do template). Enquanto nada muda, o mesmo arquivo é servido do
+# disco; quando um lançamento muda de status, a chave muda e o PDF é refeito.
+
+def diretorio_cache():
+    diretorio = Path(settings.RELATORIOS_DIR) / 'cache'
+    diretorio.mkdir(parents=True, exist_ok=True)
+    return diretorio
+
+
+def versao_dos_dados(lancamentos, *extras):
+    """Resume em uma única consulta agregada o estado dos lançamentos que entram no relatório."""
+    agregado = lancamentos.order_by().aggregate(ultima_alteracao=Max('updated_at'), total=Count('pk'))
+    return [agregado['ultima_alteracao'], agregado['total'], *extras]
+
+
+def _versao_do_template(nome):
+    return os.path.getmtime(get_template(nome).origin.name)
+
+
+def _apagar(caminho):
+    try:
+        caminho.unlink(missing_ok=True)
+    except OSError:
+        # Ainda aberto por outra requisição (Windows): fica para a próxima limpeza
+        pass
+
+
+def obter_do_cache(escopo, versao, gerar):
+    """
+    Retorna o PDF de `escopo` para a `versao` informada, já aberto para leitura binária,
+    chamando `gerar()` somente se ele ainda não estiver no cache. Quem chama fecha o arquivo.
+
+    O arquivo é aberto antes de qualquer limpeza e nunca é descartado pela limpeza que a
+    própria chamada dispara. Se outro processo o descartar depois, o arquivo aberto continua
+    legível. Versões antigas do mesmo escopo são removidas ao gravar uma nova.
+    """
+    digest = hashlib.sha256(repr((escopo, versao)).encode()).hexdigest()[:32]
+    diretorio = diretorio_cache()
+    caminho = diretorio / f"{escopo}-{digest}.pdf"
+
+    try:
+        arquivo = open(caminho, 'rb')
+    except FileNotFoundError:
+        pass
+    else:
+        try:
+            # Atualiza a data de acesso usada pela política LRU
+            os.utime(caminho)
+        except FileNotFoundError:
+            pass
+        return arquivo
+
+    conteudo = gerar()
+    temporario = diretorio / f".{uuid.uuid4().hex}.tmp"
+    temporario.write_bytes(conteudo)
+    os.replace(temporario, caminho)
+    try:
+        arquivo = open(caminho, 'rb')
+    except FileNotFoundError:
+        # Descartado pela limpeza de outro processo entre a gravação e a abertura
+        arquivo = io.BytesIO(conteudo)
+
+    for antigo in diretorio.glob(f"{escopo}-*.pdf"):
+        if antigo != caminho:
+            _apagar(antigo)
+    limpar_cache(manter=[caminho])
+    return arquivo
+
+
+def limpar_cache(limite_bytes=None, manter=()):
+    """
+    Remove os PDFs usados há mais tempo até o cache caber em RELATORIOS_CACHE_MAX_BYTES,
+    sem tocar nos caminhos de `manter`.
+    """
+    if limite_bytes is None:
+        limite_bytes = settings.RELATORIOS_CACHE_MAX_BYTES
+
+    arquivos = []
+    for caminho in diretorio_cache().glob("*.pdf"):
+        try:
+            info = caminho.stat()
+        except FileNotFoundError:
+            continue
+        arquivos.append((info.st_mtime, info.st_size, caminho))
+
+    total = sum(tamanho for _, tamanho, _ in arquivos)
+    for _, tamanho, caminho in sorted(arquivos):
+        if total <= limite_bytes:
+            break
+        if caminho in manter:
+            continue
+        _apagar(caminho)
+        total -= tamanho
+
+
+def arquivo_pdf_auditoria():
+    lancamentos = LancamentoHoras.objects.filter(status__in=STATUS_AUDITAVEIS)
+    versao = versao_dos_dados(
+        lancamentos, _versao_do_template('relatorios/auditoria_pdf.html'), settings.RELATORIOS_LINHAS_POR_BLOCO
+    )
+    return obter_do_cache('auditoria', versao, gerar_pdf_auditoria)
+
+
+def arquivo_pdf_edital(edital):
+    lancamentos = LancamentoHoras.objects.filter(edital=edital, status__in=STATUS_AUDITAVEIS)
+    versao = versao_dos_dados(lancamentos, edital.updated_at, _versao_do_template('relatorios/edital_pdf.html'))
+    return obter_do_cache(f'edital-{edital.pk}', versao, lambda: gerar_pdf_edital(edital))
+
+
+# --- FILA DE GERAÇÃO EM SEGUNDO PLANO ---
+
+def diretorio_relatorios():
+    diretorio = Path(settings.RELATORIOS_DIR)
+    diretorio.mkdir(parents=True, exist_ok=True)
+    return diretorio
+
+
+def caminho_do_job(job):
+    return Path(settings.RELATORIOS_DIR) / job.arquivo
+
+
+def solicitar_relatorio(usuario, tipo, edital=None):
+    """Enfileira a geração de um relatório; o PDF é gerado pelo comando process_report_jobs."""
+    return RelatorioJob.objects.create(tipo=tipo, edital=edital, solicitado_por=usuario)
+
+
+def reservar_proximos_jobs(limite):
+    """
+    Marca até `limite` jobs pendentes como em processamento e retorna seus IDs.
+    Cada job só é reservado se ainda estiver pendente (UPDATE condicional), então
+    vários workers podem consultar a mesma fila sem gerar o mesmo relatório duas vezes.
+    """
+    reservados = []
+    candidatos = RelatorioJob.objects.filter(status='Pendente').order_by('created_at').values_list('pk', flat=True)
+    for job_id in candidatos[:limite]:
+        atualizados = RelatorioJob.objects.filter(pk=job_id, status='Pendente').update(
+            status='Processando', iniciado_em=timezone.now()
+        )
+        if atualizados:
+            reservados.append(job_id)
+    return reservados
+
+
+def devolver_jobs_abandonados(timeout=None):
+    """
+    Devolve à fila os jobs "Processando" há mais de `timeout` segundos (padrão:
+    RELATORIOS_JOB_TIMEOUT), deixados para trás por um worker interrompido. Jobs mais
+    recentes continuam com o worker que os reservou, que pode estar vivo.
+    """
+    if timeout is None:
+        timeout = settings.RELATORIOS_JOB_TIMEOUT
+    limite = timezone.now() - timedelta(seconds=timeout)
+    return RelatorioJob.objects.filter(status='Processando').filter(
+        Q(iniciado_em__lt=limite) | Q(iniciado_em__isnull=True)
+    ).update(status='Pendente')
+
+
+def devolver_jobs(job_ids):
+    """Devolve à fila jobs reservados que nem chegaram a ser entregues a um processo do worker."""
+    return RelatorioJob.objects.filter(pk__in=job_ids, status='Processando').update(
+        status='Pendente', iniciado_em=None
+    )
+
+
+def falhar_jobs(job_ids, motivo):
+    """
+    Marca como erro os jobs que estavam sendo gerados quando o processo do worker morreu
+    (ex.: falta de memória no WeasyPrint) e avisa os solicitantes. Não são devolvidos à fila:
+    o mesmo relatório derrubaria o processo de novo.
+    """
+    falhos = 0
+    for job in RelatorioJob.objects.filter(pk__in=job_ids, status='Processando').select_related('edital'):
+        with transaction.atomic():
+            if not RelatorioJob.objects.filter(pk=job.pk, status='Processando').update(
+                status='Erro', erro=motivo, concluido_em=timezone.now()
+            ):
+                continue
+            falhos += 1
+            notificar(
+                job.solicitado_por_id,
+                f'Não foi possível gerar o relatório "{job.nome_arquivo}".',
+                link=reverse('auditoria_horas'),
+            )
+    return falhos
+
+
+def limpar_jobs_antigos(dias=None):
+    """
+    Remove os jobs concluídos (ou com erro) há mais de `dias` (padrão: RELATORIOS_RETENCAO_DIAS)
+    e os seus PDFs, além de PDFs e temporários de jobs que já não existem (ex.: edital excluído).
+    Retorna o número de jobs removidos.
+    """
+    if dias is None:
+        dias = settings.RELATORIOS_RETENCAO_DIAS
+    limite = timezone.now() - timedelta(days=dias)
+    antigos = list(
+        RelatorioJob.objects.filter(status__in=['Concluído', 'Erro'], concluido_em__lt=limite).values_list('pk', 'arquivo')
+    )
+    # Apaga os registros antes dos arquivos: um download no meio do caminho recebe 404, não um PDF pela metade
+    RelatorioJob.objects.filter(pk__in=[job_id for job_id, _ in antigos]).delete()
+    for _, arquivo in antigos:
+        if arquivo:
+            _apagar(Path(settings.RELATORIOS_DIR) / arquivo)
+
+    existentes = set(RelatorioJob.objects.values_list('pk', flat=True))
+    limite_mtime = limite.timestamp()
+    for caminho in list(diretorio_relatorios().glob('*.pdf')) + list(diretorio_relatorios().glob('*.tmp')):
+        if not caminho.stem.isdigit() or int(caminho.stem) in existentes:
+            continue
+        try:
+            if caminho.stat().st_mtime < limite_mtime:
+                _apagar(caminho)
+        except FileNotFoundError:
+            continue
+    return len(antigos)
+
+
+def processar_job(job_id):
+    """
+    Gera o PDF de um job já reservado, grava em RELATORIOS_DIR e avisa o solicitante pelo sino.
+    Roda dentro dos processos do worker; não levanta exceção, registra o erro no próprio job.
+    Retorna o status final, ou None se o job foi removido enquanto esperava ou era gerado.
+    """
+    close_old_connections()
+    try:
+        job = RelatorioJob.objects.select_related('edital').get(pk=job_id)
+    except RelatorioJob.DoesNotExist:
+        # Removido depois de reservado (ex.: edital excluído em cascata)
+        return None
+
+    try:
+        if job.tipo == 'edital':
+            origem = arquivo_pdf_edital(job.edital)
+        else:
+            origem = arquivo_pdf_auditoria()
+
+        # O job guarda a sua própria cópia: o cache pode descartar o original a qualquer momento.
+        arquivo = f"{job.pk}.pdf"
+        destino = diretorio_relatorios() / arquivo
+        temporario = destino.with_suffix('.tmp')
+        with origem, open(temporario, 'wb') as copia:
+            shutil.copyfileobj(origem, copia)
+        os.replace(temporario, destino)
+
+        job.arquivo = arquivo
+        job.status = 'Concluído'
+        job.concluido_em = timezone.now()
+        job.save(update_fields=['arquivo', 'status', 'concluido_em'])
+
+        notificar(
+            job.solicitado_por_id,
+            f'O relatório "{job.nome_arquivo}" está pronto para download.',
+            link=reverse('baixar_relatorio', args=[job.pk]),
+        )
+    except Exception:
+        job.status = 'Erro'
+        job.erro = traceback.format_exc()
+        job.concluido_em = timezone.now()
+        # update() em vez de save(): se o job foi removido durante a geração, não há o que gravar
+        if not RelatorioJob.objects.filter(pk=job.pk).update(
+            status=job.status, erro=job.erro, concluido_em=job.concluido_em
+        ):
+            return None
+
+        notificar(
+            job.solicitado_por_id,
+            f'Não foi possível gerar o relatório "{job.nome_arquivo}".',
+            link=reverse('auditoria_horas'),
+        )
+    return job.status
@@ -0,0 +1,322 @@
+# core/resumos.py
+"""
+Resumos lidos pelos painéis, para que nenhum painel agregue LancamentoHoras a cada acesso.
+
+- ResumoEdital: lançamentos aguardando cada etapa e horas de um edital.
+- ResumoUnidade: os mesmos números somados sobre todos os editais de um usuário da
+  unidade demandante, mais editais por situação e o empenho consumido.
+- Do servidor, o painel usa o contador anual HorasServidorAno (core/saldo.py).
+
+Os lançamentos entram nos resumos nos mesmos pontos que atualizam o saldo do edital
+(signals de LancamentoHoras e aplicar_transicoes, em core/saldo.py), então seguem a
+mesma transação. Mudanças de status e de empenho do edital chegam pelo post_save de
+Edital. Resumos ausentes são reconstruídos a partir dos dados na primeira escrita ou
+leitura; o comando rebuild_resumos verifica e reconstrói todos.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Edital, HorasServidorAno, LancamentoHoras, ResumoEdital, ResumoUnidade, SaldoEdital, ServidorProfile
+
+ZERO = Decimal('0')
+
+COLUNAS_EDITAL = ('lancamentos_pendentes', 'lancamentos_aprovados', 'horas_pendentes', 'horas_comprometidas')
+COLUNAS_UNIDADE = COLUNAS_EDITAL + (
+    'valor_pendente', 'valor_comprometido', 'editais_aguardando_homologacao', 'editais_ativos', 'valor_empenho',
+)
+
+STATUS_EDITAL_ATIVO = ('Homologado', 'Ativo')
+
+
+def contribuicao_do_lancamento(status, horas, valor):
+    """Quanto um lançamento com este status soma em cada coluna dos resumos."""
+    if status == 'Recusado':
+        return {}
+    if status == 'Pendente':
+        return {'lancamentos_pendentes': 1, 'horas_pendentes': horas, 'valor_pendente': valor}
+    contribuicao = {'horas_comprometidas': horas, 'valor_comprometido': valor}
+    if status == 'Aprovado':
+        contribuicao['lancamentos_aprovados'] = 1
+    return contribuicao
+
+
+def contribuicao_do_edital(status, valor_empenho):
+    """Quanto um edital com este status soma no resumo da sua unidade demandante."""
+    if status == 'Recusado':
+        return {}
+    contribuicao = {'valor_empenho': Decimal(str(valor_empenho))}
+    if status == 'Aguardando Homologação':
+        contribuicao['editais_aguardando_homologacao'] = 1
+    elif status in STATUS_EDITAL_ATIVO:
+        contribuicao['editais_ativos'] = 1
+    return contribuicao
+
+
+def _acumular(destino, contribuicao, sinal):
+    for coluna, quantidade in contribuicao.items():
+        destino[coluna] = destino.get(coluna, 0) + sinal * quantidade
+
+
+def somar_lancamento(destino, edital_id, status, horas, valor, sinal=1):
+    """Acumula em `destino` ({edital_id: {coluna: delta}}) a entrada (sinal=1) ou saída (-1) de um lançamento."""
+    _acumular(destino[edital_id], contribuicao_do_lancamento(status, Decimal(str(horas)), valor), sinal)
+
+
+def _incrementos(deltas):
+    return {coluna: F(coluna) + valor for coluna, valor in deltas.items()}
+
+
+def aplicar_deltas_lancamentos(deltas_por_edital, reconstruir=True):
+    """
+    Aplica os deltas acumulados por somar_lancamento: um UPDATE no resumo de cada edital
+    e um no resumo da unidade que o criou. Resumos ainda inexistentes são reconstruídos,
+    a não ser com reconstruir=False (exclusões, em que o edital pode estar saindo junto).
+    """
+    for edital_id, deltas in deltas_por_edital.items():
+        deltas = {coluna: valor for coluna, valor in deltas.items() if valor}
+        if not deltas:
+            continue
+        do_edital = {coluna: valor for coluna, valor in deltas.items() if coluna in COLUNAS_EDITAL}
+        with transaction.atomic():
+            if do_edital and not ResumoEdital.objects.filter(edital_id=edital_id).update(**_incrementos(do_edital)):
+                if reconstruir:
+                    recalcular_resumo_edital(edital_id)
+            if not ResumoUnidade.objects.filter(demandante__editais_criados=edital_id).update(**_incrementos(deltas)):
+                if not reconstruir:
+                    continue
+                demandante_id = Edital.objects.filter(pk=edital_id).values_list('criado_por_id', flat=True).first()
+                if demandante_id is not None:
+                    recalcular_resumo_unidade(demandante_id)
+
+
+def aplicar_delta_unidade(demandante_id, deltas):
+    deltas = {coluna: valor for coluna, valor in deltas.items() if valor}
+    if not deltas:
+        return
+    with transaction.atomic():
+        if not ResumoUnidade.objects.filter(demandante_id=demandante_id).update(**_incrementos(deltas)):
+            recalcular_resumo_unidade(demandante_id)
+
+
+# --- RECONSTRUÇÃO ---
+
+def totais_dos_editais(edital_ids=None):
+    """Calcula, em uma única consulta agrupada, o resumo esperado de cada edital com lançamentos."""
+    lancamentos = LancamentoHoras.objects.all()
+    if edital_ids is not None:
+        lancamentos = lancamentos.filter(edital_id__in=edital_ids)
+
+    linhas = lancamentos.values('edital_id').annotate(
+        lancamentos_pendentes=Count('pk', filter=Q(status='Pendente')),
+        lancamentos_aprovados=Count('pk', filter=Q(status='Aprovado')),
+        horas_pendentes=Sum('horas', filter=Q(status='Pendente')),
+        horas_comprometidas=Sum('horas', filter=~Q(status__in=['Pendente', 'Recusado'])),
+    ).order_by()
+
+    return {
+        linha['edital_id']: {coluna: linha[coluna] or 0 for coluna in COLUNAS_EDITAL}
+        for linha in linhas
+    }
+
+
+def totais_das_unidades(demandante_ids=None):
+    """
+    Calcula o resumo esperado de cada unidade demandante com três consultas agrupadas:
+    lançamentos, saldos (os valores vêm do SaldoEdital) e editais.
+    """
+    editais = Edital.objects.all()
+    if demandante_ids is not None:
+        editais = editais.filter(criado_por_id__in=demandante_ids)
+
+    totais = defaultdict(lambda: {coluna: 0 for coluna in COLUNAS_UNIDADE})
+    por_demandante = {'demandante_id': F('edital__criado_por_id')}
+
+    for linha in LancamentoHoras.objects.filter(edital__in=editais).values(**por_demandante).annotate(
+        lancamentos_pendentes=Count('pk', filter=Q(status='Pendente')),
+        lancamentos_aprovados=Count('pk', filter=Q(status='Aprovado')),
+        horas_pendentes=Sum('horas', filter=Q(status='Pendente')),
+        horas_comprometidas=Sum('horas', filter=~Q(status__in=['Pendente', 'Recusado'])),
+    ).order_by():
+        totais[linha['demandante_id']].update({coluna: linha[coluna] or 0 for coluna in COLUNAS_EDITAL})
+
+    for linha in SaldoEdital.objects.filter(edital__in=editais).values(**por_demandante).annotate(
+        total_pendente=Sum('valor_pendente'),
+        total_comprometido=Sum('valor_comprometido'),
+    ).order_by():
+        totais[linha['demandante_id']]['valor_pendente'] = linha['total_pendente'] or ZERO
+        totais[linha['demandante_id']]['valor_comprometido'] = linha['total_comprometido'] or ZERO
+
+    for linha in editais.values(demandante_id=F('criado_por_id')).annotate(
+        total_aguardando=Count('pk', filter=Q(status='Aguardando Homologação')),
+        total_ativos=Count('pk', filter=Q(status__in=STATUS_EDITAL_ATIVO)),
+        total_empenho=Sum('valor_empenho', filter=~Q(status='Recusado')),
+    ).order_by():
+        totais[linha['demandante_id']]['editais_aguardando_homologacao'] = linha['total_aguardando']
+        totais[linha['demandante_id']]['editais_ativos'] = linha['total_ativos']
+        totais[linha['demandante_id']]['valor_empenho'] = linha['total_empenho'] or ZERO
+
+    return dict(totais)
+
+
+def recalcular_resumo_edital(edital_id):
+    totais = totais_dos_editais([edital_id]).get(edital_id, {})
+    resumo, _ = ResumoEdital.objects.update_or_create(
+        edital_id=edital_id,
+        defaults={coluna: totais.get(coluna, 0) for coluna in COLUNAS_EDITAL},
+    )
+    return resumo
+
+
+def recalcular_resumo_unidade(demandante_id):
+    totais = totais_das_unidades([demandante_id]).get(demandante_id, {})
+    resumo, _ = ResumoUnidade.objects.update_or_create(
+        demandante_id=demandante_id,
+        defaults={coluna: totais.get(coluna, 0) for coluna in COLUNAS_UNIDADE},
+    )
+    return resumo
+
+
+def _divergentes(persistido, esperado, colunas):
+    centavo = Decimal('0.01')
+    divergentes = []
+    for coluna in colunas:
+        atual = getattr(persistido, coluna) if persistido else None
+        if atual is None or Decimal(atual).quantize(centavo) != Decimal(esperado[coluna]).quantize(centavo):
+            divergentes.append((coluna, atual, esperado[coluna]))
+    return divergentes
+
+
+def verificar_resumos(corrigir=False):
+    """
+    Compara os resumos persistidos com os recalculados. Retorna a lista de divergências
+    [(descricao, persistido, esperado)]; com `corrigir=True` regrava os divergentes.
+    Os valores em R$ das unidades vêm do SaldoEdital: rode rebuild_saldos antes se ele
+    também estiver divergente.
+    """
+    divergencias = []
+
+    esperados = totais_dos_editais()
+    persistidos = {resumo.edital_id: resumo for resumo in ResumoEdital.objects.all()}
+    vazio = {coluna: 0 for coluna in COLUNAS_EDITAL}
+    for edital_id in Edital.objects.values_list('pk', flat=True):
+        esperado = esperados.get(edital_id, vazio)
+        divergentes = _divergentes(persistidos.get(edital_id), esperado, COLUNAS_EDITAL)
+        for coluna, atual, valor in divergentes:
+            divergencias.append((f"Edital {edital_id}: {coluna}", atual, valor))
+        if corrigir and divergentes:
+            ResumoEdital.objects.update_or_create(edital_id=edital_id, defaults=esperado)
+
+    esperados = totais_das_unidades()
+    persistidos = {resumo.demandante_id: resumo for resumo in ResumoUnidade.objects.all()}
+    vazio = {coluna: 0 for coluna in COLUNAS_UNIDADE}
+    for demandante_id in esperados.keys() | persistidos.keys():
+        esperado = esperados.get(demandante_id, vazio)
+        divergentes = _divergentes(persistidos.get(demandante_id), esperado, COLUNAS_UNIDADE)
+        for coluna, atual, valor in divergentes:
+            divergencias.append((f"Unidade do usuário {demandante_id}: {coluna}", atual, valor))
+        if corrigir and divergentes:
+            ResumoUnidade.objects.update_or_create(demandante_id=demandante_id, defaults=esperado)
+
+    return divergencias
+
+
+# --- LEITURA PELOS PAINÉIS ---
+
+def obter_resumo_unidade(demandante):
+    """Retorna o resumo da unidade com uma única leitura, criando-o se ainda não existir."""
+    resumo = ResumoUnidade.objects.filter(demandante=demandante).first()
+    if resumo is None:
+        resumo = recalcular_resumo_unidade(demandante.pk)
+    return resumo
+
+
+def indicadores_servidor(usuario):
+    ano = timezone.localdate().year
+    horas = HorasServidorAno.objects.filter(servidor=usuario, ano=ano).first()
+    perfil = usuario.servidorprofile
+    return {
+        'ano': ano,
+        'perfil': perfil,
+        'horas_pendentes': horas.horas_pendentes if horas else ZERO,
+        'horas_comprometidas': horas.horas_comprometidas if horas else ZERO,
+        # O mesmo que perfil.horas_disponiveis, sem ler o contador de novo
+        'horas_disponiveis': perfil.limite_horas_anual - (horas.horas_utilizadas if horas else ZERO),
+    }
+
+
+def indicadores_unidade(usuario, limite_editais=5):
+    """Resumo da unidade e os editais em andamento mais recentes, cada um com seu resumo e saldo."""
+    editais = (
+        Edital.objects.filter(criado_por=usuario, status__in=STATUS_EDITAL_ATIVO)
+        .select_related('resumo', 'saldo')
+        .annotate(saldo_restante=F('valor_empenho') - Coalesce(
+            F('saldo__valor_comprometido') + F('saldo__valor_pendente'), Value(ZERO)
+        ))
+        .order_by('-created_at')[:limite_editais]
+    )
+    return {'resumo': obter_resumo_unidade(usuario), 'editais': editais}
+
+
+def indicadores_prodgep():
+    """Soma os resumos das unidades (uma linha por unidade demandante) numa única consulta."""
+    totais = ResumoUnidade.objects.aggregate(
+        editais_aguardando_homologacao=Sum('editais_aguardando_homologacao'),
+        lancamentos_aprovados=Sum('lancamentos_aprovados'),
+        valor_empenho=Sum('valor_empenho'),
+        valor_comprometido=Sum('valor_comprometido'),
+        valor_pendente=Sum('valor_pendente'),
+    )
+    totais = {coluna: valor or 0 for coluna, valor in totais.items()}
+    totais['saldo_restante'] = totais['valor_empenho'] - totais['valor_comprometido'] - totais['valor_pendente']
+    # Contagem pelo índice servidor_status_idx, sem varrer a tabela de perfis
+    totais['servidores_aguardando_homologacao'] = ServidorProfile.objects.filter(
+        status='Aguardando Homologação'
+    ).count()
+    return totais
+
+
+# --- SIGNALS DO EDITAL ---
+
+@receiver(post_save, sender=Edital)
+def atualizar_resumos_ao_salvar_edital(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+
+    anterior = None if created else getattr(instance, '_estado_original', None)
+    instance.capturar_estado_original()
+
+    if created:
+        ResumoEdital.objects.get_or_create(edital=instance)
+    elif anterior is None or None in anterior:
+        # Não sabemos como o edital estava antes: reconstrói o resumo da unidade.
+        recalcular_resumo_unidade(instance.criado_por_id)
+        return
+
+    if anterior == instance._estado_original:
+        return
+
+    deltas = defaultdict(dict)
+    if anterior is not None:
+        status, valor_empenho, demandante_id = anterior
+        _acumular(deltas[demandante_id], contribuicao_do_edital(status, valor_empenho), -1)
+    _acumular(deltas[instance.criado_por_id], contribuicao_do_edital(instance.status, instance.valor_empenho), 1)
+
+    for demandante_id, delta in deltas.items():
+        aplicar_delta_unidade(demandante_id, delta)
+
+
+@receiver(post_delete, sender=Edital)
+def atualizar_resumos_ao_remover_edital(sender, instance, **kwargs):
+    # Os lançamentos do edital já saíram do resumo pelo post_delete de cada um, na cascata.
+    deltas = {}
+    _acumular(deltas, contribuicao_do_edital(instance.status, instance.valor_empenho), -1)
+    deltas = {coluna: valor for coluna, valor in deltas.items() if valor}
+    if deltas:
+        ResumoUnidade.objects.filter(demandante_id=instance.criado_por_id).update(**_incrementos(deltas))
@@ -0,0 +1,448 @@
+# core/saldo.py
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import ExtractYear
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.dateparse import parse_date
+
+from . import resumos
+from .models import Atividade, Edital, HorasServidorAno, LancamentoHoras, SaldoEdital, TipoAtividade
+
+ZERO = Decimal('0')
+
+COLUNAS_SALDO = ('valor_comprometido', 'valor_pendente', 'valor_recusado')
+COLUNAS_HORAS = ('horas_comprometidas', 'horas_pendentes', 'horas_recusadas')
+
+# Valor de um lançamento calculado no banco, usado nas reconstruções do saldo.
+VALOR_LANCAMENTO = ExpressionWrapper(
+    F('horas') * F('atividade__tipo__valor_hora'),
+    output_field=DecimalField(max_digits=16, decimal_places=4),
+)
+
+
+def coluna_do_status(status):
+    """
+    Indica em qual coluna do saldo um lançamento com este status é contabilizado.
+    Só os recusados deixam de consumir o empenho, como sempre foi na validação do formulário.
+    """
+    if status == 'Pendente':
+        return 'valor_pendente'
+    if status == 'Recusado':
+        return 'valor_recusado'
+    return 'valor_comprometido'
+
+
+def coluna_de_horas_do_status(status):
+    return COLUNAS_HORAS[COLUNAS_SALDO.index(coluna_do_status(status))]
+
+
+def calcular_valor(horas, valor_hora):
+    if horas is None or valor_hora is None:
+        return ZERO
+    return Decimal(str(horas)) * Decimal(str(valor_hora))
+
+
+def valor_hora_da_atividade(atividade_id):
+    """
+    Valor/hora do tipo da atividade lido do banco, na transação corrente. Tudo que vai
+    para o saldo usa este valor, e não o catálogo em memória (core/catalogo.py), que
+    pode estar desatualizado em relação a uma alteração feita em outro processo.
+    """
+    return Atividade.objects.filter(pk=atividade_id).values_list('tipo__valor_hora', flat=True).first()
+
+
+def obter_saldo(edital):
+    """Retorna o saldo do edital com uma única leitura, criando-o se ainda não existir."""
+    saldo = SaldoEdital.objects.filter(edital=edital).first()
+    if saldo is None:
+        saldo = recalcular_saldo(edital.pk)
+    return saldo
+
+
+def saldo_disponivel(edital):
+    saldo = obter_saldo(edital)
+    return edital.valor_empenho - saldo.valor_utilizado
+
+
+def aplicar_delta(edital_id, deltas):
+    """
+    Soma os valores de `deltas` ({coluna: valor}) ao saldo do edital com um único UPDATE.
+    Se o edital ainda não tem saldo, ele é reconstruído a partir dos lançamentos.
+    """
+    deltas = {coluna: valor for coluna, valor in deltas.items() if valor}
+    if not deltas:
+        return
+    with transaction.atomic():
+        atualizados = SaldoEdital.objects.filter(edital_id=edital_id).update(
+            **{coluna: F(coluna) + valor for coluna, valor in deltas.items()}
+        )
+        if not atualizados:
+            recalcular_saldo(edital_id)
+
+
+def _ano(data):
+    if isinstance(data, str):
+        data = parse_date(data)
+    return data.year
+
+
+# Travas locais usadas apenas no SQLite (ver trava_local).
+_travas_locais = {}
+_guarda_das_travas = threading.Lock()
+
+
+@contextmanager
+def trava_local(chave):
+    """
+    Serializa, dentro do processo, as reservas sobre um mesmo contador (edital ou servidor).
+
+    No PostgreSQL os UPDATEs condicionais de reserva já bloqueiam a linha do contador
+    até o fim da transação, então nada é feito aqui. O SQLite não tem bloqueio por
+    linha e devolve "database is locked" para escritas concorrentes, por isso as
+    transações sobre um mesmo contador passam por uma trava local.
+    """
+    if connection.vendor != 'sqlite':
+        yield
+        return
+    with _guarda_das_travas:
+        trava = _travas_locais.setdefault(chave, threading.Lock())
+    with trava:
+        yield
+
+
+def reservar_saldo(edital, valor):
+    """
+    Debita `valor` do saldo do edital como pendente, somente se ainda couber no empenho.
+
+    A checagem e o débito acontecem no mesmo UPDATE (compare-and-swap sobre a linha do
+    saldo), então duas submissões simultâneas nunca enxergam o mesmo saldo livre.
+    Retorna True se a reserva foi feita.
+    """
+    valor = Decimal(str(valor))
+    limite = Decimal(str(edital.valor_empenho)) - valor
+
+    for _ in range(2):
+        atualizados = SaldoEdital.objects.filter(
+            edital_id=edital.pk,
+            valor_pendente__lte=limite - F('valor_comprometido'),
+        ).update(valor_pendente=F('valor_pendente') + valor)
+        if atualizados:
+            return True
+        if SaldoEdital.objects.filter(edital_id=edital.pk).exists():
+            return False
+        recalcular_saldo(edital.pk)
+    return False
+
+
+def totais_por_edital(edital_ids=None):
+    """Calcula, em uma única consulta agrupada, os totais esperados de cada edital."""
+    lancamentos = LancamentoHoras.objects.all()
+    if edital_ids is not None:
+        lancamentos = lancamentos.filter(edital_id__in=edital_ids)
+
+    linhas = lancamentos.values('edital_id').annotate(
+        valor_pendente=Sum(VALOR_LANCAMENTO, filter=Q(status='Pendente')),
+        valor_recusado=Sum(VALOR_LANCAMENTO, filter=Q(status='Recusado')),
+        valor_comprometido=Sum(VALOR_LANCAMENTO, filter=~Q(status__in=['Pendente', 'Recusado'])),
+    ).order_by()
+
+    return {
+        linha['edital_id']: {coluna: linha[coluna] or ZERO for coluna in COLUNAS_SALDO}
+        for linha in linhas
+    }
+
+
+def recalcular_saldo(edital_id):
+    totais = totais_por_edital([edital_id]).get(edital_id, {})
+    saldo, _ = SaldoEdital.objects.update_or_create(
+        edital_id=edital_id,
+        defaults={coluna: totais.get(coluna, ZERO) for coluna in COLUNAS_SALDO},
+    )
+    return saldo
+
+
+def recalcular_editais(edital_ids):
+    """
+    Reconstrói o saldo dos editais e os valores em R$ dos resumos das suas unidades
+    demandantes. Usado quando o valor/hora dos lançamentos muda sem que eles sejam
+    salvos (troca do tipo da atividade ou do valor/hora do tipo): os deltas dos signals
+    de LancamentoHoras só valem enquanto o valor/hora não muda.
+    """
+    edital_ids = set(edital_ids)
+    if not edital_ids:
+        return
+    with transaction.atomic():
+        totais = totais_por_edital(edital_ids)
+        for edital_id in edital_ids:
+            SaldoEdital.objects.update_or_create(
+                edital_id=edital_id,
+                defaults={coluna: totais.get(edital_id, {}).get(coluna, ZERO) for coluna in COLUNAS_SALDO},
+            )
+        demandantes = Edital.objects.filter(pk__in=edital_ids).values_list('criado_por_id', flat=True)
+        for demandante_id in set(demandantes):
+            resumos.recalcular_resumo_unidade(demandante_id)
+
+
+def verificar_saldos(corrigir=False):
+    """
+    Compara o saldo persistido de cada edital com o recalculado a partir dos lançamentos.
+    Retorna a lista de divergências [(edital_id, coluna, persistido, esperado)].
+    Com `corrigir=True`, os saldos divergentes (ou ausentes) são regravados.
+    """
+    esperados = totais_por_edital()
+    persistidos = {
+        saldo.edital_id: saldo for saldo in SaldoEdital.objects.all()
+    }
+    vazio = {coluna: ZERO for coluna in COLUNAS_SALDO}
+    centavo = Decimal('0.01')
+
+    divergencias = []
+    for edital_id in Edital.objects.values_list('pk', flat=True):
+        esperado = esperados.get(edital_id, vazio)
+        saldo = persistidos.get(edital_id)
+        edital_divergente = saldo is None
+        for coluna in COLUNAS_SALDO:
+            atual = getattr(saldo, coluna) if saldo else None
+            if atual is None or atual.quantize(centavo) != Decimal(esperado[coluna]).quantize(centavo):
+                divergencias.append((edital_id, coluna, atual, esperado[coluna]))
+                edital_divergente = True
+
+        if corrigir and edital_divergente:
+            SaldoEdital.objects.update_or_create(edital_id=edital_id, defaults=esperado)
+
+    return divergencias
+
+
+def aplicar_delta_horas(servidor_id, ano, deltas):
+    """
+    Soma os valores de `deltas` ({coluna: horas}) ao contador anual do servidor.
+    ServidorProfile.horas_utilizadas é lido do contador do ano corrente.
+    """
+    deltas = {coluna: horas for coluna, horas in deltas.items() if horas}
+    if not deltas:
+        return
+    with transaction.atomic():
+        atualizados = HorasServidorAno.objects.filter(servidor_id=servidor_id, ano=ano).update(
+            **{coluna: F(coluna) + horas for coluna, horas in deltas.items()}
+        )
+        if not atualizados:
+            recalcular_horas_servidor(servidor_id, ano)
+
+
+def reservar_horas(servidor, ano, horas):
+    """
+    Soma `horas` às pendentes do servidor no ano, somente se não ultrapassar o
+    limite_horas_anual do perfil. Mesma estratégia de reservar_saldo.
+    Retorna True se a reserva foi feita.
+    """
+    horas = Decimal(str(horas))
+    perfil = getattr(servidor, 'servidorprofile', None)
+    contadores = HorasServidorAno.objects.filter(servidor_id=servidor.pk, ano=ano)
+    if perfil is not None:
+        limite = Decimal(perfil.limite_horas_anual) - horas
+        contadores = contadores.filter(horas_pendentes__lte=limite - F('horas_comprometidas'))
+
+    for _ in range(2):
+        atualizados = contadores.update(horas_pendentes=F('horas_pendentes') + horas)
+        if atualizados:
+            return True
+        if HorasServidorAno.objects.filter(servidor_id=servidor.pk, ano=ano).exists():
+            return False
+        recalcular_horas_servidor(servidor.pk, ano)
+    return False
+
+
+def totais_de_horas(**filtros):
+    """Calcula, em uma única consulta agrupada, as horas esperadas de cada (servidor, ano)."""
+    linhas = LancamentoHoras.objects.filter(**filtros).annotate(
+        ano=ExtractYear('data')
+    ).values('servidor_id', 'ano').annotate(
+        horas_pendentes=Sum('horas', filter=Q(status='Pendente')),
+        horas_recusadas=Sum('horas', filter=Q(status='Recusado')),
+        horas_comprometidas=Sum('horas', filter=~Q(status__in=['Pendente', 'Recusado'])),
+    ).order_by()
+
+    return {
+        (linha['servidor_id'], linha['ano']): {coluna: linha[coluna] or ZERO for coluna in COLUNAS_HORAS}
+        for linha in linhas
+    }
+
+
+def recalcular_horas_servidor(servidor_id, ano):
+    totais = totais_de_horas(servidor_id=servidor_id, data__year=ano).get((servidor_id, ano), {})
+    contador, _ = HorasServidorAno.objects.update_or_create(
+        servidor_id=servidor_id,
+        ano=ano,
+        defaults={coluna: totais.get(coluna, ZERO) for coluna in COLUNAS_HORAS},
+    )
+    return contador
+
+
+def verificar_horas_servidores(corrigir=False):
+    """
+    Compara os contadores anuais com o recalculado a partir dos lançamentos.
+    Retorna a lista de divergências [(descricao, persistido, esperado)].
+    Com `corrigir=True`, os contadores divergentes são regravados.
+    """
+    esperados = totais_de_horas()
+    persistidos = {
+        (contador.servidor_id, contador.ano): contador for contador in HorasServidorAno.objects.all()
+    }
+    vazio = {coluna: ZERO for coluna in COLUNAS_HORAS}
+
+    divergencias = []
+    for chave in esperados.keys() | persistidos.keys():
+        esperado = esperados.get(chave, vazio)
+        contador = persistidos.get(chave)
+        divergente = False
+        for coluna in COLUNAS_HORAS:
+            atual = getattr(contador, coluna) if contador else None
+            if atual is None or atual != esperado[coluna]:
+                divergencias.append((f"Servidor {chave[0]} em {chave[1]}: {coluna}", atual, esperado[coluna]))
+                divergente = True
+        if corrigir and divergente:
+            HorasServidorAno.objects.update_or_create(servidor_id=chave[0], ano=chave[1], defaults=esperado)
+
+    return divergencias
+
+
+def _somar(destino, chave, coluna, valor):
+    destino[chave][coluna] = destino[chave].get(coluna, ZERO) + valor
+
+
+def aplicar_transicoes(linhas, novo_status):
+    """
+    Atualiza saldos e contadores de horas para lançamentos que mudaram de status por
+    QuerySet.update() (que não dispara signals). Cada linha é um dicionário com
+    status, horas, valor_hora, edital_id, servidor_id e data do lançamento antes da mudança.
+    Faz um UPDATE por edital e por (servidor, ano) afetados, não por lançamento.
+    Os resumos dos painéis (core/resumos.py) acompanham o saldo.
+    """
+    saldos = defaultdict(dict)
+    horas = defaultdict(dict)
+    paineis = defaultdict(dict)
+
+    for linha in linhas:
+        valor = calcular_valor(linha['horas'], linha['valor_hora'])
+        horas_lancadas = Decimal(str(linha['horas']))
+        chave_horas = (linha['servidor_id'], _ano(linha['data']))
+
+        _somar(saldos, linha['edital_id'], coluna_do_status(linha['status']), -valor)
+        _somar(saldos, linha['edital_id'], coluna_do_status(novo_status), valor)
+        _somar(horas, chave_horas, coluna_de_horas_do_status(linha['status']), -horas_lancadas)
+        _somar(horas, chave_horas, coluna_de_horas_do_status(novo_status), horas_lancadas)
+        resumos.somar_lancamento(paineis, linha['edital_id'], linha['status'], horas_lancadas, valor, -1)
+        resumos.somar_lancamento(paineis, linha['edital_id'], novo_status, horas_lancadas, valor)
+
+    for edital_id, deltas in saldos.items():
+        aplicar_delta(edital_id, deltas)
+    for (servidor_id, ano), deltas in horas.items():
+        aplicar_delta_horas(servidor_id, ano, deltas)
+    resumos.aplicar_deltas_lancamentos(paineis)
+
+
+@receiver(post_save, sender=Edital)
+def criar_saldo_do_edital(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        SaldoEdital.objects.get_or_create(edital=instance)
+
+
+@receiver(post_save, sender=LancamentoHoras)
+def atualizar_saldos_ao_salvar(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+
+    anterior = None if created else getattr(instance, '_estado_original', None)
+    instance.capturar_estado_original()
+
+    if not created and (anterior is None or None in anterior):
+        # Não sabemos como o lançamento estava antes: reconstrói os contadores afetados.
+        recalcular_saldo(instance.edital_id)
+        recalcular_horas_servidor(instance.servidor_id, _ano(instance.data))
+        resumos.recalcular_resumo_edital(instance.edital_id)
+        resumos.recalcular_resumo_unidade(instance.edital.criado_por_id)
+        return
+
+    if anterior == instance._estado_original:
+        return
+
+    saldos = defaultdict(dict)
+    horas = defaultdict(dict)
+    paineis = defaultdict(dict)
+
+    if anterior is not None:
+        status, horas_anteriores, atividade_anterior, edital_anterior, servidor_anterior, data_anterior = anterior
+        if atividade_anterior == instance.atividade_id:
+            valor_hora = valor_hora_atual = valor_hora_da_atividade(instance.atividade_id)
+        else:
+            valor_hora = valor_hora_da_atividade(atividade_anterior)
+        valor_anterior = calcular_valor(horas_anteriores, valor_hora)
+        _somar(saldos, edital_anterior, coluna_do_status(status), -valor_anterior)
+        _somar(horas, (servidor_anterior, _ano(data_anterior)), coluna_de_horas_do_status(status),
+               -Decimal(str(horas_anteriores)))
+        resumos.somar_lancamento(paineis, edital_anterior, status, horas_anteriores, valor_anterior, -1)
+
+    if anterior is None or atividade_anterior != instance.atividade_id:
+        valor_hora_atual = valor_hora_da_atividade(instance.atividade_id)
+    valor_atual = calcular_valor(instance.horas, valor_hora_atual)
+    # Na criação via registrar_lancamento, o valor e as horas já entraram como pendentes na reserva.
+    if not (created and getattr(instance, '_saldo_reservado', False)):
+        _somar(saldos, instance.edital_id, coluna_do_status(instance.status), valor_atual)
+        _somar(horas, (instance.servidor_id, _ano(instance.data)), coluna_de_horas_do_status(instance.status),
+               Decimal(str(instance.horas)))
+    # A reserva não passa pelos resumos dos painéis: o lançamento entra neles sempre aqui.
+    resumos.somar_lancamento(paineis, instance.edital_id, instance.status, instance.horas, valor_atual)
+
+    for edital_id, deltas in saldos.items():
+        aplicar_delta(edital_id, deltas)
+    for (servidor_id, ano), deltas in horas.items():
+        aplicar_delta_horas(servidor_id, ano, deltas)
+    resumos.aplicar_deltas_lancamentos(paineis)
+
+
+@receiver(post_save, sender=Atividade)
+def recalcular_ao_trocar_tipo(sender, instance, created, raw=False, **kwargs):
+    anterior = getattr(instance, '_estado_original', None)
+    instance.capturar_estado_original()
+    if created or raw or anterior == instance.tipo_id:
+        return
+    recalcular_editais(
+        LancamentoHoras.objects.filter(atividade=instance).values_list('edital_id', flat=True).distinct()
+    )
+
+
+@receiver(post_save, sender=TipoAtividade)
+def recalcular_ao_mudar_valor_hora(sender, instance, created, raw=False, **kwargs):
+    anterior = getattr(instance, '_estado_original', None)
+    instance.capturar_estado_original()
+    if created or raw:
+        return
+    if anterior is not None and Decimal(str(anterior)) == Decimal(str(instance.valor_hora)):
+        return
+    recalcular_editais(
+        LancamentoHoras.objects.filter(atividade__tipo=instance).values_list('edital_id', flat=True).distinct()
+    )
+
+
+@receiver(post_delete, sender=LancamentoHoras)
+def atualizar_saldos_ao_remover(sender, instance, **kwargs):
+    # Sem fallback de reconstrução: na exclusão em cascata, os contadores podem já ter sido removidos.
+    valor = calcular_valor(instance.horas, valor_hora_da_atividade(instance.atividade_id))
+    if valor:
+        coluna = coluna_do_status(instance.status)
+        SaldoEdital.objects.filter(edital_id=instance.edital_id).update(**{coluna: F(coluna) - valor})
+
+    horas = Decimal(str(instance.horas))
+    ano = _ano(instance.data)
+    coluna = coluna_de_horas_do_status(instance.status)
+    HorasServidorAno.objects.filter(servidor_id=instance.servidor_id, ano=ano).update(**{coluna: F(coluna) - horas})
+
+    paineis = defaultdict(dict)
+    resumos.somar_lancamento(paineis, instance.edital_id, instance.status, horas, valor, -1)
+    resumos.aplicar_deltas_lancamentos(paineis, reconstruir=False)
@@ -1,9 +1,49 @@
 # core/tests.py
-from django.test import TestCase
+from datetime import date, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from django.core.management import call_command
+from django.core.management.base import CommandError
+import json
+import os
+import struct
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from unittest import mock
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.db.models import F
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.urls import reverse
 from django.utils import timezone
-from .models import Edital, ServidorProfile, TipoAtividade, Atividade, LancamentoHoras
+from pypdf import PdfReader
+from .forms import AtividadeForm, LancamentoHorasForm
+from . import benchmark, catalogo, exportacao, instrumentacao, notificacoes, perfilador, relatorios, views
+from .carga import gerar_carga
+from .management.commands import process_report_jobs
+from .importacao import ler_csv, validar_linhas
+from .lancamentos import registrar_lancamento, validar_em_massa
+from .notificacoes import (
+    Aviso, canal_do_usuario, compactar, eventos_do_usuario, notificar, registrar_criadas, resumo_nao_lidas
+)
+from .pubsub import obter_pubsub
+from .paginacao import CURSOR_ULTIMA, paginar_por_cursor
+from .models import (
+    Edital, ServidorProfile, TipoAtividade, Atividade, LancamentoHoras, SaldoEdital, HorasServidorAno,
+    Notificacao, RelatorioJob, ResumoEdital, ResumoUnidade, Unidade, VersaoCatalogo, sem_perfil_automatico
+)
+from .resumos import verificar_resumos
+from .saldo import verificar_horas_servidores, verificar_saldos
 
 # Helper function to create users with profiles
 def create_user_with_profile(username, password, funcao, first_name="Test", last_name="User"):
@@ -107,4 +147,2108 @@ class ViewAccessTests(TestCase):
         self.assertRedirects(response, reverse('listar_editais'))
         
         # Testa se o edital realmente existe no banco de dados
-        self.assertTrue(Edital.objects.filter(numero_edital='002/2025-POST').exists())
\ No newline at end of file
+        self.assertTrue(Edital.objects.filter(numero_edital='002/2025-POST').exists())
+
+
+class SaldoEditalTests(TestCase):
+
+    def setUp(self):
+        self.demandante = create_user_with_profile('demandante', 'password', 'Unidade Demandante')
+        self.servidor = create_user_with_profile('servidor', 'password', 'Servidor')
+        self.tipo_atividade = TipoAtividade.objects.create(
+            grupo='Banca', nome='Correção de Prova', valor_hora=50.00
+        )
+        self.edital = Edital.objects.create(
+            criado_por=self.demandante,
+            numero_edital='001/2025-SALDO',
+            titulo='Edital de Saldo',
+            unidade_demandante_nome='PRODGEP',
+            data_inicio=timezone.now().date(),
+            data_fim=timezone.now().date(),
+            valor_empenho=1000.00
+        )
+        self.atividade = Atividade.objects.create(
+            tipo=self.tipo_atividade, edital=self.edital, descricao='Correção'
+        )
+
+    def lancar(self, horas, status='Pendente'):
+        return LancamentoHoras.objects.create(
+            servidor=self.servidor, edital=self.edital, atividade=self.atividade,
+            data=timezone.now().date(), horas=horas, descricao_justificativa='Teste', status=status
+        )
+
+    def test_saldo_acompanha_criacao_e_mudanca_de_status(self):
+        """Testa se o saldo é atualizado ao criar e ao mudar o status de um lançamento."""
+        lancamento = self.lancar(2)
+        saldo = SaldoEdital.objects.get(edital=self.edital)
+        self.assertEqual(saldo.valor_pendente, Decimal('100'))
+
+        lancamento.status = 'Aprovado'
+        lancamento.save()
+        saldo.refresh_from_db()
+        self.assertEqual(saldo.valor_pendente, Decimal('0'))
+        self.assertEqual(saldo.valor_comprometido, Decimal('100'))
+
+        lancamento = LancamentoHoras.objects.get(pk=lancamento.pk)
+        lancamento.status = 'Recusado'
+        lancamento.save()
+        saldo.refresh_from_db()
+        self.assertEqual(saldo.valor_comprometido, Decimal('0'))
+        self.assertEqual(saldo.valor_recusado, Decimal('100'))
+
+        lancamento.delete()
+        saldo.refresh_from_db()
+        self.assertEqual(saldo.valor_recusado, Decimal('0'))
+
+    def test_aprovar_e_recusar_o_mesmo_lancamento_so_move_o_saldo_uma_vez(self):
+        """Testa se aprovar e depois recusar (ou clicar duas vezes) um lançamento só aplica a primeira transição."""
+        lancamento = self.lancar(2)
+        self.client.login(username='demandante', password='password')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('registrar_aprovacao_hora', args=[lancamento.pk]))
+            self.client.post(reverse('registrar_aprovacao_hora', args=[lancamento.pk]))
+            response = self.client.post(
+                reverse('registrar_recusa_hora', args=[lancamento.pk]), {'motivo_recusa': 'Atrasado'}, follow=True
+            )
+
+        self.assertContains(response, 'não está mais pendente')
+        lancamento.refresh_from_db()
+        self.assertEqual((lancamento.status, lancamento.comentario_recusa), ('Aprovado', ''))
+        saldo = SaldoEdital.objects.get(edital=self.edital)
+        self.assertEqual(
+            (saldo.valor_pendente, saldo.valor_comprometido, saldo.valor_recusado),
+            (Decimal('0'), Decimal('100'), Decimal('0'))
+        )
+        self.assertEqual(verificar_saldos(), [])
+        self.assertEqual(verificar_horas_servidores(), [])
+        self.assertEqual(Notificacao.objects.filter(usuario=self.servidor).count(), 1)
+
+    def test_validacao_de_orcamento_nao_depende_do_numero_de_lancamentos(self):
+        """Testa se o formulário lê o valor/hora e o saldo em uma consulta cada, sem percorrer os lançamentos."""
+        for _ in range(5):
+            self.lancar(3)
+        form = LancamentoHorasForm(
+            {'data': timezone.now().date(), 'descricao_justificativa': 'Teste', 'horas': '05:00'},
+            atividade=Atividade.objects.select_related('edital', 'tipo').get(pk=self.atividade.pk),
+        )
+        with self.assertNumQueries(2):
+            self.assertTrue(form.is_valid())
+
+        form = LancamentoHorasForm(
+            {'data': timezone.now().date(), 'descricao_justificativa': 'Teste', 'horas': '05:01'},
+            atividade=Atividade.objects.select_related('edital', 'tipo').get(pk=self.atividade.pk),
+        )
+        self.assertFalse(form.is_valid())
+        self.assertIn('horas', form.errors)
+
+    def test_comando_rebuild_saldos_corrige_divergencias(self):
+        """Testa se o comando detecta e corrige um saldo divergente."""
+        self.lancar(2)
+        self.lancar(1, status='Aprovado')
+        SaldoEdital.objects.filter(edital=self.edital).update(valor_pendente=0)
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_saldos', '--check', stdout=StringIO())
+
+        call_command('rebuild_saldos', stdout=StringIO())
+        saldo = SaldoEdital.objects.get(edital=self.edital)
+        self.assertEqual(saldo.valor_pendente, Decimal('100'))
+        self.assertEqual(saldo.valor_comprometido, Decimal('50'))
+        call_command('rebuild_saldos', '--check', stdout=StringIO())
+
+    def test_trocar_tipo_da_atividade_revaloriza_o_saldo(self):
+        """Testa se trocar o tipo da atividade refaz o saldo com o novo valor/hora, sem corromper as aprovações seguintes."""
+        barato = TipoAtividade.objects.create(grupo='Logistica', nome='Apoio Logístico', valor_hora=Decimal('14.33'))
+        caro = TipoAtividade.objects.create(grupo='Instrutoria', nome='Instrutoria Especial', valor_hora=Decimal('81.93'))
+        self.atividade.tipo = barato
+        self.atividade.save()
+        lancamento = self.lancar(10)
+        saldo = SaldoEdital.objects.get(edital=self.edital)
+        self.assertEqual(saldo.valor_pendente, Decimal('143.30'))
+
+        atividade = Atividade.objects.get(pk=self.atividade.pk)
+        atividade.tipo = caro
+        atividade.save()
+        saldo.refresh_from_db()
+        self.assertEqual(saldo.valor_pendente, Decimal('819.30'))
+
+        lancamento = LancamentoHoras.objects.get(pk=lancamento.pk)
+        lancamento.status = 'Aprovado'
+        lancamento.save()
+        saldo.refresh_from_db()
+        self.assertEqual(saldo.valor_pendente, Decimal('0'))
+        self.assertEqual(saldo.valor_comprometido, Decimal('819.30'))
+        self.assertEqual(verificar_saldos(), [])
+        self.assertEqual(verificar_resumos(), [])
+
+    def test_mudar_valor_hora_do_tipo_revaloriza_o_saldo(self):
+        """Testa se mudar o valor/hora de um tipo do catálogo refaz o saldo dos editais que o usam."""
+        self.lancar(2)
+        self.lancar(1, status='Aprovado')
+
+        tipo = TipoAtividade.objects.get(pk=self.tipo_atividade.pk)
+        tipo.valor_hora = Decimal('80.00')
+        tipo.save()
+        saldo = SaldoEdital.objects.get(edital=self.edital)
+        self.assertEqual(saldo.valor_pendente, Decimal('160'))
+        self.assertEqual(saldo.valor_comprometido, Decimal('80'))
+        self.assertEqual(verificar_saldos(), [])
+        self.assertEqual(verificar_resumos(), [])
+
+        # Salvar sem mudar o valor/hora não refaz nada: só o UPDATE do tipo e a troca de versão do catálogo
+        with self.assertNumQueries(2):
+            tipo.save()
+
+
+class HorasServidorAnoTests(TestCase):
+
+    def setUp(self):
+        self.demandante = create_user_with_profile('demandante', 'password', 'Unidade Demandante')
+        self.servidor = create_user_with_profile('servidor', 'password', 'Servidor')
+        self.servidor.servidorprofile.limite_horas_anual = 10
+        self.servidor.servidorprofile.save()
+        tipo = TipoAtividade.objects.create(grupo='Banca', nome='Correção de Prova', valor_hora=10.00)
+        edital = Edital.objects.create(
+            criado_por=self.demandante,
+            numero_edital='001/2025-HORAS',
+            titulo='Edital de Horas',
+            unidade_demandante_nome='PRODGEP',
+            data_inicio=timezone.now().date(),
+            data_fim=timezone.now().date(),
+            valor_empenho=10000.00
+        )
+        self.atividade = Atividade.objects.create(tipo=tipo, edital=edital, descricao='Correção')
+        self.hoje = timezone.localdate()
+
+    def lancar(self, horas):
+        return registrar_lancamento(
+            servidor=User.objects.select_related('servidorprofile').get(pk=self.servidor.pk),
+            atividade=self.atividade,
+            data=self.hoje,
+            horas=horas,
+            descricao_justificativa='Teste',
+        )
+
+    def contador(self):
+        return HorasServidorAno.objects.get(servidor=self.servidor, ano=self.hoje.year)
+
+    def test_contador_acompanha_aprovacao_e_recusa(self):
+        """Testa se o contador anual e o horas_utilizadas acompanham as mudanças de status."""
+        aprovado = self.lancar(4)
+        recusado = self.lancar(3)
+        self.assertEqual(self.contador().horas_pendentes, Decimal('7'))
+
+        aprovado.status = 'Aprovado'
+        aprovado.save()
+        recusado.status = 'Recusado'
+        recusado.save()
+
+        contador = self.contador()
+        self.assertEqual(contador.horas_comprometidas, Decimal('4'))
+        self.assertEqual(contador.horas_pendentes, Decimal('0'))
+        self.assertEqual(contador.horas_recusadas, Decimal('3'))
+        self.assertEqual(ServidorProfile.objects.get(user=self.servidor).horas_utilizadas, Decimal('4'))
+
+    def test_limite_anual_e_verificado_na_submissao(self):
+        """Testa se um lançamento acima do limite anual do servidor é recusado."""
+        self.lancar(8)
+        with self.assertRaises(ValidationError):
+            self.lancar(3)
+        self.lancar(2)
+        self.assertEqual(ServidorProfile.objects.get(user=self.servidor).horas_utilizadas, Decimal('10'))
+
+    def test_horas_utilizadas_sao_as_do_ano_corrente(self):
+        """Testa se as horas de anos anteriores não contam no horas_utilizadas nem no limite do ano corrente."""
+        self.lancar(6)
+        # Simula a virada do ano: os lançamentos de hoje passam a ser do ano anterior
+        HorasServidorAno.objects.filter(servidor=self.servidor).update(ano=self.hoje.year - 1)
+        LancamentoHoras.objects.filter(servidor=self.servidor).update(data=self.hoje.replace(year=self.hoje.year - 1))
+
+        perfil = ServidorProfile.objects.get(user=self.servidor)
+        self.assertEqual(perfil.horas_utilizadas, 0)
+        self.assertEqual(perfil.horas_disponiveis, 10)
+        self.lancar(8)
+        self.assertEqual(ServidorProfile.objects.get(user=self.servidor).horas_utilizadas, Decimal('8'))
+
+    def test_comando_de_reconciliacao_relata_e_corrige_divergencias(self):
+        """Testa se o comando de reconciliação detecta e corrige contadores divergentes."""
+        self.lancar(5)
+        HorasServidorAno.objects.update(horas_pendentes=1)
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_horas_servidores', '--check', stdout=StringIO())
+
+        call_command('rebuild_horas_servidores', stdout=StringIO())
+        self.assertEqual(self.contador().horas_pendentes, Decimal('5'))
+        self.assertEqual(ServidorProfile.objects.get(user=self.servidor).horas_utilizadas, Decimal('5'))
+        call_command('rebuild_horas_servidores', '--check', stdout=StringIO())
+
+
+class ValidacaoEmMassaTests(TestCase):
+
+    def setUp(self):
+        self.demandante = create_user_with_profile('demandante', 'password', 'Unidade Demandante')
+        self.outro_demandante = create_user_with_profile('outro_demandante', 'password', 'Unidade Demandante')
+        self.servidor = create_user_with_profile('servidor', 'password', 'Servidor')
+        tipo = TipoAtividade.objects.create(grupo='Banca', nome='Correção de Prova', valor_hora=10.00)
+        self.edital = self.criar_edital('001/2025-MASSA', self.demandante)
+        self.atividade = Atividade.objects.create(tipo=tipo, edital=self.edital, descricao='Correção')
+        outro_edital = self.criar_edital('002/2025-MASSA', self.outro_demandante)
+        self.atividade_alheia = Atividade.objects.create(tipo=tipo, edital=outro_edital, descricao='Correção')
+        self.client.login(username='demandante', password='password')
+
+    def criar_edital(self, numero, criado_por):
+        return Edital.objects.create(
+            criado_por=criado_por,
+            numero_edital=numero,
+            titulo='Edital em Massa',
+            unidade_demandante_nome='PRODGEP',
+            data_inicio=timezone.now().date(),
+            data_fim=timezone.now().date(),
+            valor_empenho=10000.00
+        )
+
+    def lancar(self, atividade, status='Pendente'):
+        return LancamentoHoras.objects.create(
+            servidor=self.servidor, edital=atividade.edital, atividade=atividade,
+            data=timezone.now().date(), horas=2, descricao_justificativa='Teste', status=status
+        )
+
+    def test_aprovacao_em_massa_por_ids_retorna_resultado_por_item(self):
+        """Testa a aprovação em massa por IDs, com resultado individual para cada lançamento."""
+        pendentes = [self.lancar(self.atividade) for _ in range(5)]
+        ja_aprovado = self.lancar(self.atividade, status='Aprovado')
+        alheio = self.lancar(self.atividade_alheia)
+        ids = [lancamento.pk for lancamento in pendentes] + [ja_aprovado.pk, alheio.pk]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('registrar_validacao_em_massa'),
+                {'acao': 'aprovar', 'ids': ids},
+                HTTP_ACCEPT='application/json',
+            )
+
+        dados = response.json()
+        self.assertEqual(dados['processados'], 5)
+        self.assertEqual(dados['resultados'][str(pendentes[0].pk)], 'Aprovado')
+        self.assertEqual(dados['resultados'][str(ja_aprovado.pk)], 'nao_pendente')
+        self.assertEqual(dados['resultados'][str(alheio.pk)], 'nao_encontrado')
+        self.assertEqual(LancamentoHoras.objects.filter(status='Aprovado', validado_por=self.demandante).count(), 5)
+        # Os 5 avisos para o mesmo servidor são juntados em uma notificação
+        notificacao = Notificacao.objects.get(usuario=self.servidor)
+        self.assertEqual(notificacao.mensagem, '5 lançamentos seus foram APROVADOS.')
+        self.assertEqual(LancamentoHoras.objects.get(pk=alheio.pk).status, 'Pendente')
+        call_command('rebuild_saldos', '--check', stdout=StringIO())
+        call_command('rebuild_horas_servidores', '--check', stdout=StringIO())
+
+    def test_recusa_em_massa_por_edital_com_numero_fixo_de_consultas(self):
+        """Testa a recusa de todos os pendentes de um edital sem consultas por lançamento."""
+        tipo = self.atividade.tipo
+        pequeno = Atividade.objects.create(
+            tipo=tipo, edital=self.criar_edital('003/2025-MASSA', self.demandante), descricao='Correção'
+        )
+        self.lancar(pequeno)
+        for _ in range(30):
+            self.lancar(self.atividade)
+
+        consultas = []
+        for edital in (pequeno.edital, self.edital):
+            with CaptureQueriesContext(connection) as capturadas:
+                self.client.post(reverse('registrar_validacao_em_massa'), {
+                    'acao': 'recusar', 'edital': edital.pk, 'motivo_recusa': 'Fora do prazo'
+                })
+            consultas.append(len(capturadas))
+        self.assertEqual(consultas[0], consultas[1])
+
+        self.assertFalse(LancamentoHoras.objects.filter(status='Pendente').exclude(atividade=self.atividade_alheia).exists())
+        self.assertEqual(
+            LancamentoHoras.objects.filter(edital=self.edital, comentario_recusa='Fora do prazo').count(), 30
+        )
+        saldo = SaldoEdital.objects.get(edital=self.edital)
+        self.assertEqual(saldo.valor_pendente, Decimal('0'))
+        self.assertEqual(saldo.valor_recusado, Decimal('600'))
+
+
+class FilaRelatoriosTests(TestCase):
+
+    def setUp(self):
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(self.diretorio.cleanup)
+        override = override_settings(RELATORIOS_DIR=self.diretorio.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.demandante = create_user_with_profile('demandante', 'password', 'Unidade Demandante')
+        self.prodgep = create_user_with_profile('prodgep', 'password', 'PRODGEP/PROPEG')
+        self.edital = Edital.objects.create(
+            criado_por=self.demandante,
+            numero_edital='001/2025-PDF',
+            titulo='Edital do Relatório',
+            unidade_demandante_nome='PRODGEP',
+            data_inicio=timezone.now().date(),
+            data_fim=timezone.now().date()
+        )
+        self.client.login(username='prodgep', password='password')
+
+    def test_relatorio_solicitado_e_gerado_pelo_worker(self):
+        """Testa o ciclo completo: solicitar, processar no worker, consultar status e baixar."""
+        response = self.client.post(
+            reverse('solicitar_relatorio_edital', args=[self.edital.pk]), HTTP_ACCEPT='application/json'
+        )
+        self.assertEqual(response.status_code, 202)
+        job = RelatorioJob.objects.get(pk=response.json()['id'])
+        self.assertEqual(job.status, 'Pendente')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('process_report_jobs', '--once', '--workers', '0', stdout=StringIO())
+
+        status = self.client.get(reverse('status_relatorio', args=[job.pk])).json()
+        self.assertEqual(status['status'], 'Concluído')
+        self.assertTrue(Notificacao.objects.filter(usuario=self.prodgep, link=status['download_url']).exists())
+
+        download = self.client.get(status['download_url'])
+        self.assertEqual(download.status_code, 200)
+        self.assertTrue(b''.join(download.streaming_content).startswith(b'%PDF'))
+
+    def test_apenas_o_solicitante_acessa_o_relatorio(self):
+        """Testa se outro usuário não consegue consultar nem baixar o relatório."""
+        job = RelatorioJob.objects.create(tipo='auditoria', solicitado_por=self.prodgep)
+        call_command('process_report_jobs', '--once', '--workers', '0', stdout=StringIO())
+
+        self.client.login(username='demandante', password='password')
+        self.assertEqual(self.client.get(reverse('status_relatorio', args=[job.pk])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('baixar_relatorio', args=[job.pk])).status_code, 404)
+
+    @override_settings(RELATORIOS_JOB_TIMEOUT=600)
+    def test_worker_devolve_a_fila_apenas_jobs_abandonados(self):
+        """Testa se, ao iniciar, o worker só devolve à fila os jobs parados há mais que o timeout."""
+        agora = timezone.now()
+        abandonado = RelatorioJob.objects.create(
+            tipo='auditoria', solicitado_por=self.prodgep, status='Processando', iniciado_em=agora - timedelta(hours=1)
+        )
+        em_andamento = RelatorioJob.objects.create(
+            tipo='auditoria', solicitado_por=self.prodgep, status='Processando', iniciado_em=agora - timedelta(minutes=1)
+        )
+
+        call_command('process_report_jobs', '--once', '--workers', '0', stdout=StringIO())
+
+        abandonado.refresh_from_db()
+        em_andamento.refresh_from_db()
+        self.assertEqual(abandonado.status, 'Concluído')
+        self.assertEqual(em_andamento.status, 'Processando')
+
+    def test_job_removido_depois_de_reservado_nao_derruba_o_worker(self):
+        """Testa se processar um job que já não existe apenas retorna None."""
+        job = RelatorioJob.objects.create(tipo='auditoria', solicitado_por=self.prodgep)
+        self.assertEqual(relatorios.reservar_proximos_jobs(1), [job.pk])
+        job.delete()
+        self.assertIsNone(relatorios.processar_job(job.pk))
+
+    def test_pool_quebrado_e_recriado_sem_perder_os_jobs(self):
+        """Testa se, quando um processo do pool morre, o job em execução vira erro, o não enviado volta à fila e o pool é recriado."""
+        pools = []
+
+        class PoolQueQuebra:
+            def __init__(self, *args, **kwargs):
+                self.primeiro = not pools
+                pools.append(self)
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *args):
+                return False
+
+            def submit(self, funcao, *args):
+                futuro = Future()
+                if not self.primeiro:
+                    futuro.set_result(funcao(*args))
+                elif len(pools) == 1 and not getattr(self, 'quebrado', False):
+                    # O processo que recebeu o primeiro job morre e quebra o pool
+                    self.quebrado = True
+                    futuro.set_exception(BrokenProcessPool('processo encerrado'))
+                else:
+                    raise BrokenProcessPool('pool quebrado')
+                return futuro
+
+        derrubou = RelatorioJob.objects.create(tipo='auditoria', solicitado_por=self.prodgep)
+        esperando = RelatorioJob.objects.create(tipo='auditoria', solicitado_por=self.prodgep)
+        erros = StringIO()
+        with mock.patch.object(process_report_jobs, 'ProcessPoolExecutor', PoolQueQuebra), \
+                self.captureOnCommitCallbacks(execute=True):
+            call_command('process_report_jobs', '--once', '--workers', '2', stdout=StringIO(), stderr=erros)
+
+        derrubou.refresh_from_db()
+        esperando.refresh_from_db()
+        self.assertEqual(len(pools), 2)
+        self.assertEqual((derrubou.status, esperando.status), ('Erro', 'Concluído'))
+        self.assertIn('encerrado inesperadamente', derrubou.erro)
+        self.assertIn('1 devolvido(s) à fila', erros.getvalue())
+        self.assertTrue(Notificacao.objects.filter(usuario=self.prodgep, mensagem__startswith='Não foi possível').exists())
+
+    @override_settings(RELATORIOS_RETENCAO_DIAS=7)
+    def test_relatorios_antigos_sao_removidos(self):
+        """Testa se jobs concluídos além da retenção, seus PDFs e PDFs de jobs removidos são apagados."""
+        diretorio = Path(self.diretorio.name)
+        antigo = timezone.now() - timedelta(days=8)
+        velho = RelatorioJob.objects.create(
+            tipo='auditoria', solicitado_por=self.prodgep, status='Concluído', arquivo='1001.pdf', concluido_em=antigo
+        )
+        recente = RelatorioJob.objects.create(
+            tipo='auditoria', solicitado_por=self.prodgep, status='Concluído', arquivo='1002.pdf',
+            concluido_em=timezone.now()
+        )
+        falho = RelatorioJob.objects.create(tipo='auditoria', solicitado_por=self.prodgep, status='Erro', concluido_em=antigo)
+        pendente = RelatorioJob.objects.create(tipo='auditoria', solicitado_por=self.prodgep)
+        RelatorioJob.objects.filter(pk=velho.pk).update(arquivo=f'{velho.pk}.pdf')
+        RelatorioJob.objects.filter(pk=recente.pk).update(arquivo=f'{recente.pk}.pdf')
+        for nome in (f'{velho.pk}.pdf', f'{recente.pk}.pdf', '999999.pdf', '999998.pdf'):
+            (diretorio / nome).write_bytes(b'%PDF')
+        # PDF de um job que já não existe: só o antigo é apagado
+        os.utime(diretorio / '999999.pdf', (antigo.timestamp(), antigo.timestamp()))
+
+        saida = StringIO()
+        call_command('prune_report_jobs', stdout=saida)
+
+        self.assertIn('2 relatório(s)', saida.getvalue())
+        self.assertEqual(
+            set(RelatorioJob.objects.values_list('pk', flat=True)), {recente.pk, pendente.pk}
+        )
+        self.assertFalse(RelatorioJob.objects.filter(pk=falho.pk).exists())
+        self.assertEqual(sorted(p.name for p in diretorio.glob('*.pdf')), sorted([f'{recente.pk}.pdf', '999998.pdf']))
+
+
+class CacheRelatoriosTests(TestCase):
+
+    def setUp(self):
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(self.diretorio.cleanup)
+        override = override_settings(RELATORIOS_DIR=self.diretorio.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        demandante = create_user_with_profile('demandante', 'password', 'Unidade Demandante')
+        self.servidor = create_user_with_profile('servidor', 'password', 'Servidor')
+        tipo = TipoAtividade.objects.create(grupo='Banca', nome='Correção de Prova', valor_hora=10.00)
+        self.edital = Edital.objects.create(
+            criado_por=demandante,
+            numero_edital='001/2025-CACHE',
+            titulo='Edital em Cache',
+            unidade_demandante_nome='PRODGEP',
+            data_inicio=timezone.now().date(),
+            data_fim=timezone.now().date(),
+            valor_empenho=1000.00
+        )
+        atividade = Atividade.objects.create(tipo=tipo, edital=self.edital, descricao='Correção')
+        self.lancamento = LancamentoHoras.objects.create(
+            servidor=self.servidor, edital=self.edital, atividade=atividade,
+            data=timezone.now().date(), horas=2, descricao_justificativa='Teste', status='Aprovado'
+        )
+
+    def test_pdf_repetido_sai_do_cache_ate_um_lancamento_mudar(self):
+        """Testa se o PDF só é gerado de novo quando os lançamentos do edital mudam."""
+        def caminho_do_pdf():
+            with relatorios.arquivo_pdf_edital(self.edital) as arquivo:
+                return Path(arquivo.name)
+
+        with mock.patch.object(relatorios, 'gerar_pdf_edital', wraps=relatorios.gerar_pdf_edital) as gerar:
+            primeiro = caminho_do_pdf()
+            segundo = caminho_do_pdf()
+            self.assertEqual(primeiro, segundo)
+            self.assertEqual(gerar.call_count, 1)
+
+            self.lancamento.status = 'Homologado'
+            self.lancamento.save()
+            terceiro = caminho_do_pdf()
+            self.assertEqual(gerar.call_count, 2)
+
+        self.assertNotEqual(primeiro, terceiro)
+        self.assertFalse(primeiro.exists())
+
+    def test_cache_descarta_os_arquivos_usados_ha_mais_tempo(self):
+        """Testa a remoção LRU quando o cache passa do tamanho máximo."""
+        with relatorios.obter_do_cache('a', [1], lambda: b'x' * 100) as arquivo:
+            antigo = Path(arquivo.name)
+        with relatorios.obter_do_cache('b', [1], lambda: b'y' * 100) as arquivo:
+            recente = Path(arquivo.name)
+        os.utime(antigo, (1, 1))
+
+        relatorios.limpar_cache(limite_bytes=150)
+
+        self.assertFalse(antigo.exists())
+        self.assertTrue(recente.exists())
+
+    @override_settings(RELATORIOS_CACHE_MAX_BYTES=10)
+    def test_pdf_maior_que_o_cache_ainda_e_entregue(self):
+        """Testa se a limpeza disparada pela gravação não descarta o PDF que acabou de ser gerado."""
+        with relatorios.obter_do_cache('grande', [1], lambda: b'x' * 100) as arquivo:
+            self.assertEqual(arquivo.read(), b'x' * 100)
+
+        create_user_with_profile('prodgep', 'password', 'PRODGEP/PROPEG')
+        self.client.login(username='prodgep', password='password')
+        response = self.client.get(reverse('exportar_edital_pdf', args=[self.edital.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+        response.close()
+
+    def test_pdf_descartado_por_outro_processo_continua_legivel(self):
+        """Testa se o arquivo devolvido continua legível mesmo se outro processo limpar o cache em seguida."""
+        with relatorios.obter_do_cache('a', [1], lambda: b'x' * 100) as arquivo:
+            relatorios.limpar_cache(limite_bytes=0)
+            self.assertEqual(arquivo.read(), b'x' * 100)
+
+
+class RelatorioEmBlocosTests(TestCase):
+
+    def setUp(self):
+        demandante = create_user_with_profile('demandante', 'password', 'Unidade Demandante')
+        servidor = create_user_with_profile('servidor', 'password', 'Servidor')
+        tipo = TipoAtividade.objects.create(grupo='Banca', nome='Correção de Prova', valor_hora=10.00)
+        edital = Edital.objects.create(
+            criado_por=demandante,
+            numero_edital='001/2025-BLOCOS',
+            titulo='Edital em Blocos',
+            unidade_demandante_nome='PRODGEP',
+            data_inicio=timezone.now().date(),
+            data_fim=timezone.now().date(),
+            valor_empenho=1000.00
+        )
+        atividade = Atividade.objects.create(tipo=tipo, edital=edital, descricao='Correção')
+        for _ in range(5):
+            LancamentoHoras.objects.create(
+                servidor=servidor, edital=edital, atividade=atividade,
+                data=timezone.now().date(), horas=1, descricao_justificativa='Teste', status='Homologado'
+            )
+
+    def test_pdf_de_auditoria_e_renderizado_em_blocos(self):
+        """Testa se o relatório de auditoria gera um PDF por bloco de linhas e concatena as páginas."""
+        with mock.patch.object(relatorios, 'HTML', wraps=relatorios.HTML) as html:
+            pdf = relatorios.gerar_pdf_auditoria(tamanho_bloco=2)
+
+        # 5 lançamentos em blocos de 2 -> 3 documentos; só o primeiro traz o título
+        self.assertEqual(html.call_count, 3)
+        self.assertIn('<h1>', html.call_args_list[0].kwargs['string'])
+        self.assertNotIn('<h1>', html.call_args_list[1].kwargs['string'])
+        self.assertTrue(pdf.startswith(b'%PDF'))
+        self.assertEqual(len(PdfReader(BytesIO(pdf)).pages), 3)
+
+    def test_bloco_unico_nao_passa_pela_juncao(self):
+        """Testa se um relatório que cabe em um bloco é devolvido sem concatenar PDFs."""
+        with mock.patch.object(relatorios, 'PdfWriter') as juncao:
+            pdf = relatorios.gerar_pdf_auditoria(tamanho_bloco=0)
+
+        juncao.assert_not_called()
+        self.assertEqual(len(PdfReader(BytesIO(pdf)).pages), 1)
+
+
+class ExportacaoAuditoriaTests(TestCase):
+
+    def setUp(self):
+        self.prodgep = create_user_with_profile('prodgep', 'password', 'PRODGEP/PROPEG')
+        demandante = create_user_with_profile('demandante', 'password', 'Unidade Demandante')
+        self.servidor = create_user_with_profile('servidor', 'password', 'Servidor')
+        self.unidade = Unidade.objects.create(sigla='IC', nome='Instituto de Computação')
+        self.servidor.servidorprofile.unidade = self.unidade
+        self.servidor.servidorprofile.save()
+
+        tipo = TipoAtividade.objects.create(grupo='Banca', nome='Correção de Prova', valor_hora=10.00)
+        self.edital = Edital.objects.create(
+            criado_por=demandante,
+            numero_edital='001/2025-EXP',
+            titulo='Edital Exportado',
+            unidade_demandante_nome='PRODGEP',
+            data_inicio=timezone.now().date(),
+            data_fim=timezone.now().date(),
+            valor_empenho=1000.00
+        )
+        atividade = Atividade.objects.create(tipo=tipo, edital=self.edital, descricao='Correção')
+        for dia, status in [(1, 'Aprovado'), (2, 'Homologado'), (3, 'Pendente')]:
+            LancamentoHoras.objects.create(
+                servidor=self.servidor, edital=self.edital, atividade=atividade,
+                data=date(2025, 3, dia), horas=Decimal('1.50'), descricao_justificativa='Teste', status=status
+            )
+        self.client.login(username='prodgep', password='password')
+
+    def _conteudo(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_csv_aplica_filtros_e_ignora_pendentes(self):
+        """Testa se o CSV traz só lançamentos auditáveis que passam nos filtros."""
+        response = self.client.get(reverse('exportar_auditoria_csv'))
+        linhas = self._conteudo(response).decode('utf-8-sig').splitlines()
+        self.assertEqual(len(linhas), 3)
+        self.assertTrue(linhas[0].startswith('Data;Servidor'))
+        self.assertIn('01/03/2025;Test User;servidor;IC;001/2025-EXP', linhas[1])
+
+        response = self.client.get(reverse('exportar_auditoria_csv'), {
+            'edital': self.edital.pk, 'data_inicio': '2025-03-02', 'status': 'Homologado', 'unidade': self.unidade.pk,
+        })
+        linhas = self._conteudo(response).decode('utf-8-sig').splitlines()
+        self.assertEqual(len(linhas), 2)
+        self.assertIn('Homologado', linhas[1])
+
+    def test_xlsx_e_uma_planilha_valida(self):
+        """Testa se o XLSX gerado em streaming abre como zip com a planilha esperada."""
+        response = self.client.get(reverse('exportar_auditoria_xlsx'))
+        with zipfile.ZipFile(BytesIO(self._conteudo(response))) as arquivo:
+            self.assertIsNone(arquivo.testzip())
+            planilha = arquivo.read('xl/worksheets/sheet1.xml').decode()
+        self.assertEqual(planilha.count('<row>'), 3)
+        self.assertIn('001/2025-EXP', planilha)
+        self.assertIn('<v>1.50</v>', planilha)
+
+    def test_planilha_do_xlsx_e_gravada_com_zip64(self):
+        """Testa se a planilha sai com cabeçalho zip64, para não falhar quando passar de 2 GiB."""
+        conteudo = b''.join(exportacao.gerar_xlsx([]))
+        with zipfile.ZipFile(BytesIO(conteudo)) as arquivo:
+            inicio = arquivo.getinfo('xl/worksheets/sheet1.xml').header_offset
+        # O cabeçalho local tem 30 bytes fixos; o campo extra zip64 tem o identificador 0x0001
+        tamanho_nome, tamanho_extra = struct.unpack('<HH', conteudo[inicio + 26:inicio + 30])
+        extra = conteudo[inicio + 30 + tamanho_nome:inicio + 30 + tamanho_nome + tamanho_extra]
+        self.assertEqual(struct.unpack('<H', extra[:2])[0], 0x0001)
+
+    def test_filtro_invalido_volta_para_a_auditoria(self):
+        """Testa se um período invertido não gera arquivo e mostra o erro."""
+        response = self.client.get(
+            reverse('exportar_auditoria_csv'), {'data_inicio': '2025-03-05', 'data_fim': '2025-03-01'}
+        )
+        self.assertRedirects(response, reverse('auditoria_horas'))
+
+
+class PaginacaoCursorTests(TestCase):
+
+    def setUp(self):
+        self.demandante = create_user_with_profile('demandante', 'password', 'Unidade Demandante')
+        servidor = create_user_with_profile('servidor', 'password', 'Servidor')
+        tipo = TipoAtividade.objects.create(grupo='Banca', nome='Correção de Prova', valor_hora=10.00)
+        edital = Edital.objects.create(
+            criado_por=self.demandante,
+            numero_edital='001/2025-PAG',
+            titulo='Edital Paginado',
+            unidade_demandante_nome='PRODGEP',
+            data_inicio=timezone.now().date(),
+            data_fim=timezone.now().date(),
+            valor_empenho=100000.00
+        )
+        atividade = Atividade.objects.create(tipo=tipo, edital=edital, descricao='Correção')
+        # Várias datas repetidas, para exercitar o desempate pelo pk
+        for i in range(23):
+            LancamentoHoras.objects.create(
+                servidor=servidor, edital=edital, atividade=atividade,
+                data=date(2025, 3, 1 + i % 4), horas=1, descricao_justificativa='Teste'
+            )
+        self.queryset = LancamentoHoras.objects.all()
+
+    def _percorrer(self, ordenacao):
+        paginas = [paginar_por_cursor(self.queryset, ordenacao, por_pagina=5)]
+        while paginas[-1].has_next:
+            paginas.append(paginar_por_cursor(self.queryset, ordenacao, paginas[-1].next_cursor, por_pagina=5))
+        return paginas
+
+    def test_percorre_todos_os_itens_sem_repetir_nos_dois_sentidos(self):
+        """Testa se avançar e voltar pelas páginas visita cada lançamento uma vez, na ordem certa."""
+        paginas = self._percorrer('-data')
+        pks = [item.pk for pagina in paginas for item in pagina]
+        esperado = list(self.queryset.order_by('-data', '-pk').values_list('pk', flat=True))
+        self.assertEqual(pks, esperado)
+        self.assertEqual(len(paginas), 5)
+        self.assertFalse(paginas[0].has_previous)
+
+        anterior = paginar_por_cursor(self.queryset, '-data', paginas[3].previous_cursor, por_pagina=5)
+        self.assertEqual([i.pk for i in anterior], [i.pk for i in paginas[2]])
+
+        ultima = paginar_por_cursor(self.queryset, '-data', CURSOR_ULTIMA, por_pagina=5)
+        self.assertEqual([i.pk for i in ultima], esperado[-5:])
+        self.assertFalse(ultima.has_next)
+
+    def test_cursor_invalido_ou_de_outra_ordenacao_volta_ao_inicio(self):
+        """Testa se um cursor adulterado não é aceito."""
+        pagina = paginar_por_cursor(self.queryset, 'data', por_pagina=5)
+        primeira = [i.pk for i in pagina]
+        self.assertEqual([i.pk for i in paginar_por_cursor(self.queryset, 'data', 'lixo', por_pagina=5)], primeira)
+        outra = paginar_por_cursor(self.queryset, '-data', pagina.next_cursor, por_pagina=5)
+        self.assertFalse(outra.has_previous)
+
+    def test_contagem_aproximada(self):
+        """Testa se a contagem para no limite configurado."""
+        self.assertEqual(paginar_por_cursor(self.queryset, 'data', limite_contagem=100).total, 23)
+        pagina = paginar_por_cursor(self.queryset, 'data', limite_contagem=10)
+        self.assertEqual(pagina.total, 10)
+        self.assertTrue(pagina.total_aproximado)
+        self.assertIsNone(paginar_por_cursor(self.queryset, 'data', limite_contagem=0).total)
+
+    def test_paginas_profundas_nao_usam_offset(self):
+        """Testa se a fila de aprovação não usa OFFSET nem COUNT completo em páginas adiante."""
+        self.client.login(username='demandante', password='password')
+        url = reverse('aprovar_horas')
+        response = self.client.get(url, {'sort': 'horas'})
+        cursor = response.context['page_obj'].next_cursor
+
+        with CaptureQueriesContext(connection) as primeira:
+            self.client.get(url, {'sort': 'horas'})
+        with CaptureQueriesContext(connection) as seguinte:
+            response = self.client.get(url, {'sort': 'horas', 'cursor': cursor})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['page_obj'].has_previous)
+        self.assertEqual(len(primeira), len(seguinte))
+        self.assertFalse(any('OFFSET' in q['sql'] for q in seguinte.captured_queries))
+
+    def test_homologacao_de_editais_mantem_os_mais_recentes_primeiro(self):
+        """Testa se, sem `sort`, a fila de homologação continua ordenada por data de início decrescente."""
+        create_user_with_profile('prodgep', 'password', 'PRODGEP/PROPEG')
+        for dia in (3, 1, 2):
+            Edital.objects.create(
+                criado_por=self.demandante,
+                numero_edital=f'00{dia}/2025-HOM',
+                titulo='Edital a Homologar',
+                unidade_demandante_nome='PRODGEP',
+                data_inicio=date(2025, 3, dia),
+                data_fim=date(2025, 12, 31),
+                valor_empenho=1000.00,
+                status='Aguardando Homologação'
+            )
+
+        self.client.login(username='prodgep', password='password')
+        response = self.client.get(reverse('homologar_editais'))
+        datas = [edital.data_inicio.day for edital in response.context['page_obj']]
+        self.assertEqual(datas, [3, 2, 1])
+
+
+class IndicesConsultasTests(TestCase):
+    """Confere no EXPLAIN QUERY PLAN do SQLite que as consultas das telas mais usadas usam os índices."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.demandante = create_user_with_profile('demandante', 'password', 'Unidade Demandante')
+        cls.servidor = create_user_with_profile('servidor', 'password', 'Servidor')
+        cls.prodgep = create_user_with_profile('prodgep', 'password', 'PRODGEP/PROPEG')
+        outros = User.objects.bulk_create([User(username=f'outro{i}') for i in range(200)])
+        ServidorProfile.objects.bulk_create([
+            ServidorProfile(user=user, status='Homologado' if i % 20 else 'Aguardando Homologação')
+            for i, user in enumerate(outros)
+        ])
+
+        tipo = TipoAtividade.objects.create(grupo='Banca', nome='Correção de Prova', valor_hora=10.00)
+        editais = Edital.objects.bulk_create([
+            Edital(
+                criado_por=cls.demandante if i % 10 == 0 else cls.prodgep,
+                numero_edital=f'{i:03d}/2025-IDX',
+                titulo='Edital',
+                unidade_demandante_nome='PRODGEP',
+                data_inicio=date(2025, 1, 1) + timedelta(days=i),
+                data_fim=date(2025, 12, 31),
+                status='Aguardando Homologação' if i % 25 == 0 else 'Em Execução',
+            )
+            for i in range(100)
+        ])
+        atividades = Atividade.objects.bulk_create([
+            Atividade(tipo=tipo, edital=edital, descricao='Correção') for edital in editais
+        ])
+        lancamentos = []
+        for i in range(5000):
+            atividade = atividades[i % len(atividades)]
+            lancamentos.append(LancamentoHoras(
+                servidor=cls.servidor if i % 50 == 0 else outros[i % len(outros)],
+                edital_id=atividade.edital_id, atividade=atividade,
+                data=date(2025, 1, 1) + timedelta(days=i % 365), horas=1, descricao_justificativa='Teste',
+                status='Pendente' if i % 30 == 0 else 'Aprovado',
+            ))
+        LancamentoHoras.objects.bulk_create(lancamentos)
+        Notificacao.objects.bulk_create([
+            Notificacao(usuario=outros[i % len(outros)] if i % 40 else cls.demandante, mensagem='Aviso', lida=i % 7 != 0)
+            for i in range(4000)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def _plano(self, usuario, url, tabela, trecho=''):
+        """Executa a view e devolve o plano da primeira consulta que lê `tabela` (e contém `trecho`)."""
+        self.client.force_login(usuario)
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        sql = next(q['sql'] for q in consultas.captured_queries if f'FROM "{tabela}"' in q['sql'] and trecho in q['sql'])
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return '\n'.join(linha[-1] for linha in cursor.fetchall())
+
+    def assertUsaIndice(self, plano, indice, tabela):
+        self.assertIn(indice, plano)
+        self.assertNotRegex(plano, rf'SCAN {tabela}\b(?! USING)')
+
+    def test_aprovar_horas(self):
+        """Testa se a fila de aprovação usa o índice parcial de pendentes."""
+        plano = self._plano(self.demandante, reverse('aprovar_horas'), 'core_lancamentohoras')
+        self.assertUsaIndice(plano, 'lanc_pendente_edital_data_idx', 'core_lancamentohoras')
+
+    def test_historico_lancamentos(self):
+        """Testa se o histórico do servidor usa o índice (servidor, data)."""
+        plano = self._plano(self.servidor, reverse('historico_lancamentos'), 'core_lancamentohoras')
+        self.assertUsaIndice(plano, 'lanc_servidor_data_idx', 'core_lancamentohoras')
+
+    def test_listar_editais(self):
+        """Testa se a lista de editais da unidade usa o índice (criado_por, created_at)."""
+        plano = self._plano(self.demandante, reverse('listar_editais'), 'core_edital')
+        self.assertUsaIndice(plano, 'edital_criador_criacao_idx', 'core_edital')
+
+    def test_homologar_editais(self):
+        """Testa se a fila de homologação de editais usa o índice (status, data_inicio)."""
+        plano = self._plano(self.prodgep, reverse('homologar_editais'), 'core_edital')
+        self.assertUsaIndice(plano, 'edital_status_inicio_idx', 'core_edital')
+
+    def test_homologar_servidores(self):
+        """Testa se a fila de homologação de servidores usa o índice de status."""
+        plano = self._plano(
+            self.prodgep, reverse('homologar_servidores'), 'core_servidorprofile', '"core_servidorprofile"."status" ='
+        )
+        self.assertUsaIndice(plano, 'servidor_status_idx', 'core_servidorprofile')
+
+    def test_notificacoes_nao_lidas(self):
+        """Testa se o sino usa o índice parcial de notificações não lidas."""
+        plano = self._plano(self.demandante, reverse('get_notificacoes_nao_lidas'), 'core_notificacao')
+        self.assertUsaIndice(plano, 'notif_nao_lidas_idx', 'core_notificacao')
+
+
+class NotificacoesTempoRealTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.usuario = create_user_with_profile('servidor', 'password', 'Servidor')
+        Notificacao.objects.create(usuario=self.usuario, mensagem='Antiga')
+
+    def test_sem_asgi_o_stream_manda_o_navegador_voltar_ao_polling(self):
+        """Testa se o stream responde 204 quando a requisição não veio por ASGI."""
+        self.client.login(username='servidor', password='password')
+        response = self.client.get(reverse('stream_notificacoes'))
+        self.assertEqual(response.status_code, 204)
+
+    def test_sem_asgi_a_pagina_nao_abre_o_stream(self):
+        """Testa se, sob WSGI, a página busca as notificações uma vez sem abrir o EventSource."""
+        self.client.login(username='servidor', password='password')
+        response = self.client.get(reverse('painel'))
+        self.assertFalse(response.context['notificacoes_em_tempo_real'])
+        self.assertNotContains(response, reverse('stream_notificacoes'))
+        self.assertContains(response, reverse('get_notificacoes_nao_lidas'))
+
+    async def test_sob_asgi_a_pagina_abre_o_stream(self):
+        """Testa se, sob ASGI, a página abre o EventSource do stream de notificações."""
+        await self.async_client.aforce_login(self.usuario)
+        response = await self.async_client.get(reverse('painel'))
+        self.assertTrue(response.context['notificacoes_em_tempo_real'])
+        self.assertContains(response, reverse('stream_notificacoes'))
+
+    def test_notificacao_criada_e_publicada_apos_o_commit(self):
+        """Testa se criar uma notificação (inclusive via bulk_create) publica no canal do usuário."""
+        publicadas = []
+        pubsub = mock.Mock(publicar=lambda canal, mensagem: publicadas.append((canal, mensagem)))
+
+        with mock.patch('core.notificacoes.obter_pubsub', return_value=pubsub):
+            with self.captureOnCommitCallbacks(execute=True):
+                criada = Notificacao.objects.create(usuario=self.usuario, mensagem='Nova')
+                self.assertEqual(publicadas, [])
+            with self.captureOnCommitCallbacks(execute=True):
+                registrar_criadas(Notificacao.objects.bulk_create([
+                    Notificacao(usuario=self.usuario, mensagem='Em massa')
+                ]))
+
+        self.assertEqual(publicadas[0], (
+            canal_do_usuario(self.usuario.pk),
+            {'tipo': 'nova', 'id': criada.pk, 'mensagem': 'Nova', 'link': None},
+        ))
+        self.assertEqual(publicadas[1][1]['mensagem'], 'Em massa')
+
+    async def test_stream_envia_estado_e_depois_as_novas(self):
+        """Testa se o stream SSE começa pelo estado atual e repassa o que é publicado."""
+        await self.async_client.aforce_login(self.usuario)
+        response = await self.async_client.get(reverse('stream_notificacoes'))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        eventos = response.streaming_content
+
+        self.assertTrue((await anext(eventos)).startswith(b'retry:'))
+        estado = (await anext(eventos)).decode()
+        self.assertIn('event: estado', estado)
+        self.assertIn('"count": 1', estado)
+
+        canal = canal_do_usuario(self.usuario.pk)
+        self.assertEqual(obter_pubsub().total_assinantes(canal), 1)
+        obter_pubsub().publicar(canal, {'tipo': 'nova', 'id': 99, 'mensagem': 'Ao vivo', 'link': None})
+        nova = (await anext(eventos)).decode()
+        self.assertIn('id: 99', nova)
+        self.assertIn('Ao vivo', nova)
+
+        await eventos.aclose()
+
+    async def test_assinatura_e_cancelada_quando_o_stream_fecha(self):
+        """Testa se fechar o gerador do stream remove a assinatura do pub/sub."""
+        canal = canal_do_usuario(self.usuario.pk)
+        antes = obter_pubsub().total_assinantes(canal)
+        eventos = eventos_do_usuario(self.usuario.pk)
+        await anext(eventos)
+        self.assertEqual(obter_pubsub().total_assinantes(canal), antes + 1)
+        await eventos.aclose()
+        self.assertEqual(obter_pubsub().total_assinantes(canal), antes)
+
+
+class ResumoNotificacoesCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.usuario = create_user_with_profile('servidor', 'password', 'Servidor')
+        for i in range(3):
+            Notificacao.objects.create(usuario=self.usuario, mensagem=f'Aviso {i}')
+
+    def assertResumoEmCache(self):
+        with CaptureQueriesContext(connection) as consultas:
+            resumo = resumo_nao_lidas(self.usuario.pk)
+        self.assertFalse([q['sql'] for q in consultas.captured_queries if 'core_notificacao' in q['sql']])
+        return resumo
+
+    def test_resumo_e_invalidado_na_escrita(self):
+        """Testa se criar e marcar como lidas invalidam o resumo, que volta do cache a partir da segunda leitura."""
+        self._verificar_invalidacao()
+
+    @override_settings(NOTIFICACOES_GERACAO_NO_BANCO=False)
+    def test_resumo_e_invalidado_na_escrita_com_cache_compartilhado(self):
+        """Testa a mesma invalidação com a geração no cache, sem nenhuma consulta nas leituras em cache."""
+        self._verificar_invalidacao()
+        with self.assertNumQueries(0):
+            resumo_nao_lidas(self.usuario.pk)
+
+    def _verificar_invalidacao(self):
+        with self.settings(NOTIFICACOES_LISTA_MAX=2):
+            self.assertEqual(resumo_nao_lidas(self.usuario.pk)['count'], 3)
+            self.assertResumoEmCache()
+
+            with self.captureOnCommitCallbacks(execute=True):
+                Notificacao.objects.create(usuario=self.usuario, mensagem='Nova')
+            resumo = resumo_nao_lidas(self.usuario.pk)
+            self.assertEqual(resumo['count'], 4)
+            self.assertEqual([n['mensagem'] for n in resumo['notificacoes']], ['Nova', 'Aviso 2'])
+
+        self.client.login(username='servidor', password='password')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('marcar_notificacoes_como_lidas'))
+        self.assertEqual(resumo_nao_lidas(self.usuario.pk)['count'], 0)
+        self.assertEqual(self.assertResumoEmCache()['count'], 0)
+
+    @override_settings(NOTIFICACOES_GERACAO_NO_BANCO=True)
+    def test_notificacao_de_outro_processo_chega_sem_cache_compartilhado(self):
+        """Testa se, com o LocMemCache de cada processo, uma notificação criada em outro worker aparece neste."""
+        resumo = resumo_nao_lidas(self.usuario.pk)
+        self.assertEqual(self.assertResumoEmCache(), resumo)
+
+        # O outro processo tem o próprio LocMemCache: o que ele grava no cache não chega aqui
+        outro_processo = LocMemCache('outro-processo', {})
+        with mock.patch.object(notificacoes, 'cache', outro_processo):
+            with self.captureOnCommitCallbacks(execute=True):
+                Notificacao.objects.create(usuario=self.usuario, mensagem='De outro worker')
+            resumo_do_outro = resumo_nao_lidas(self.usuario.pk)
+
+        novo = resumo_nao_lidas(self.usuario.pk)
+        self.assertEqual(novo['count'], 4)
+        self.assertEqual(novo['notificacoes'][0]['mensagem'], 'De outro worker')
+        # Os dois processos dão o mesmo ETag ao mesmo estado do sino
+        self.assertNotEqual(novo['versao'], resumo['versao'])
+        self.assertEqual(novo['versao'], resumo_do_outro['versao'])
+
+    def test_resumo_montado_antes_da_escrita_nao_e_reaproveitado(self):
+        """Testa se um resumo gravado por uma leitura concorrente que começou antes da escrita fica na geração antiga."""
+        original = Notificacao.objects.filter
+        gatilho = []
+
+        def filtrar_e_escrever(*args, **kwargs):
+            # Simula outra requisição criando uma notificação enquanto o resumo é montado
+            resultado = original(*args, **kwargs)
+            if not gatilho:
+                gatilho.append(True)
+                contagem = resultado.count()
+                with self.captureOnCommitCallbacks(execute=True):
+                    Notificacao.objects.create(usuario=self.usuario, mensagem='Concorrente')
+                resultado.count = lambda: contagem
+            return resultado
+
+        with mock.patch.object(Notificacao.objects, 'filter', side_effect=filtrar_e_escrever):
+            self.assertEqual(resumo_nao_lidas(self.usuario.pk)['count'], 3)
+        self.assertEqual(resumo_nao_lidas(self.usuario.pk)['count'], 4)
+
+    def test_sino_sem_alteracao_responde_304(self):
+        """Testa o ETag do sino: 304 enquanto nada muda, 200 com nova versão depois de uma notificação."""
+        self.client.login(username='servidor', password='password')
+        url = reverse('get_notificacoes_nao_lidas')
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertEqual(response.json()['count'], 3)
+
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(any('core_notificacao' in q['sql'] for q in consultas.captured_queries))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Notificacao.objects.create(usuario=self.usuario, mensagem='Nova')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['count'], 4)
+
+
+class ServicoNotificacoesTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.demandante = create_user_with_profile('demandante', 'password', 'Unidade Demandante')
+        self.prodgep = create_user_with_profile('prodgep', 'password', 'PRODGEP/PROPEG')
+        self.servidor = create_user_with_profile('servidor', 'password', 'Servidor')
+
+    def test_avisos_repetidos_sao_compactados(self):
+        """Testa se avisos do mesmo grupo viram uma notificação e avisos idênticos não se repetem."""
+        avisos = [
+            Aviso(self.servidor.pk, f'Lançamento {i} aprovado', '/h/', ('lancamentos', 'Aprovado'), '{total} aprovados')
+            for i in range(3)
+        ] + [
+            Aviso(self.demandante.pk, 'Edital homologado', '/e/', None, None),
+            Aviso(self.demandante.pk, 'Edital homologado', '/e/', None, None),
+            Aviso(self.demandante.pk, 'Outro aviso', '/e/', None, None),
+        ]
+        mensagens = [(n.usuario_id, n.mensagem) for n in compactar(avisos)]
+        self.assertEqual(mensagens, [
+            (self.servidor.pk, '3 aprovados'),
+            (self.demandante.pk, 'Edital homologado'),
+            (self.demandante.pk, 'Outro aviso'),
+        ])
+
+    def test_requisicao_grava_com_um_unico_insert(self):
+        """Testa se as notificações de uma requisição saem em um único INSERT depois do commit."""
+        edital = Edital.objects.create(
+            criado_por=self.demandante,
+            numero_edital='001/2025-NOT',
+            titulo='Edital',
+            unidade_demandante_nome='PRODGEP',
+            data_inicio=timezone.now().date(),
+            data_fim=timezone.now().date(),
+            status='Aguardando Homologação',
+        )
+        self.client.login(username='prodgep', password='password')
+
+        with CaptureQueriesContext(connection) as consultas:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(reverse('registrar_homologacao_edital', args=[edital.pk]))
+                self.assertFalse(Notificacao.objects.filter(usuario=self.demandante).exists())
+
+        inserts = [q for q in consultas.captured_queries if q['sql'].startswith('INSERT INTO "core_notificacao"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(Notificacao.objects.get(usuario=self.demandante).mensagem, 'O edital "001/2025-NOT" foi homologado.')
+
+    def test_aviso_de_transacao_desfeita_nao_e_gravado(self):
+        """Testa se um aviso agendado dentro de uma transação que falhou é descartado."""
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    notificar(self.servidor, 'Não deveria chegar')
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            notificar(self.servidor, 'Deveria chegar')
+
+        self.assertEqual(list(Notificacao.objects.values_list('mensagem', flat=True)), ['Deveria chegar'])
+
+    def test_prune_remove_so_lidas_antigas_em_lotes(self):
+        """Testa a retenção: lidas antigas são arquivadas e removidas, o resto fica."""
+        antigas = Notificacao.objects.bulk_create([
+            Notificacao(usuario=self.servidor, mensagem=f'Antiga {i}', lida=True) for i in range(5)
+        ])
+        Notificacao.objects.filter(pk__in=[n.pk for n in antigas]).update(
+            created_at=timezone.now() - timedelta(days=120)
+        )
+        nao_lida = Notificacao.objects.create(usuario=self.servidor, mensagem='Não lida antiga')
+        Notificacao.objects.filter(pk=nao_lida.pk).update(created_at=timezone.now() - timedelta(days=120))
+        recente = Notificacao.objects.create(usuario=self.servidor, mensagem='Recente', lida=True)
+
+        with tempfile.TemporaryDirectory() as diretorio:
+            caminho = os.path.join(diretorio, 'arquivo.jsonl')
+            saida = StringIO()
+            call_command('prune_notificacoes', '--dias', '90', '--lote', '2', '--arquivo', caminho, stdout=saida)
+            with open(caminho, encoding='utf-8') as arquivo:
+                self.assertEqual(len(arquivo.readlines()), 5)
+
+        self.assertIn('5 notificação(ões)', saida.getvalue())
+        self.assertEqual(set(Notificacao.objects.values_list('pk', flat=True)), {nao_lida.pk, recente.pk})
+
+
+class LancarHorasConsultasTests(TestCase):
+
+    def setUp(self):
+        self.demandante = create_user_with_profile('demandante', 'password', 'Unidade Demandante')
+        self.servidor = create_user_with_profile('servidor', 'password', 'Servidor')
+        self.tipo = TipoAtividade.objects.create(grupo='Banca', nome='Correção de Prova', valor_hora=10.00)
+        self.client.login(username='servidor', password='password')
+        self._proximo = 0
+
+    def alocar(self, total):
+        editais = Edital.objects.bulk_create([
+            Edital(
+                criado_por=self.demandante,
+                numero_edital=f'{self._proximo + i:04d}/2025-LH',
+                titulo='Edital',
+                unidade_demandante_nome='PRODGEP',
+                data_inicio=timezone.now().date(),
+                data_fim=timezone.now().date(),
+                valor_empenho=1000,
+            )
+            for i in range(total)
+        ])
+        self._proximo += total
+        SaldoEdital.objects.bulk_create([SaldoEdital(edital=edital) for edital in editais])
+        atividades = Atividade.objects.bulk_create([
+            Atividade(tipo=self.tipo, edital=edital, descricao='Correção') for edital in editais
+        ])
+        Atividade.servidores_alocados.through.objects.bulk_create([
+            Atividade.servidores_alocados.through(atividade_id=atividade.pk, user_id=self.servidor.pk)
+            for atividade in atividades
+        ])
+        return atividades
+
+    def test_numero_de_consultas_nao_cresce_com_as_atividades(self):
+        """Testa se lancar_horas faz o mesmo número de consultas com 1 e com 200 atividades alocadas."""
+        self.alocar(1)
+        self.client.get(reverse('lancar_horas'))  # carrega o catálogo de atividades
+        with CaptureQueriesContext(connection) as uma:
+            self.client.get(reverse('lancar_horas'))
+
+        self.alocar(199)
+        with CaptureQueriesContext(connection) as duzentas:
+            response = self.client.get(reverse('lancar_horas'))
+
+        self.assertEqual(len(response.context['atividades_alocadas']), 200)
+        self.assertEqual(len(uma), len(duzentas))
+
+    def test_card_mostra_o_saldo_restante_do_edital(self):
+        """Testa se cada card mostra o saldo restante do edital e se o formulário inválido fica no card certo."""
+        atividade, outra = self.alocar(2)
+        LancamentoHoras.objects.create(
+            servidor=self.servidor, edital=atividade.edital, atividade=atividade,
+            data=timezone.now().date(), horas=10, descricao_justificativa='Teste'
+        )
+
+        response = self.client.post(reverse('lancar_horas'), {
+            'atividade_id': atividade.pk, 'data': '2025-03-01', 'descricao_justificativa': 'x', 'horas': 'abc',
+        })
+
+        atividades = {a.pk: a for a in response.context['atividades_alocadas']}
+        self.assertEqual(atividades[atividade.pk].saldo_restante, Decimal('900'))
+        self.assertEqual(atividades[outra.pk].saldo_restante, Decimal('1000'))
+        self.assertTrue(atividades[atividade.pk].form.errors)
+        self.assertFalse(atividades[outra.pk].form.is_bound)
+        self.assertContains(response, 'Saldo Restante do Edital:</strong> R$ 900.00')
+
+
+class DetalhesEditalTotaisTests(TestCase):
+
+    def setUp(self):
+        self.demandante = create_user_with_profile('demandante', 'password', 'Unidade Demandante')
+        self.servidor = create_user_with_profile('servidor', 'password', 'Servidor')
+        self.outro_servidor = create_user_with_profile('outro_servidor', 'password', 'Servidor')
+        self.tipo = TipoAtividade.objects.create(grupo='Banca', nome='Correção de Prova', valor_hora=10.00)
+        self.edital = Edital.objects.create(
+            criado_por=self.demandante,
+            numero_edital='001/2025-DET',
+            titulo='Edital de Detalhes',
+            unidade_demandante_nome='PRODGEP',
+            data_inicio=timezone.now().date(),
+            data_fim=timezone.now().date(),
+            valor_empenho=5000,
+        )
+        self.client.login(username='demandante', password='password')
+
+    def criar_atividades(self, total):
+        atividades = Atividade.objects.bulk_create([
+            Atividade(tipo=self.tipo, edital=self.edital, descricao='Correção') for _ in range(total)
+        ])
+        Atividade.servidores_alocados.through.objects.bulk_create([
+            Atividade.servidores_alocados.through(atividade_id=atividade.pk, user_id=servidor.pk)
+            for atividade in atividades
+            for servidor in (self.servidor, self.outro_servidor)
+        ])
+        return atividades
+
+    def lancar(self, atividade, horas, status):
+        return LancamentoHoras.objects.create(
+            servidor=self.servidor, edital=self.edital, atividade=atividade,
+            data=timezone.now().date(), horas=horas, status=status, descricao_justificativa='Teste'
+        )
+
+    def test_totais_por_atividade(self):
+        """Testa se cada atividade traz alocados, horas lançadas, horas aprovadas e valor gasto."""
+        atividade, vazia = self.criar_atividades(2)
+        self.lancar(atividade, 2, 'Pendente')
+        self.lancar(atividade, 3, 'Aprovado')
+        self.lancar(atividade, 4, 'Homologado')
+        self.lancar(atividade, 8, 'Recusado')
+
+        response = self.client.get(reverse('detalhes_edital', args=[self.edital.pk]))
+
+        totais = {a.pk: a for a in response.context['atividades']}
+        self.assertEqual(totais[atividade.pk].total_alocados, 2)
+        self.assertEqual(totais[atividade.pk].horas_lancadas, Decimal('9'))
+        self.assertEqual(totais[atividade.pk].horas_aprovadas, Decimal('7'))
+        self.assertEqual(totais[atividade.pk].valor_gasto, Decimal('70'))
+        self.assertEqual(totais[vazia.pk].horas_lancadas, Decimal('0'))
+        self.assertEqual(totais[vazia.pk].valor_gasto, Decimal('0'))
+        self.assertContains(response, '<td>09:00</td>', html=True)
+        self.assertContains(response, '<td>R$ 70.00</td>', html=True)
+
+    def test_numero_de_consultas_nao_cresce_com_as_atividades(self):
+        """Testa se os detalhes do edital fazem o mesmo número de consultas com 1 e com 100 atividades."""
+        self.lancar(self.criar_atividades(1)[0], 2, 'Aprovado')
+        with CaptureQueriesContext(connection) as uma:
+            self.client.get(reverse('detalhes_edital', args=[self.edital.pk]))
+
+        self.criar_atividades(99)
+        with CaptureQueriesContext(connection) as cem:
+            response = self.client.get(reverse('detalhes_edital', args=[self.edital.pk]))
+
+        self.assertEqual(len(response.context['atividades']), 100)
+        self.assertEqual(len(uma), len(cem))
+
+
+class UsuarioDaSessaoTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.unidade = Unidade.objects.create(sigla='PROPEG', nome='Pró-Reitoria')
+        self.demandante = create_user_with_profile('demandante', 'password', 'Unidade Demandante')
+        self.demandante.servidorprofile.unidade = self.unidade
+        self.demandante.servidorprofile.save()
+        self.client.login(username='demandante', password='password')
+
+    def consultas_de_autenticacao(self, consultas):
+        return [
+            consulta['sql'] for consulta in consultas
+            if 'FROM "auth_user"' in consulta['sql'] or 'FROM "core_servidorprofile"' in consulta['sql']
+        ]
+
+    def test_uma_consulta_de_autenticacao_por_requisicao(self):
+        """Testa se usuário, perfil e unidade vêm numa única consulta, mesmo com decorator e base.html lendo o perfil."""
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(reverse('listar_editais'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.consultas_de_autenticacao(consultas)), 1)
+        self.assertIn('"core_unidade"', self.consultas_de_autenticacao(consultas)[0])
+
+    @override_settings(AUTH_USUARIO_CACHE_TIMEOUT=60)
+    def test_cache_do_usuario_da_sessao(self):
+        """Testa se o usuário em cache dispensa a consulta e se salvar o perfil invalida o cache."""
+        self.client.get(reverse('listar_editais'))
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.get(reverse('listar_editais'))
+        self.assertEqual(self.consultas_de_autenticacao(consultas), [])
+
+        perfil = ServidorProfile.objects.get(user=self.demandante)
+        perfil.funcao = 'Servidor'
+        perfil.save()
+
+        response = self.client.get(reverse('listar_editais'))
+        self.assertRedirects(response, reverse('painel'))
+
+
+class ResumosPaineisTests(TestCase):
+
+    def setUp(self):
+        self.demandante = create_user_with_profile('demandante', 'password', 'Unidade Demandante')
+        self.servidor = create_user_with_profile('servidor', 'password', 'Servidor')
+        self.prodgep = create_user_with_profile('prodgep', 'password', 'PRODGEP/PROPEG')
+        self.tipo = TipoAtividade.objects.create(grupo='Banca', nome='Correção de Prova', valor_hora=10.00)
+        self.edital = Edital.objects.create(
+            criado_por=self.demandante,
+            numero_edital='001/2025-RES',
+            titulo='Edital com Resumo',
+            unidade_demandante_nome='PRODGEP',
+            data_inicio=timezone.now().date(),
+            data_fim=timezone.now().date(),
+            valor_empenho=1000,
+        )
+        self.atividade = Atividade.objects.create(tipo=self.tipo, edital=self.edital, descricao='Correção')
+
+    def resumo_unidade(self):
+        return ResumoUnidade.objects.get(demandante=self.demandante)
+
+    def test_resumos_acompanham_o_ciclo_do_edital_e_dos_lancamentos(self):
+        """Testa se os resumos do edital e da unidade acompanham status do edital, lançamentos e validações."""
+        self.assertEqual(self.resumo_unidade().valor_empenho, Decimal('1000'))
+
+        self.edital.status = 'Aguardando Homologação'
+        self.edital.save()
+        self.assertEqual(self.resumo_unidade().editais_aguardando_homologacao, 1)
+
+        self.edital.status = 'Homologado'
+        self.edital.save()
+        resumo = self.resumo_unidade()
+        self.assertEqual((resumo.editais_aguardando_homologacao, resumo.editais_ativos), (0, 1))
+
+        primeiro = registrar_lancamento(self.servidor, self.atividade, date(2025, 3, 1), Decimal('2'), 'Teste')
+        registrar_lancamento(self.servidor, self.atividade, date(2025, 3, 2), Decimal('3'), 'Teste')
+        resumo = self.resumo_unidade()
+        self.assertEqual((resumo.lancamentos_pendentes, resumo.horas_pendentes), (2, Decimal('5')))
+        self.assertEqual(resumo.valor_pendente, Decimal('50'))
+        self.assertEqual(ResumoEdital.objects.get(edital=self.edital).lancamentos_pendentes, 2)
+
+        validar_em_massa(LancamentoHoras.objects.filter(edital=self.edital), 'Aprovado', self.demandante)
+        resumo = self.resumo_unidade()
+        self.assertEqual((resumo.lancamentos_pendentes, resumo.lancamentos_aprovados), (0, 2))
+        self.assertEqual((resumo.horas_comprometidas, resumo.valor_comprometido), (Decimal('5'), Decimal('50')))
+        self.assertEqual(resumo.saldo_restante, Decimal('950'))
+
+        primeiro = LancamentoHoras.objects.get(pk=primeiro.pk)
+        primeiro.status = 'Recusado'
+        primeiro.save()
+        LancamentoHoras.objects.exclude(pk=primeiro.pk).delete()
+        resumo_edital = ResumoEdital.objects.get(edital=self.edital)
+        self.assertEqual((resumo_edital.lancamentos_aprovados, resumo_edital.horas_comprometidas), (0, Decimal('0')))
+        self.assertEqual(self.resumo_unidade().valor_comprometido, Decimal('0'))
+
+        self.assertEqual(verificar_resumos(), [])
+
+    def test_paineis_leem_os_resumos(self):
+        """Testa se os painéis mostram os indicadores e se o da unidade não cresce com os lançamentos."""
+        self.edital.status = 'Homologado'
+        self.edital.save()
+        registrar_lancamento(self.servidor, self.atividade, date(2025, 3, 1), Decimal('2'), 'Teste')
+
+        self.client.login(username='demandante', password='password')
+        with CaptureQueriesContext(connection) as antes:
+            response = self.client.get(reverse('painel'))
+        self.assertEqual(response.context['resumo'].lancamentos_pendentes, 1)
+        self.assertContains(response, 'R$ 980.00')
+
+        for dia in range(2, 12):
+            registrar_lancamento(self.servidor, self.atividade, date(2025, 3, dia), Decimal('1'), 'Teste')
+        with CaptureQueriesContext(connection) as depois:
+            self.client.get(reverse('painel'))
+        self.assertEqual(len(antes), len(depois))
+
+        self.client.login(username='prodgep', password='password')
+        response = self.client.get(reverse('painel'))
+        self.assertEqual(response.context['totais']['lancamentos_aprovados'], 0)
+        self.assertEqual(response.context['totais']['saldo_restante'], Decimal('880'))
+
+        self.client.login(username='servidor', password='password')
+        response = self.client.get(reverse('painel'))
+        self.assertEqual(response.context['horas_pendentes'], Decimal('0'))
+
+    def test_comando_rebuild_resumos_corrige_divergencias(self):
+        """Testa se rebuild_resumos --check aponta divergências e se o comando sem --check as corrige."""
+        registrar_lancamento(self.servidor, self.atividade, date(2025, 3, 1), Decimal('2'), 'Teste')
+        ResumoUnidade.objects.filter(demandante=self.demandante).update(lancamentos_pendentes=7)
+        ResumoEdital.objects.filter(edital=self.edital).delete()
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_resumos', '--check', stdout=StringIO())
+
+        call_command('rebuild_resumos', stdout=StringIO())
+
+        self.assertEqual(self.resumo_unidade().lancamentos_pendentes, 1)
+        self.assertEqual(ResumoEdital.objects.get(edital=self.edital).horas_pendentes, Decimal('2'))
+        call_command('rebuild_resumos', '--check', stdout=StringIO())
+
+
+class AuditoriaAgregadaTests(TestCase):
+
+    def setUp(self):
+        self.prodgep = create_user_with_profile('prodgep', 'password', 'PRODGEP/PROPEG')
+        demandante = create_user_with_profile('demandante', 'password', 'Unidade Demandante')
+        self.servidor = create_user_with_profile('servidor', 'password', 'Servidor')
+        tipo = TipoAtividade.objects.create(grupo='Banca', nome='Correção de Prova', valor_hora=10.00)
+        self.edital, self.sem_auditaveis = [
+            Edital.objects.create(
+                criado_por=demandante,
+                numero_edital=numero,
+                titulo='Edital Auditado',
+                unidade_demandante_nome='PRODGEP',
+                data_inicio=timezone.now().date(),
+                data_fim=timezone.now().date(),
+                valor_empenho=5000,
+            )
+            for numero in ('001/2025-AUD', '002/2025-AUD')
+        ]
+        self.atividade = Atividade.objects.create(tipo=tipo, edital=self.edital, descricao='Correção')
+        outra = Atividade.objects.create(tipo=tipo, edital=self.sem_auditaveis, descricao='Correção')
+        self.lancar(self.sem_auditaveis, outra, date(2025, 3, 1), 'Pendente')
+        self.client.login(username='prodgep', password='password')
+
+    def lancar(self, edital, atividade, data, status, horas=Decimal('1')):
+        return LancamentoHoras.objects.create(
+            servidor=self.servidor, edital=edital, atividade=atividade,
+            data=data, horas=horas, descricao_justificativa='Teste', status=status
+        )
+
+    def test_uma_linha_agregada_por_edital(self):
+        """Testa se a auditoria mostra contagens e horas por status e valor total, só de editais com horas auditáveis."""
+        self.lancar(self.edital, self.atividade, date(2025, 3, 1), 'Aprovado', Decimal('2'))
+        self.lancar(self.edital, self.atividade, date(2025, 3, 2), 'Homologado', Decimal('3'))
+        self.lancar(self.edital, self.atividade, date(2025, 3, 3), 'Recusado', Decimal('1'))
+        self.lancar(self.edital, self.atividade, date(2025, 3, 4), 'Pendente', Decimal('4'))
+
+        response = self.client.get(reverse('auditoria_horas'))
+
+        editais = list(response.context['page_obj'])
+        self.assertEqual([e.pk for e in editais], [self.edital.pk])
+        edital = editais[0]
+        self.assertEqual((edital.total_aprovado, edital.horas_aprovado), (1, Decimal('2')))
+        self.assertEqual((edital.total_homologado, edital.horas_homologado), (1, Decimal('3')))
+        self.assertEqual((edital.total_recusado, edital.total_revertido), (1, 0))
+        self.assertEqual(edital.valor_total, Decimal('50'))
+        self.assertContains(response, reverse('auditoria_lancamentos_edital', args=[self.edital.pk]))
+
+    def test_numero_de_consultas_nao_depende_do_historico(self):
+        """Testa se a primeira carga faz o mesmo número de consultas com 5 e com 100 lançamentos."""
+        for dia in range(1, 6):
+            self.lancar(self.edital, self.atividade, date(2025, 1, dia), 'Aprovado')
+        with CaptureQueriesContext(connection) as poucos:
+            self.client.get(reverse('auditoria_horas'))
+
+        for dia in range(95):
+            self.lancar(self.edital, self.atividade, date(2024, 1, 1) + timedelta(days=dia), 'Homologado')
+        with CaptureQueriesContext(connection) as muitos:
+            response = self.client.get(reverse('auditoria_horas'))
+
+        self.assertEqual(response.context['page_obj'].object_list[0].total_homologado, 95)
+        self.assertEqual(len(poucos), len(muitos))
+
+    def test_filtro_por_periodo(self):
+        """Testa se o período filtrado restringe as agregações e se a paginação preserva os filtros."""
+        self.lancar(self.edital, self.atividade, date(2025, 2, 1), 'Aprovado')
+        self.lancar(self.edital, self.atividade, date(2025, 3, 1), 'Aprovado')
+
+        response = self.client.get(reverse('auditoria_horas'), {'data_inicio': '2025-02-15'})
+        self.assertEqual(response.context['page_obj'].object_list[0].total_aprovado, 1)
+        self.assertEqual(response.context['filtros_query'], 'data_inicio=2025-02-15')
+
+        response = self.client.get(reverse('auditoria_horas'), {'data_inicio': '2025-04-01'})
+        self.assertEqual(len(response.context['page_obj']), 0)
+
+        response = self.client.get(reverse('auditoria_horas'), {'data_inicio': '2025-04-01', 'data_fim': '2025-01-01'})
+        self.assertEqual(len(response.context['page_obj']), 1)
+        self.assertContains(response, 'A data inicial não pode ser posterior à data final.')
+
+    def test_fragmento_de_lancamentos_paginado(self):
+        """Testa se os lançamentos do edital vêm em páginas de 25, com o link para a próxima respeitando o filtro."""
+        for dia in range(30):
+            self.lancar(self.edital, self.atividade, date(2025, 1, 1) + timedelta(days=dia), 'Aprovado')
+        url = reverse('auditoria_lancamentos_edital', args=[self.edital.pk])
+
+        response = self.client.get(url, {'data_fim': '2025-01-28'})
+        self.assertEqual(len(response.context['page_obj']), 25)
+        self.assertNotContains(response, '<html')
+        proxima = response.context['proxima_url']
+        self.assertIn('data_fim=2025-01-28', proxima)
+
+        response = self.client.get(proxima)
+        self.assertEqual(len(response.context['page_obj']), 3)
+        self.assertIsNone(response.context['proxima_url'])
+
+        self.client.login(username='servidor', password='password')
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+
+class SeedScaleTests(TestCase):
+
+    QUANTIDADES = dict(
+        unidades=2, servidores=6, demandantes=2, editais=3, atividades_por_edital=2,
+        alocacoes_por_atividade=3, lancamentos=40, notificacoes=10,
+    )
+
+    def gerar(self, prefixo, seed=7):
+        call_command('seed_scale', prefixo=prefixo, seed=seed, lote=7, stdout=StringIO(), **self.QUANTIDADES)
+        return list(
+            LancamentoHoras.objects.filter(edital__numero_edital__endswith=f'/{prefixo}')
+            .order_by('pk').values_list('servidor__username', 'data', 'horas', 'status')
+        )
+
+    def test_gera_as_quantidades_pedidas_com_contadores_consistentes(self):
+        """Testa se a carga cria as linhas pedidas, com perfis homologados e saldos, horas e resumos consistentes."""
+        lancamentos = self.gerar('a')
+
+        self.assertEqual(len(lancamentos), 40)
+        self.assertEqual(User.objects.filter(username__startswith='a_').count(), 6 + 2 + 1)
+        self.assertEqual(ServidorProfile.objects.filter(user__username__startswith='a_servidor_', status='Homologado').count(), 6)
+        self.assertEqual(Atividade.servidores_alocados.through.objects.count(), 3 * 2 * 3)
+        self.assertEqual(Notificacao.objects.count(), 10)
+        self.assertTrue(User.objects.get(username='a_servidor_1').check_password('password123'))
+        self.assertEqual(verificar_saldos(), [])
+        self.assertEqual(verificar_horas_servidores(), [])
+        self.assertEqual(verificar_resumos(), [])
+
+    def test_mesma_semente_gera_os_mesmos_dados(self):
+        """Testa se a mesma semente gera os mesmos lançamentos, e se o prefixo repetido é recusado."""
+        primeira = self.gerar('a')
+        segunda = self.gerar('b')
+
+        self.assertEqual(
+            [(username[2:], data, horas, status) for username, data, horas, status in primeira],
+            [(username[2:], data, horas, status) for username, data, horas, status in segunda],
+        )
+        with self.assertRaises(CommandError):
+            self.gerar('a')
+
+
+class BenchmarkTests(TestCase):
+
+    def setUp(self):
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(self.diretorio.cleanup)
+        override = override_settings(RELATORIOS_DIR=self.diretorio.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        gerar_carga(
+            prefixo='bench', unidades=1, servidores=4, demandantes=1, editais=2, atividades_por_edital=2,
+            alocacoes_por_atividade=2, lancamentos=30, notificacoes=5,
+        )
+
+    def test_mede_todos_os_cenarios(self):
+        """Testa se o benchmark percorre todas as telas sem erro e mede latência, consultas e memória."""
+        resultados = benchmark.executar(iteracoes=2)
+
+        self.assertEqual(set(resultados), {
+            'lancar_horas_get', 'lancar_horas_post', 'historico_lancamentos', 'notificacoes_nao_lidas',
+            'marcar_notificacoes_como_lidas', 'aprovar_horas', 'auditoria_horas', 'homologar_editais',
+            'exportar_auditoria_pdf', 'exportar_edital_pdf',
+        })
+        for nome, metricas in resultados.items():
+            self.assertLess(max(metricas['status']), 400, nome)
+            self.assertGreater(metricas['consultas'], 0, nome)
+            self.assertLessEqual(metricas['p50_ms'], metricas['p95_ms'])
+        self.assertEqual(resultados['lancar_horas_post']['status'], [302])
+
+    def test_comparacao_aponta_regressoes(self):
+        """Testa se a comparação com a linha de base acusa consultas a mais e latência fora da tolerância."""
+        base = {'auditoria_horas': {'p95_ms': 100.0, 'consultas': 6, 'pico_memoria_kb': 200.0}}
+
+        dentro = {'auditoria_horas': {'p95_ms': 120.0, 'consultas': 6, 'pico_memoria_kb': 240.0}}
+        self.assertEqual(benchmark.comparar(dentro, base), [])
+
+        pior = {'auditoria_horas': {'p95_ms': 200.0, 'consultas': 7, 'pico_memoria_kb': 200.0}}
+        regressoes = benchmark.comparar(pior, base)
+        self.assertEqual(len(regressoes), 2)
+        self.assertEqual(benchmark.comparar(pior, base, tolerancia_latencia=100, tolerancia_consultas=1), [])
+        self.assertEqual(benchmark.percentil([5, 1, 4, 2, 3], 50), 3)
+
+
+class InstrumentacaoTests(TestCase):
+
+    def setUp(self):
+        instrumentacao.limpar()
+        self.addCleanup(instrumentacao.limpar)
+        self.demandante = create_user_with_profile('demandante', 'password', 'Unidade Demandante')
+        self.servidor = create_user_with_profile('servidor', 'password', 'Servidor')
+        tipo = TipoAtividade.objects.create(grupo='Banca', nome='Correção de Prova', valor_hora=10.00)
+        for i in range(8):
+            edital = Edital.objects.create(
+                criado_por=self.demandante,
+                numero_edital=f'{i:03d}/2025-INS',
+                titulo='Edital Instrumentado',
+                unidade_demandante_nome='PRODGEP',
+                data_inicio=timezone.now().date(),
+                data_fim=timezone.now().date(),
+                valor_empenho=1000,
+            )
+            atividade = Atividade.objects.create(tipo=tipo, edital=edital, descricao='Correção')
+            atividade.servidores_alocados.add(self.servidor)
+            registrar_lancamento(self.servidor, atividade, date(2025, 3, 1), Decimal('1'), 'Teste')
+        self.atividade = atividade
+
+    @override_settings(INSTRUMENTACAO_ORCAMENTO_ESTRITO=True)
+    def test_views_com_orcamento_ficam_dentro_dele(self):
+        """Testa se lançar horas (GET e POST) e aprovar horas respeitam o orçamento de consultas declarado."""
+        self.client.login(username='servidor', password='password')
+        self.assertEqual(self.client.get(reverse('lancar_horas')).status_code, 200)
+        response = self.client.post(reverse('lancar_horas'), {
+            'atividade_id': self.atividade.pk, 'data': '2025-03-02', 'horas': '01:00', 'descricao_justificativa': 'Teste',
+        })
+        self.assertEqual(response.status_code, 302)
+
+        self.client.login(username='demandante', password='password')
+        self.assertEqual(self.client.get(reverse('aprovar_horas')).status_code, 200)
+
+        estatisticas = instrumentacao.estatisticas()
+        self.assertEqual(estatisticas['lancar_horas']['amostras'], 2)
+        self.assertLessEqual(estatisticas['aprovar_horas']['consultas']['max'], views.aprovar_horas.orcamento_consultas)
+        self.assertGreater(estatisticas['aprovar_horas']['bytes']['p50'], 0)
+
+    @override_settings(INSTRUMENTACAO_ORCAMENTO_ESTRITO=True)
+    def test_orcamento_estourado_falha(self):
+        """Testa se uma view acima do orçamento gera erro no modo estrito e só um aviso fora dele."""
+        self.client.login(username='demandante', password='password')
+        with mock.patch.object(views.aprovar_horas, 'orcamento_consultas', 1):
+            with self.assertRaises(instrumentacao.OrcamentoConsultasExcedido):
+                self.client.get(reverse('aprovar_horas'))
+            with override_settings(INSTRUMENTACAO_ORCAMENTO_ESTRITO=False), \
+                    self.assertLogs('core.instrumentacao', 'WARNING') as logs:
+                self.assertEqual(self.client.get(reverse('aprovar_horas')).status_code, 200)
+        self.assertIn('acima do orçamento de 1', logs.output[0])
+
+    @override_settings(INSTRUMENTACAO_LENTA_MS=-1)
+    def test_requisicao_lenta_gera_log_estruturado(self):
+        """Testa se a requisição acima do limite de tempo gera uma linha de log em JSON com as métricas."""
+        self.client.login(username='servidor', password='password')
+        with self.assertLogs('core.instrumentacao', 'WARNING') as logs:
+            self.client.get(reverse('historico_lancamentos'))
+        registro = json.loads(logs.records[0].getMessage())
+        self.assertEqual((registro['evento'], registro['rota'], registro['status']), ('requisicao_lenta', 'historico_lancamentos', 200))
+        self.assertGreater(registro['consultas'], 0)
+
+    def test_estatisticas_somente_para_a_equipe(self):
+        """Testa se o endpoint de desempenho exige is_staff e devolve os percentis por rota."""
+        self.client.login(username='servidor', password='password')
+        self.client.get(reverse('lancar_horas'))
+        self.assertEqual(self.client.get(reverse('estatisticas_desempenho')).status_code, 302)
+
+        User.objects.filter(pk=self.servidor.pk).update(is_staff=True)
+        dados = self.client.get(reverse('estatisticas_desempenho')).json()
+        self.assertEqual(dados['rotas']['lancar_horas']['amostras'], 1)
+        self.assertEqual(set(dados['rotas']['lancar_horas']['duracao_ms']), {'p50', 'p95', 'p99', 'max'})
+
+
+class PerfiladorTests(TestCase):
+
+    def setUp(self):
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(self.diretorio.cleanup)
+        override = override_settings(PERFILADOR_DIR=self.diretorio.name, PERFILADOR_INTERVALO_MS=1)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.servidor = create_user_with_profile('servidor', 'password', 'Servidor')
+        self.client.login(username='servidor', password='password')
+
+    def perfis(self):
+        return list(perfilador.carregar_perfis())
+
+    def test_cabecalho_so_vale_para_a_equipe(self):
+        """Testa se o cabeçalho X-Perfilar só perfila requisições de usuários is_staff."""
+        self.client.get(reverse('historico_lancamentos'), HTTP_X_PERFILAR='1')
+        self.assertEqual(self.perfis(), [])
+
+        User.objects.filter(pk=self.servidor.pk).update(is_staff=True)
+        response = self.client.get(reverse('historico_lancamentos'), HTTP_X_PERFILAR='1')
+        self.assertEqual(response.status_code, 200)
+        [perfil] = self.perfis()
+        self.assertEqual((perfil['rota'], perfil['status']), ('historico_lancamentos', 200))
+        self.assertGreater(perfil['duracao_ms'], 0)
+        self.assertEqual(perfil['amostras'], sum(perfil['pilhas'].values()))
+
+    @override_settings(PERFILADOR_TAXA=1, PERFILADOR_ROTAS=['historico_lancamentos'], PERFILADOR_MAX_ARQUIVOS=2)
+    def test_amostragem_por_rota_com_rotacao(self):
+        """Testa se o sorteio respeita as rotas configuradas e se só os perfis mais recentes são mantidos."""
+        self.client.get(reverse('lancar_horas'))
+        self.assertEqual(self.perfis(), [])
+
+        for _ in range(3):
+            self.client.get(reverse('historico_lancamentos'))
+        self.assertEqual(len(list(Path(self.diretorio.name).glob('perfil-*.json'))), 2)
+
+    def test_amostrador_classifica_as_fases(self):
+        """Testa se o amostrador anota as pilhas da outra thread e atribui as amostras de consulta à fase certa."""
+        amostrador = perfilador.Amostrador(threading.get_ident(), 0.001)
+        amostrador.start()
+        inicio = time.perf_counter()
+        while not amostrador.pilhas and time.perf_counter() - inicio < 2:
+            list(Edital.objects.all())
+        amostrador.parar()
+
+        self.assertTrue(any('test_amostrador_classifica_as_fases' in pilha for pilha in amostrador.pilhas))
+        self.assertEqual(perfilador._fase(['/app/core/views.py', '/lib/django/db/models/query.py']), 'consultas')
+        self.assertEqual(perfilador._fase(['/lib/django/template/base.py', '/lib/weasyprint/layout.py']), 'pdf')
+        self.assertEqual(perfilador._fase(['/app/core/views.py']), 'python')
+
+    def test_collapse_perfis_junta_as_pilhas(self):
+        """Testa se o comando soma as pilhas de vários perfis no formato collapsed e resume as fases."""
+        for i, pilhas in enumerate([{'a;b': 2, 'a;c': 1}, {'a;b': 3}]):
+            with open(Path(self.diretorio.name) / f'perfil-2025010{i}-auditoria_horas.json', 'w') as arquivo:
+                json.dump({
+                    'rota': 'auditoria_horas', 'duracao_ms': 100, 'banco_ms': 40, 'pilhas': pilhas,
+                    'fases_ms': {'consultas': 40, 'template': 60},
+                }, arquivo)
+
+        saida, erros = StringIO(), StringIO()
+        call_command('collapse_perfis', rota='auditoria_horas', stdout=saida, stderr=erros)
+        self.assertEqual(saida.getvalue(), 'a;b 5\na;c 1\n')
+        self.assertIn('2 perfil(is), 200 ms', erros.getvalue())
+        self.assertIn('template', erros.getvalue())
+
+        with self.assertRaises(CommandError):
+            call_command('collapse_perfis', rota='lancar_horas', stdout=StringIO(), stderr=StringIO())
+
+    def test_resposta_em_streaming_e_perfilada_sem_ser_bufferizada(self):
+        """Testa se o perfil de uma resposta em streaming só é gravado quando o iterador é esgotado ou fechado."""
+        prodgep = create_user_with_profile('prodgep', 'password', 'PRODGEP/PROPEG')
+        User.objects.filter(pk=prodgep.pk).update(is_staff=True)
+        self.client.login(username='prodgep', password='password')
+        url = reverse('exportar_auditoria_csv')
+
+        response = self.client.get(url, HTTP_X_PERFILAR='1')
+        self.assertTrue(response.streaming)
+        partes = iter(response.streaming_content)
+        next(partes)
+        self.assertEqual(self.perfis(), [])
+        list(partes)
+        [perfil] = self.perfis()
+        self.assertEqual((perfil['rota'], perfil['status']), ('exportar_auditoria_csv', 200))
+
+        response = self.client.get(url, HTTP_X_PERFILAR='1')
+        next(iter(response.streaming_content))
+        response.close()
+        self.assertEqual(len(self.perfis()), 2)
+
+
+class CatalogoAtividadesTests(TestCase):
+
+    def setUp(self):
+        self.tipo = TipoAtividade.objects.create(grupo='Banca', nome='Correção de Prova', valor_hora=10.00)
+
+    def consultas_ao_catalogo(self, consultas):
+        return [q['sql'] for q in consultas.captured_queries if 'core_tipoatividade' in q['sql']]
+
+    def test_formulario_de_atividade_sem_consultas(self):
+        """Testa se o formulário de atividade monta as escolhas e converte o tipo sem consultar o catálogo no banco."""
+        catalogo.obter_catalogo()
+        with CaptureQueriesContext(connection) as consultas:
+            html = AtividadeForm().as_p()
+            tipo = AtividadeForm().fields['tipo'].clean(str(self.tipo.pk))
+        self.assertEqual(len(consultas), 0)
+        self.assertIn(str(self.tipo), html)
+        self.assertEqual(html.count('<option'), TipoAtividade.objects.count() + 1)
+        self.assertEqual(tipo, self.tipo)
+
+        form = AtividadeForm({'tipo': self.tipo.pk, 'descricao': 'Correção'})
+        self.assertTrue(form.is_valid())
+        self.assertFalse(AtividadeForm({'tipo': 999999, 'descricao': 'Correção'}).is_valid())
+
+    @override_settings(CATALOGO_VERSAO_NO_BANCO=False)
+    def test_alteracao_troca_a_versao(self):
+        """Testa se, com cache compartilhado, salvar um tipo atualiza este processo e troca a versão dos outros no commit."""
+        versao = catalogo.obter_catalogo().versao
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tipo.valor_hora = Decimal('12.50')
+            self.tipo.save()
+            self.assertEqual(catalogo.valor_hora(self.tipo.pk), Decimal('12.50'))
+        self.assertNotEqual(catalogo.versao_atual(), versao)
+        catalogo.obter_catalogo()
+
+        # Outro processo alterou o catálogo: a versão no cache muda e a cópia local é descartada
+        TipoAtividade.objects.filter(pk=self.tipo.pk).update(valor_hora=15)
+        self.assertEqual(catalogo.valor_hora(self.tipo.pk), Decimal('12.50'))
+        cache.set(catalogo.CHAVE_VERSAO, 'outra', None)
+        self.assertEqual(catalogo.valor_hora(self.tipo.pk), Decimal('15'))
+
+    def test_lancar_horas_sem_join_com_o_catalogo(self):
+        """Testa se a tela de lançar horas mostra nome e valor da hora do catálogo sem consultar TipoAtividade."""
+        demandante = create_user_with_profile('demandante', 'password', 'Unidade Demandante')
+        servidor = create_user_with_profile('servidor', 'password', 'Servidor')
+        edital = Edital.objects.create(
+            criado_por=demandante,
+            numero_edital='001/2025-CAT',
+            titulo='Edital do Catálogo',
+            unidade_demandante_nome='PRODGEP',
+            data_inicio=timezone.now().date(),
+            data_fim=timezone.now().date(),
+            valor_empenho=1000,
+        )
+        atividade = Atividade.objects.create(tipo=self.tipo, edital=edital, descricao='Correção')
+        atividade.servidores_alocados.add(servidor)
+        self.client.login(username='servidor', password='password')
+        catalogo.obter_catalogo()
+
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(reverse('lancar_horas'))
+        self.assertContains(response, 'Correção de Prova')
+        self.assertEqual(self.consultas_ao_catalogo(consultas), [])
+
+        self.client.post(reverse('lancar_horas'), {
+            'atividade_id': atividade.pk, 'data': '2025-03-01', 'horas': '02:00', 'descricao_justificativa': 'Teste',
+        })
+        self.assertEqual(SaldoEdital.objects.get(edital=edital).valor_pendente, Decimal('20'))
+
+    def test_saldo_usa_o_valor_hora_do_banco_com_catalogo_desatualizado(self):
+        """Testa se registrar e validar lançamentos com o catálogo deste processo desatualizado não desvia o saldo."""
+        demandante = create_user_with_profile('demandante', 'password', 'Unidade Demandante')
+        servidor = create_user_with_profile('servidor', 'password', 'Servidor')
+        edital = Edital.objects.create(
+            criado_por=demandante,
+            numero_edital='002/2025-CAT',
+            titulo='Edital do Catálogo',
+            unidade_demandante_nome='PRODGEP',
+            data_inicio=timezone.now().date(),
+            data_fim=timezone.now().date(),
+            valor_empenho=1000,
+        )
+        atividade = Atividade.objects.select_related('edital').get(
+            pk=Atividade.objects.create(tipo=self.tipo, edital=edital, descricao='Correção').pk
+        )
+        primeiro = registrar_lancamento(servidor, atividade, date(2025, 3, 1), Decimal('2'), 'Teste')
+
+        # Outro processo muda o valor/hora; este continua com o catálogo antigo em memória
+        copia = catalogo.obter_catalogo()
+        tipo = TipoAtividade.objects.get(pk=self.tipo.pk)
+        tipo.valor_hora = Decimal('30')
+        tipo.save()
+        catalogo._catalogo, catalogo._versao_banco = copia, copia.versao
+        self.assertEqual(catalogo.valor_hora(self.tipo.pk), Decimal('10'))
+
+        registrar_lancamento(servidor, atividade, date(2025, 3, 2), Decimal('1'), 'Teste')
+        validar_em_massa(LancamentoHoras.objects.filter(pk=primeiro.pk), 'Aprovado', demandante)
+
+        saldo = SaldoEdital.objects.get(edital=edital)
+        self.assertEqual((saldo.valor_comprometido, saldo.valor_pendente), (Decimal('60'), Decimal('30')))
+        self.assertEqual(verificar_saldos(), [])
+
+
+class CatalogoVersaoNoBancoTests(TransactionTestCase):
+    """Catálogo com a versão no banco, o padrão quando o cache é o LocMemCache de cada processo."""
+
+    def setUp(self):
+        self.tipo = TipoAtividade.objects.create(grupo='Banca', nome='Correção de Prova', valor_hora=10.00)
+
+    def copia_deste_processo(self):
+        return catalogo._catalogo, catalogo._versao_banco
+
+    def restaurar(self, copia):
+        # Volta o estado do módulo ao de antes da alteração, como se ela viesse de outro processo
+        catalogo._catalogo, catalogo._versao_banco = copia
+
+    @override_settings(CATALOGO_VERSAO_NO_BANCO=True, CATALOGO_VERIFICAR_SEGUNDOS=60)
+    def test_alteracao_de_outro_processo_vale_apos_o_intervalo(self):
+        """Testa se a troca de versão feita por outro processo só é lida do banco quando o intervalo passa."""
+        catalogo.obter_catalogo()
+        with self.assertNumQueries(0):
+            catalogo.obter_catalogo()
+
+        copia = self.copia_deste_processo()
+        self.tipo.valor_hora = Decimal('15')
+        self.tipo.save()
+        self.assertEqual(VersaoCatalogo.objects.get().versao, 2)
+        self.restaurar(copia)
+
+        self.assertEqual(catalogo.valor_hora(self.tipo.pk), Decimal('10'))
+        with override_settings(CATALOGO_VERIFICAR_SEGUNDOS=0):
+            self.assertEqual(catalogo.valor_hora(self.tipo.pk), Decimal('15'))
+
+        # Um processo novo, sem nada em memória, lê a versão e o catálogo atuais
+        self.restaurar((None, None))
+        self.assertEqual(catalogo.valor_hora(self.tipo.pk), Decimal('15'))
+
+    @override_settings(CATALOGO_VERSAO_NO_BANCO=True, CATALOGO_VERIFICAR_SEGUNDOS=60)
+    def test_rollback_nao_deixa_valor_nao_gravado_no_catalogo(self):
+        """Testa se, desfeita a transação que alterou o tipo, o catálogo e a versão voltam ao que está gravado."""
+        self._desfazer_alteracao()
+        self.assertEqual(VersaoCatalogo.objects.get().versao, 1)
+
+    @override_settings(CATALOGO_VERSAO_NO_BANCO=False)
+    def test_rollback_com_cache_compartilhado(self):
+        """Testa o mesmo rollback com a versão no cache."""
+        self._desfazer_alteracao()
+
+    def _desfazer_alteracao(self):
+        catalogo.obter_catalogo()
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.tipo.valor_hora = Decimal('99')
+            self.tipo.save()
+            self.assertEqual(catalogo.valor_hora(self.tipo.pk), Decimal('99'))
+            raise RuntimeError
+        self.assertEqual(catalogo.valor_hora(self.tipo.pk), Decimal('10'))
+
+
+class ImportacaoServidoresTests(TestCase):
+
+    CABECALHO = 'Nome;Email;CPF;SIAPE;Titulação;Unidade\n'
+
+    def setUp(self):
+        self.unidade = Unidade.objects.create(sigla='CCET', nome='Centro de Ciências Exatas')
+        self.existente = create_user_with_profile('1000', 'password', 'Servidor')
+        ServidorProfile.objects.filter(user=self.existente).update(siape='1000', cpf='000.000.000-00')
+
+    def csv(self, *linhas):
+        return (self.CABECALHO + ''.join(f'{linha}\n' for linha in linhas)).encode('utf-8')
+
+    def test_importa_validas_e_relata_erros_por_linha(self):
+        """Testa se o comando importa as linhas válidas com perfil completo e lista as inválidas com o motivo."""
+        conteudo = self.csv(
+            'Maria da Silva;maria@ufac.br;111.111.111-11;2001;Mestrado;ccet',
+            'João Souza;joao@ufac.br;222.222.222-22;2002;doutorado;Centro de Ciências Exatas',
+            'Repetido;rep@ufac.br;333.333.333-33;1000;Mestrado;CCET',
+            'Sem Unidade;sem@ufac.br;444.444.444-44;2004;Mestrado;XYZ',
+            'CPF Existente;cpf@ufac.br;000.000.000-00;2005;Bacharelado;CCET',
+        )
+        with tempfile.NamedTemporaryFile(suffix='.csv') as arquivo:
+            arquivo.write(conteudo)
+            arquivo.flush()
+            saida = StringIO()
+            call_command('import_servidores', arquivo.name, processos=2, stdout=saida)
+
+        self.assertIn('2 de 5 servidor(es) importado(s); 3 linha(s) com erro.', saida.getvalue())
+        self.assertIn('Linha 4: SIAPE já cadastrado (1000)', saida.getvalue())
+        self.assertIn('Linha 5: unidade não encontrada (XYZ)', saida.getvalue())
+        self.assertIn('Linha 6: titulação desconhecida (Bacharelado); CPF já cadastrado', saida.getvalue())
+
+        maria = User.objects.select_related('servidorprofile').get(username='2001')
+        self.assertEqual((maria.first_name, maria.last_name, maria.email), ('Maria', 'da Silva', 'maria@ufac.br'))
+        perfil = maria.servidorprofile
+        self.assertEqual(
+            (perfil.funcao, perfil.status, perfil.cpf, perfil.siape, perfil.titulacao, perfil.unidade),
+            ('Servidor', 'Aguardando Homologação', '111.111.111-11', '2001', 'Mestrado', self.unidade),
+        )
+        self.assertEqual(User.objects.get(username='2002').servidorprofile.titulacao, 'Doutorado')
+        self.assertTrue(maria.check_password('password123'))
+        self.assertNotEqual(maria.password, User.objects.get(username='2002').password)
+
+    def test_validacao_por_conjunto(self):
+        """Testa se a validação faz o mesmo número de consultas com 5 e com 300 linhas e acusa repetições no arquivo."""
+        def linhas(total):
+            return ler_csv(self.csv(*(
+                f'Servidor {i};s{i}@ufac.br;{i:011d};{3000 + i};Mestrado;CCET' for i in range(total)
+            )))
+
+        with CaptureQueriesContext(connection) as poucas:
+            validas, erros = validar_linhas(linhas(5))
+        with CaptureQueriesContext(connection) as muitas:
+            validar_linhas(linhas(300))
+        self.assertEqual((len(validas), erros), (5, []))
+        self.assertEqual(len(poucas), len(muitas))
+
+        _, erros = validar_linhas(ler_csv(self.csv(
+            'A;a@ufac.br;1;4001;Mestrado;CCET', 'B;b@ufac.br;2;4001;Mestrado;CCET',
+        )))
+        self.assertEqual([numero for numero, _ in erros], [2, 3])
+        self.assertIn('siape repetido no arquivo', erros[0][1])
+
+    def test_tela_de_importacao(self):
+        """Testa se a tela valida sem gravar, importa e respeita o limite de linhas da web."""
+        create_user_with_profile('demandante', 'password', 'Unidade Demandante')
+        self.client.login(username='demandante', password='password')
+        conteudo = self.csv('Maria da Silva;maria@ufac.br;111.111.111-11;2001;Mestrado;CCET', 'Erro;erro@ufac.br;;;;')
+
+        response = self.client.post(reverse('importar_servidores'), {
+            'arquivo': SimpleUploadedFile('servidores.csv', conteudo), 'somente_validar': 'on',
+        })
+        self.assertContains(response, 'cpf é obrigatório')
+        self.assertFalse(User.objects.filter(username='2001').exists())
+
+        response = self.client.post(reverse('importar_servidores'), {'arquivo': SimpleUploadedFile('servidores.csv', conteudo)})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(User.objects.filter(username='2001').exists())
+
+        with override_settings(IMPORTACAO_MAX_LINHAS_WEB=1):
+            response = self.client.post(reverse('importar_servidores'), {'arquivo': SimpleUploadedFile('servidores.csv', conteudo)})
+        self.assertContains(response, 'Use o comando import_servidores')
+
+
+class PerfilDoUsuarioTests(TestCase):
+
+    def setUp(self):
+        self.servidor = create_user_with_profile('perfil_login', 'password', 'Servidor')
+
+    def _escritas_no_perfil(self, queries):
+        return [
+            q['sql'] for q in queries
+            if 'core_servidorprofile' in q['sql'] and not q['sql'].lstrip().upper().startswith('SELECT')
+        ]
+
+    def test_login_faz_numero_fixo_de_consultas_sem_gravar_o_perfil(self):
+        """O login lê o usuário e o perfil, grava o last_login e a sessão, e nunca regrava o perfil."""
+        # usuário, perfil (status), sessão nova (SELECT + INSERT com savepoint), last_login e a
+        # troca da chave da sessão (UPDATE com savepoint)
+        with CaptureQueriesContext(connection) as contexto, self.assertNumQueries(10):
+            response = self.client.post(reverse('login'), {'username': 'perfil_login', 'password': 'password'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self._escritas_no_perfil(contexto.captured_queries), [])
+
+    def test_salvar_usuario_sem_alterar_o_perfil_nao_grava_o_perfil(self):
+        """Salvar o User com o perfil carregado e intacto não regrava o perfil."""
+        usuario = User.objects.select_related('servidorprofile').get(pk=self.servidor.pk)
+        usuario.first_name = 'Outro'
+        with CaptureQueriesContext(connection) as contexto:
+            usuario.save()
+        self.assertEqual(self._escritas_no_perfil(contexto.captured_queries), [])
+
+    def test_salvar_usuario_grava_so_os_campos_alterados_do_perfil(self):
+        """Alterar user.servidorprofile e salvar o User ainda grava o perfil, só com os campos alterados."""
+        usuario = User.objects.select_related('servidorprofile').get(pk=self.servidor.pk)
+        # Outra transação muda o limite depois que o perfil foi lido
+        ServidorProfile.objects.filter(user=usuario).update(limite_horas_anual=200)
+        usuario.servidorprofile.telefone = '(84) 99999-0000'
+        with CaptureQueriesContext(connection) as contexto:
+            usuario.save()
+        escritas = self._escritas_no_perfil(contexto.captured_queries)
+        self.assertEqual(len(escritas), 1)
+        self.assertNotIn('limite_horas_anual', escritas[0])
+
+        perfil = ServidorProfile.objects.get(user=usuario)
+        self.assertEqual(perfil.telefone, '(84) 99999-0000')
+        self.assertEqual(perfil.limite_horas_anual, 200)
+
+    def test_perfil_criado_uma_vez_e_dispensavel_em_cargas(self):
+        """O perfil nasce com o User (sem consulta extra para lê-lo) e pode ser dispensado com sem_perfil_automatico."""
+        usuario = User.objects.create_user(username='perfil_novo', password='password')
+        with self.assertNumQueries(0):
+            self.assertEqual(usuario.servidorprofile.status, 'Aguardando Homologação')
+        self.assertEqual(ServidorProfile.objects.filter(user=usuario).count(), 1)
+
+        with sem_perfil_automatico():
+            sem_perfil = User.objects.create_user(username='perfil_em_massa', password='password')
+        self.assertFalse(ServidorProfile.objects.filter(user=sem_perfil).exists())
+        # Fora do bloco o signal volta a criar os perfis
+        outro = User.objects.create_user(username='perfil_depois', password='password')
+        self.assertTrue(ServidorProfile.objects.filter(user=outro).exists())
+
+
+class ReservaSaldoConcorrenteTests(TransactionTestCase):
+
+    def setUp(self):
+        self.demandante = create_user_with_profile('demandante', 'password', 'Unidade Demandante')
+        self.servidores = [
+            create_user_with_profile(f'servidor{i}', 'password', 'Servidor') for i in range(4)
+        ]
+        tipo = TipoAtividade.objects.create(grupo='Banca', nome='Correção Concorrente', valor_hora=50.00)
+        edital = Edital.objects.create(
+            criado_por=self.demandante,
+            numero_edital='001/2025-CONC',
+            titulo='Edital Concorrido',
+            unidade_demandante_nome='PRODGEP',
+            data_inicio=timezone.now().date(),
+            data_fim=timezone.now().date(),
+            valor_empenho=1000.00
+        )
+        atividade = Atividade.objects.create(tipo=tipo, edital=edital, descricao='Correção')
+        self.atividade = Atividade.objects.select_related('tipo', 'edital').get(pk=atividade.pk)
+
+    def submeter(self, indice):
+        try:
+            registrar_lancamento(
+                servidor=self.servidores[indice % len(self.servidores)],
+                atividade=self.atividade,
+                data=timezone.now().date(),
+                horas=3,
+                descricao_justificativa='Submissão concorrente',
+            )
+            return True
+        except ValidationError:
+            return False
+        finally:
+            connection.close()
+
+    def test_submissoes_paralelas_nunca_ultrapassam_o_empenho(self):
+        """Dispara submissões em paralelo e verifica que o empenho nunca é ultrapassado."""
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            resultados = list(executor.map(self.submeter, range(24)))
+
+        # Cada lançamento custa R$ 150,00: só 6 cabem em R$ 1.000,00.
+        self.assertEqual(sum(resultados), 6)
+        self.assertEqual(LancamentoHoras.objects.filter(edital=self.atividade.edital).count(), 6)
+        saldo = SaldoEdital.objects.get(edital=self.atividade.edital)
+        self.assertEqual(saldo.valor_pendente, Decimal('900'))
+        call_command('rebuild_saldos', '--check', stdout=StringIO())
@@ -39,6 +39,11 @@ urlpatterns = [
         views.registrar_recusa_hora,
         name="registrar_recusa_hora",
     ),
+    path(
+        "horas/registrar-em-massa/",
+        views.registrar_validacao_em_massa,
+        name="registrar_validacao_em_massa",
+    ),
     path("servidor/lancar-horas/", views.lancar_horas, name="lancar_horas"),
     path(
         "servidor/meus-lancamentos/",
@@ -74,11 +79,21 @@ urlpatterns = [
         name="recusar_servidor",
     ),
     path('gestao/auditoria-horas/', views.auditoria_horas, name='auditoria_horas'),
+    path('gestao/auditoria-horas/edital/<int:edital_pk>/lancamentos/', views.auditoria_lancamentos_edital, name='auditoria_lancamentos_edital'),
     path('atividades/<int:pk>/', views.detalhes_atividade, name='detalhes_atividade'),
     path('gestao/auditoria-horas/exportar-pdf/', views.exportar_auditoria_pdf, name='exportar_auditoria_pdf'),
     path('gestao/editais/<int:edital_pk>/exportar-pdf/', views.exportar_edital_pdf, name='exportar_edital_pdf'),
+    path('gestao/auditoria-horas/exportar-csv/', views.exportar_auditoria_csv, name='exportar_auditoria_csv'),
+    path('gestao/auditoria-horas/exportar-xlsx/', views.exportar_auditoria_xlsx, name='exportar_auditoria_xlsx'),
+    path('gestao/auditoria-horas/solicitar-pdf/', views.solicitar_relatorio_auditoria, name='solicitar_relatorio_auditoria'),
+    path('gestao/editais/<int:edital_pk>/solicitar-pdf/', views.solicitar_relatorio_edital, name='solicitar_relatorio_edital'),
+    path('relatorios/<int:pk>/status/', views.status_relatorio, name='status_relatorio'),
+    path('relatorios/<int:pk>/download/', views.baixar_relatorio, name='baixar_relatorio'),
     path('meu-perfil/', views.meu_perfil, name='meu_perfil'),
     path('notificacoes/nao-lidas/', views.get_notificacoes_nao_lidas, name='get_notificacoes_nao_lidas'),
+    path('notificacoes/stream/', views.stream_notificacoes, name='stream_notificacoes'),
     path('notificacoes/marcar-como-lidas/', views.marcar_notificacoes_como_lidas, name='marcar_notificacoes_como_lidas'),
     path('gestao/servidores/adicionar/', views.adicionar_servidor, name='adicionar_servidor'),
+    path('gestao/servidores/importar/', views.importar_servidores, name='importar_servidores'),
+    path('gestao/desempenho/', views.estatisticas_desempenho, name='estatisticas_desempenho'),
 ]
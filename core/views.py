@@ -1,17 +1,35 @@
 # core/views.py
-from django.core.paginator import Paginator
-from django.http import HttpResponse, JsonResponse
-from django.template.loader import render_to_string
-from weasyprint import HTML
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.db.models import Prefetch
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.urls import reverse
-from .decorators import unidade_demandante_required, servidor_required, prodgep_required
-from .models import Edital, Atividade, LancamentoHoras, ServidorProfile, Notificacao
-from .forms import EditalForm, AtividadeForm, AlocarServidorForm, LancamentoHorasForm, AdicionarServidorForm
-from .templatetags.hour_filters import decimal_to_hhmm
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+from .catalogo import anexar_tipos
+from .decorators import obter_funcao, unidade_demandante_required, servidor_required, prodgep_required
+from .models import Edital, Atividade, LancamentoHoras, ServidorProfile, Notificacao, RelatorioJob
+from .forms import (
+    EditalForm, AtividadeForm, AlocarServidorForm, LancamentoHorasForm, AdicionarServidorForm, FiltroAuditoriaForm,
+    ImportarServidoresForm,
+)
+from .importacao import importar_servidores as importar_servidores_do_csv
+from .instrumentacao import estatisticas, orcamento_consultas
+from .exportacao import condicoes_auditoria, filtrar_lancamentos, gerar_csv, gerar_xlsx, linhas_auditoria
+from .paginacao import ordenacao_permitida, paginar_por_cursor
+from .lancamentos import registrar_lancamento, validar_em_massa
+from .notificacoes import eventos_do_usuario, notificar, registrar_lidas, resumo_nao_lidas
+from .resumos import indicadores_prodgep, indicadores_servidor, indicadores_unidade
+from .saldo import VALOR_LANCAMENTO
+from .relatorios import STATUS_AUDITAVEIS, arquivo_pdf_auditoria, arquivo_pdf_edital, caminho_do_job, solicitar_relatorio
 
 def index_view(request):
     # Se o usuário já estiver logado, redireciona para o painel.
@@ -23,17 +41,15 @@ def index_view(request):
 
 @login_required
 def painel(request):
-    try:
-        funcao_usuario = request.user.servidorprofile.funcao
-    except AttributeError:
-        return render(request, "painel_padrao.html")
+    funcao_usuario = obter_funcao(request)
 
+    # Os indicadores vêm das tabelas de resumo (core/resumos.py), sem agregar os lançamentos.
     if funcao_usuario == "Unidade Demandante":
-        return render(request, "painel_unidade_demandante.html")
+        return render(request, "painel_unidade_demandante.html", indicadores_unidade(request.user))
     elif funcao_usuario == "Servidor":
-        return render(request, "painel_servidor.html")
+        return render(request, "painel_servidor.html", indicadores_servidor(request.user))
     elif funcao_usuario == "PRODGEP/PROPEG":
-        return render(request, "painel_prodgep.html")
+        return render(request, "painel_prodgep.html", {'totais': indicadores_prodgep()})
     else:
         return render(request, "painel_padrao.html")
 
@@ -43,21 +59,11 @@ def listar_editais(request):
     lista_de_editais = Edital.objects.filter(criado_por=request.user)
 
     # --- LÓGICA DE ORDENAÇÃO ---
-    sort_param = request.GET.get('sort', '-created_at')
-
     allowed_sort_fields = ['numero_edital', 'titulo', 'created_at', 'status']
+    sort_param = ordenacao_permitida(request.GET.get('sort'), allowed_sort_fields, '-created_at')
 
-    sort_field = sort_param.lstrip('-') 
-
-    if sort_field in allowed_sort_fields:
-        lista_de_editais = lista_de_editais.order_by(sort_param)
-    else:
-        lista_de_editais = lista_de_editais.order_by('-created_at')
-
-    # --- LÓGICA DE PAGINAÇÃO (continua a mesma) ---
-    paginator = Paginator(lista_de_editais, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # --- LÓGICA DE PAGINAÇÃO (por cursor, sem OFFSET) ---
+    page_obj = paginar_por_cursor(lista_de_editais, sort_param, request.GET.get('cursor'), por_pagina=10)
 
     context = {
         'page_obj': page_obj,
@@ -68,7 +74,7 @@ def listar_editais(request):
 
 @login_required
 def criar_edital(request):
-    if request.user.servidorprofile.funcao != "Unidade Demandante":
+    if obter_funcao(request) != "Unidade Demandante":
         return redirect("painel")
 
     if request.method == "POST":
@@ -86,21 +92,54 @@ def criar_edital(request):
     return render(request, "criar_edital.html", context)
 
 
+def _atividades_com_totais(edital):
+    """
+    Atividades do edital com os totais de cada uma (servidores alocados, horas lançadas,
+    horas aprovadas e valor gasto) calculados numa única consulta. Os totais dos lançamentos
+    vêm de subconsultas correlacionadas, para não multiplicar as linhas pelo JOIN dos alocados.
+    Como no saldo do edital, só os recusados não contam como lançados nem consomem o empenho.
+    """
+    lancamentos = (
+        LancamentoHoras.objects.filter(atividade=OuterRef('pk'))
+        .order_by()
+        .values('atividade')
+    )
+
+    def total(filtro, valor):
+        return Coalesce(
+            Subquery(lancamentos.filter(filtro).annotate(total=Sum(valor)).values('total')),
+            Value(Decimal('0')),
+            output_field=DecimalField(max_digits=16, decimal_places=4),
+        )
+
+    validos = ~Q(status='Recusado')
+    return (
+        edital.atividades.select_related('tipo')
+        .annotate(
+            total_alocados=Count('servidores_alocados', distinct=True),
+            horas_lancadas=total(validos, 'horas'),
+            horas_aprovadas=total(Q(status__in=['Aprovado', 'Homologado']), 'horas'),
+            valor_gasto=total(validos & ~Q(status='Pendente'), VALOR_LANCAMENTO),
+        )
+        .order_by('tipo__valor_hora', 'pk')
+    )
+
+
 @login_required
 def detalhes_edital(request, pk):
     edital = get_object_or_404(Edital, pk=pk)
 
     is_owner = (edital.criado_por == request.user)
-    user_profile = request.user.servidorprofile
-    is_auditor = (user_profile.funcao == 'PRODGEP/PROPEG')
+    funcao = obter_funcao(request)
+    is_auditor = (funcao == 'PRODGEP/PROPEG')
 
     if not is_owner and not is_auditor:
-        if user_profile.funcao == 'Unidade Demandante':
+        if funcao == 'Unidade Demandante':
             messages.warning(request, 'Você não tem permissão para ver os detalhes deste edital.')
             return redirect('listar_editais')
         return redirect('painel')
 
-    atividades = edital.atividades.all().order_by('tipo__valor_hora')
+    atividades = _atividades_com_totais(edital)
     context = {'edital': edital, 'atividades': atividades}
     return render(request, 'detalhes_edital.html', context)
 
@@ -230,119 +269,181 @@ def enviar_homologacao(request, pk):
 
     return redirect("detalhes_edital", pk=edital.pk)
 
+
+@orcamento_consultas(10)
 @login_required
 @unidade_demandante_required
 def aprovar_horas(request):
     lancamentos_list = LancamentoHoras.objects.filter(
         edital__criado_por=request.user, 
         status='Pendente'
-    )
+    ).select_related('servidor', 'edital', 'atividade__tipo')
 
-    sort_param = request.GET.get('sort', '-data') 
     allowed_sort_fields = [
         'data', 'servidor__first_name', 'edital__numero_edital', 
         'atividade__tipo__nome', 'horas'
     ]
+    sort_param = ordenacao_permitida(request.GET.get('sort'), allowed_sort_fields, '-data')
 
-    allowed_sort_fields.extend(['-' + field for field in allowed_sort_fields])
-
-    if sort_param in allowed_sort_fields:
-        lancamentos_list = lancamentos_list.order_by(sort_param)
+    page_obj = paginar_por_cursor(lancamentos_list, sort_param, request.GET.get('cursor'), por_pagina=15)
 
-    paginator = Paginator(lancamentos_list, 15) 
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    editais_com_pendencias = Edital.objects.filter(
+        criado_por=request.user, lancamentos__status='Pendente'
+    ).distinct().order_by('numero_edital')
 
     context = {
         'page_obj': page_obj,
-        'current_sort': sort_param
+        'current_sort': sort_param,
+        'editais_com_pendencias': editais_com_pendencias,
     }
     return render(request, 'aprovar_horas.html', context)
 
 
-# VIEW PARA A AÇÃO DE APROVAR
-@login_required
-def registrar_aprovacao_hora(request, pk):
-    lancamento = get_object_or_404(LancamentoHoras, pk=pk)
-    
+def _validar_lancamento(request, pk, novo_status):
+    lancamento = get_object_or_404(LancamentoHoras.objects.select_related('edital'), pk=pk)
+
+    # Segurança
     if lancamento.edital.criado_por != request.user:
-        return redirect("listar_editais")
+        return None
 
     if request.method == "POST":
-        lancamento.status = "Aprovado"
-        lancamento.validado_por = request.user
-        lancamento.save()
-        messages.success(request, 'Lançamento de horas APROVADO.')
-
-        Notificacao.objects.create(
-            usuario=lancamento.servidor,
-            mensagem=f'Seu lançamento de {decimal_to_hhmm(lancamento.horas)} na atividade "{lancamento.atividade.tipo.nome}" foi APROVADO.',
-            link=reverse('historico_lancamentos')
+        # Pela mesma rotina da validação em massa: trava a linha e só valida se ainda estiver
+        # pendente, para que aprovar e recusar ao mesmo tempo (ou um clique duplo) não movam
+        # o saldo duas vezes.
+        resultados = validar_em_massa(
+            LancamentoHoras.objects.filter(pk=lancamento.pk),
+            novo_status,
+            validado_por=request.user,
+            comentario_recusa=request.POST.get("motivo_recusa", ""),
         )
+        if resultados.get(lancamento.pk) != novo_status:
+            messages.warning(request, 'Este lançamento não está mais pendente e não foi alterado.')
+        elif novo_status == 'Aprovado':
+            messages.success(request, 'Lançamento de horas APROVADO.')
+        else:
+            messages.error(request, 'Lançamento de horas RECUSADO.')
+    return lancamento
+
+
+# VIEW PARA A AÇÃO DE APROVAR
+@login_required
+def registrar_aprovacao_hora(request, pk):
+    if _validar_lancamento(request, pk, 'Aprovado') is None:
+        return redirect("listar_editais")
     return redirect("aprovar_horas")
 
 
 # VIEW PARA A AÇÃO DE RECUSAR
 @login_required
 def registrar_recusa_hora(request, pk):
-    lancamento = get_object_or_404(LancamentoHoras, pk=pk)
-
-    # Segurança
-    if lancamento.edital.criado_por != request.user:
+    if _validar_lancamento(request, pk, 'Recusado') is None:
         return redirect("listar_editais")
+    return redirect("aprovar_horas")
 
-    if request.method == "POST":
-        lancamento.status = "Recusado"
-        lancamento.validado_por = request.user
-        motivo = request.POST.get("motivo_recusa", "")
-        lancamento.comentario_recusa = motivo
-        lancamento.save()
-        messages.error(request, 'Lançamento de horas RECUSADO.')
-    
-        Notificacao.objects.create(
-            usuario=lancamento.servidor,
-            mensagem=f'Seu lançamento de {decimal_to_hhmm(lancamento.horas)} na atividade "{lancamento.atividade.tipo.nome}" foi RECUSADO.',
-            link=reverse('historico_lancamentos')
-        )
+
+# VIEW PARA APROVAR OU RECUSAR VÁRIOS LANÇAMENTOS DE UMA VEZ
+@login_required
+@unidade_demandante_required
+def registrar_validacao_em_massa(request):
+    if request.method != "POST":
+        return redirect("aprovar_horas")
+
+    quer_json = request.headers.get('Accept', '').startswith('application/json')
+    acoes = {'aprovar': 'Aprovado', 'recusar': 'Recusado'}
+    novo_status = acoes.get(request.POST.get('acao'))
+
+    lancamentos = LancamentoHoras.objects.filter(edital__criado_por=request.user)
+    ids = [int(pk) for pk in request.POST.getlist('ids') if pk.isdigit()]
+    edital_id = request.POST.get('edital', '')
+
+    if ids:
+        lancamentos = lancamentos.filter(pk__in=ids)
+    elif edital_id.isdigit():
+        lancamentos = lancamentos.filter(edital_id=edital_id)
+    else:
+        lancamentos = None
+
+    if novo_status is None or lancamentos is None:
+        erro = 'Selecione uma ação e ao menos um lançamento ou edital.'
+        if quer_json:
+            return JsonResponse({'status': 'error', 'mensagem': erro}, status=400)
+        messages.warning(request, erro)
+        return redirect("aprovar_horas")
+
+    resultados = validar_em_massa(
+        lancamentos,
+        novo_status,
+        validado_por=request.user,
+        comentario_recusa=request.POST.get("motivo_recusa", ""),
+        ids_solicitados=ids,
+    )
+    processados = sum(1 for resultado in resultados.values() if resultado == novo_status)
+
+    if quer_json:
+        return JsonResponse({
+            'status': 'ok',
+            'processados': processados,
+            'resultados': {str(pk): resultado for pk, resultado in resultados.items()},
+        })
+
+    if novo_status == 'Aprovado':
+        messages.success(request, f'{processados} lançamento(s) de horas APROVADO(S).')
+    else:
+        messages.error(request, f'{processados} lançamento(s) de horas RECUSADO(S).')
+    ignorados = len(resultados) - processados
+    if ignorados:
+        messages.warning(request, f'{ignorados} lançamento(s) ignorado(s) por não estarem mais pendentes.')
     return redirect("aprovar_horas")
 
 
+@orcamento_consultas(30)
 @login_required
 @servidor_required
 def lancar_horas(request):
-    atividades_alocadas = Atividade.objects.filter(servidores_alocados=request.user)
-    form_anexado = False
+    # Uma única consulta traz atividades, edital e o saldo corrente de cada edital
+    atividades_alocadas = list(
+        Atividade.objects.filter(servidores_alocados=request.user)
+        .select_related('edital__saldo')
+        .annotate(saldo_restante=F('edital__valor_empenho') - Coalesce(
+            F('edital__saldo__valor_comprometido') + F('edital__saldo__valor_pendente'), Value(Decimal('0'))
+        ))
+    )
+    # Tipo (nome e valor da hora) vem do catálogo em memória, sem join
+    anexar_tipos(atividades_alocadas)
+    for atividade in atividades_alocadas:
+        atividade.form = LancamentoHorasForm(atividade=atividade)
 
     if request.method == 'POST':
         atividade_id = request.POST.get('atividade_id')
-        atividade_submetida = get_object_or_404(Atividade, pk=atividade_id)
+        atividade_submetida = next((a for a in atividades_alocadas if str(a.pk) == atividade_id), None)
+        if atividade_submetida is None:
+            atividade_submetida = get_object_or_404(Atividade.objects.select_related('edital'), pk=atividade_id)
         
         form_post = LancamentoHorasForm(request.POST, atividade=atividade_submetida)
 
         if form_post.is_valid():
-            # Criamos o objeto manualmente com todos os dados validados
-            LancamentoHoras.objects.create(
-                servidor=request.user,
-                atividade=atividade_submetida,
-                edital=atividade_submetida.edital,
-                data=form_post.cleaned_data['data'],
-                descricao_justificativa=form_post.cleaned_data['descricao_justificativa'],
-                horas=form_post.cleaned_data['horas'] # Pega o valor decimal do form
-            )
-            messages.success(request, f'Horas para "{atividade_submetida.tipo.nome}" lançadas com sucesso!')
-            return redirect('lancar_horas')
-        else:
-            # Se o formulário for inválido, o anexamos à atividade correta
-            form_anexado = True
+            # Criamos o objeto com todos os dados validados, reservando o valor no saldo do edital
+            try:
+                registrar_lancamento(
+                    servidor=request.user,
+                    atividade=atividade_submetida,
+                    data=form_post.cleaned_data['data'],
+                    descricao_justificativa=form_post.cleaned_data['descricao_justificativa'],
+                    horas=form_post.cleaned_data['horas'] # Pega o valor decimal do form
+                )
+            except ValidationError as erro:
+                # Outra submissão consumiu o saldo entre a validação e a reserva
+                form_post.add_error('horas', erro)
+            else:
+                messages.success(request, f'Horas para "{atividade_submetida.tipo.nome}" lançadas com sucesso!')
+                return redirect('lancar_horas')
+
+        if form_post.errors:
+            # Se o formulário for inválido, ele substitui o formulário vazio da atividade correta
             for atividade in atividades_alocadas:
                 if atividade.pk == atividade_submetida.pk:
                     atividade.form = form_post
 
-    # Se a requisição for GET ou o formulário inválido não foi anexado ainda
-    if not form_anexado:
-        for atividade in atividades_alocadas:
-            atividade.form = LancamentoHorasForm(atividade=atividade)
-
     context = {
         'atividades_alocadas': atividades_alocadas,
     }
@@ -353,21 +454,16 @@ def lancar_horas(request):
 @servidor_required
 def historico_lancamentos(request):
     # Busca a lista base de lançamentos do usuário
-    lancamentos_list = LancamentoHoras.objects.filter(servidor=request.user)
+    lancamentos_list = LancamentoHoras.objects.filter(servidor=request.user).select_related('edital', 'atividade__tipo')
 
     # Lógica de Ordenação
-    sort_param = request.GET.get('sort', '-data')
     allowed_sort_fields = [
         'data', 'edital__numero_edital', 'atividade__tipo__nome', 'horas', 'status'
     ]
-    sort_field_clean = sort_param.lstrip('-')
-    if sort_field_clean in allowed_sort_fields:
-        lancamentos_list = lancamentos_list.order_by(sort_param)
+    sort_param = ordenacao_permitida(request.GET.get('sort'), allowed_sort_fields, '-data')
 
-    # Lógica de Paginação
-    paginator = Paginator(lancamentos_list, 15) 
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Lógica de Paginação (por cursor, sem OFFSET)
+    page_obj = paginar_por_cursor(lancamentos_list, sort_param, request.GET.get('cursor'), por_pagina=15)
 
     context = {
         'page_obj': page_obj,
@@ -379,22 +475,14 @@ def historico_lancamentos(request):
 @login_required
 @prodgep_required
 def homologar_editais(request):
-    editais_list = Edital.objects.filter(status='Aguardando Homologação')
+    editais_list = Edital.objects.filter(status='Aguardando Homologação').select_related('criado_por')
 
     # Lógica de Ordenação
-    sort_param = request.GET.get('sort', 'data_inicio')
     allowed_sort_fields = ['numero_edital', 'titulo', 'unidade_demandante_nome', 'criado_por__first_name']
+    sort_param = ordenacao_permitida(request.GET.get('sort'), allowed_sort_fields, '-data_inicio')
 
-    # Adiciona a versão descendente dos campos
-    allowed_sort_fields.extend(['-' + field for field in allowed_sort_fields])
-
-    if sort_param in allowed_sort_fields:
-        editais_list = editais_list.order_by(sort_param)
-
-    # Lógica de Paginação
-    paginator = Paginator(editais_list, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Lógica de Paginação (por cursor, sem OFFSET)
+    page_obj = paginar_por_cursor(editais_list, sort_param, request.GET.get('cursor'), por_pagina=10)
 
     context = {
         'page_obj': page_obj,
@@ -414,9 +502,9 @@ def registrar_homologacao_edital(request, pk):
         edital.save()
         messages.success(request, 'Edital HOMOLOGADO com sucesso.')
 
-        Notificacao.objects.create(
-            usuario=edital.criado_por,
-            mensagem=f'O edital "{edital.numero_edital}" foi homologado.',
+        notificar(
+            edital.criado_por_id,
+            f'O edital "{edital.numero_edital}" foi homologado.',
             link=reverse('detalhes_edital', args=[edital.pk])
         )
 
@@ -440,9 +528,9 @@ def registrar_recusa_edital(request, pk):
         
         messages.error(request, f'O edital "{edital.numero_edital}" foi recusado.')
 
-        Notificacao.objects.create(
-            usuario=edital.criado_por, # A notificação é para quem criou o edital
-            mensagem=f'O edital "{edital.numero_edital}" foi recusado.',
+        notificar(
+            edital.criado_por_id,  # A notificação é para quem criou o edital
+            f'O edital "{edital.numero_edital}" foi recusado.',
             link=reverse('detalhes_edital', args=[edital.pk])
         )
     
@@ -452,7 +540,7 @@ def registrar_recusa_edital(request, pk):
 @login_required
 def homologar_servidores(request):
 
-    if request.user.servidorprofile.funcao != "PRODGEP/PROPEG":
+    if obter_funcao(request) != "PRODGEP/PROPEG":
         return redirect("painel")
 
     servidores_pendentes = ServidorProfile.objects.filter(
@@ -465,7 +553,7 @@ def homologar_servidores(request):
 
 @login_required
 def aprovar_servidor(request, pk):
-    if request.user.servidorprofile.funcao != "PRODGEP/PROPEG":
+    if obter_funcao(request) != "PRODGEP/PROPEG":
         return redirect("painel")
 
     perfil_servidor = get_object_or_404(ServidorProfile, pk=pk)
@@ -480,7 +568,7 @@ def aprovar_servidor(request, pk):
 # VIEW PARA A AÇÃO DE RECUSAR O SERVIDOR
 @login_required
 def recusar_servidor(request, pk):
-    if request.user.servidorprofile.funcao != "PRODGEP/PROPEG":
+    if obter_funcao(request) != "PRODGEP/PROPEG":
         return redirect("painel")
 
     perfil_servidor = get_object_or_404(ServidorProfile, pk=pk)
@@ -494,24 +582,71 @@ def recusar_servidor(request, pk):
 @login_required
 @prodgep_required
 def auditoria_horas(request):
-    status_auditaveis = ['Aprovado', 'Recusado', 'Homologado', 'Revertido']
-
-    lancamentos_para_prefetch = LancamentoHoras.objects.filter(
-        status__in=status_auditaveis
-    ).select_related('servidor', 'atividade__tipo', 'validado_por')
+    # Uma linha agregada por edital (um único GROUP BY); os lançamentos de cada edital
+    # são carregados sob demanda por auditoria_lancamentos_edital.
+    filtros = _filtros_da_auditoria(request)
+
+    condicao = condicoes_auditoria('lancamentos__', **filtros)
+    totais = {}
+    for status in STATUS_AUDITAVEIS:
+        do_status = Q(lancamentos__status=status)
+        chave = status.lower()
+        totais[f'total_{chave}'] = Count('lancamentos', filter=do_status)
+        totais[f'horas_{chave}'] = Sum('lancamentos__horas', filter=do_status)
+    valor = ExpressionWrapper(
+        F('lancamentos__horas') * F('lancamentos__atividade__tipo__valor_hora'),
+        output_field=DecimalField(max_digits=16, decimal_places=4),
+    )
+    # O filtro vem antes das agregações, então elas só somam os lançamentos filtrados.
+    editais_para_auditoria = Edital.objects.filter(condicao).select_related('criado_por').annotate(
+        valor_total=Sum(valor, filter=~Q(lancamentos__status='Recusado')),
+        **totais,
+    )
 
-    editais_para_auditoria = Edital.objects.prefetch_related(
-        Prefetch('lancamentos', queryset=lancamentos_para_prefetch, to_attr='lancamentos_auditaveis'),
-        'atividades__tipo'
-    ).filter(
-        lancamentos__status__in=status_auditaveis
-    ).distinct().order_by('-data_inicio')
+    sort_param = '-data_inicio'
+    page_obj = paginar_por_cursor(editais_para_auditoria, sort_param, request.GET.get('cursor'), por_pagina=10)
 
+    parametros = request.GET.copy()
+    for chave in ('cursor', 'sort'):
+        parametros.pop(chave, None)
     context = {
-        'editais': editais_para_auditoria
+        'page_obj': page_obj,
+        'current_sort': sort_param,
+        'filtro_form': FiltroAuditoriaForm(request.GET or None),
+        'filtros_query': parametros.urlencode(),
     }
     return render(request, 'auditoria_horas.html', context)
 
+
+def _filtros_da_auditoria(request):
+    """Filtros válidos do GET (FiltroAuditoriaForm); filtros inválidos são avisados e ignorados."""
+    form = FiltroAuditoriaForm(request.GET)
+    if form.is_valid():
+        return form.cleaned_data
+    for erros in form.errors.values():
+        for erro in erros:
+            messages.error(request, erro)
+    return {}
+
+
+@login_required
+@prodgep_required
+def auditoria_lancamentos_edital(request, edital_pk):
+    """Fragmento HTML com uma página dos lançamentos auditáveis de um edital, pedido pela auditoria_horas."""
+    edital = get_object_or_404(Edital, pk=edital_pk)
+    filtros = {**_filtros_da_auditoria(request), 'edital': edital}
+
+    lancamentos = filtrar_lancamentos(**filtros).select_related('servidor', 'atividade__tipo', 'validado_por')
+    page_obj = paginar_por_cursor(lancamentos, '-data', request.GET.get('cursor'), por_pagina=25, limite_contagem=0)
+
+    parametros = request.GET.copy()
+    parametros['cursor'] = page_obj.next_cursor or ''
+    context = {
+        'page_obj': page_obj,
+        'proxima_url': f"{request.path}?{parametros.urlencode()}" if page_obj.has_next else None,
+    }
+    return render(request, 'auditoria_lancamentos.html', context)
+
 @login_required
 def detalhes_atividade(request, pk):
     atividade = get_object_or_404(Atividade, pk=pk)
@@ -524,77 +659,147 @@ def detalhes_atividade(request, pk):
 @login_required
 @prodgep_required
 def exportar_auditoria_pdf(request):
-    status_auditaveis = ['Aprovado', 'Recusado', 'Homologado', 'Revertido']
-    lancamentos = LancamentoHoras.objects.filter(
-        status__in=status_auditaveis
-    ).select_related('servidor', 'edital', 'atividade__tipo', 'validado_por').order_by('-data')
+    # Geração síncrona; para relatórios grandes prefira solicitar_relatorio_auditoria (fila em segundo plano).
+    # Se nenhum lançamento mudou desde a última exportação, o PDF sai direto do cache em disco.
+    arquivo = arquivo_pdf_auditoria()
 
-    context = {
-        'lancamentos': lancamentos
-    }
+    return FileResponse(
+        arquivo, as_attachment=True, filename="relatorio_auditoria_horas.pdf", content_type='application/pdf'
+    )
+
+@login_required
+@prodgep_required
+def exportar_edital_pdf(request, edital_pk):
+    edital = get_object_or_404(Edital, pk=edital_pk)
 
-    # 1. Renderiza o template HTML em uma string
-    html_string = render_to_string('relatorios/auditoria_pdf.html', context)
+    arquivo = arquivo_pdf_edital(edital)
+
+    return FileResponse(
+        arquivo,
+        as_attachment=True,
+        filename=f'relatorio_edital_{edital.numero_edital.replace("/", "-")}.pdf',
+        content_type='application/pdf',
+    )
 
-    # 2. Converte a string HTML em um objeto WeasyPrint
-    html = HTML(string=html_string)
+# --- EXPORTAÇÃO DOS DADOS DA AUDITORIA (CSV/XLSX, gerados em streaming) ---
 
-    # 3. Gera o PDF em memória
-    pdf = html.write_pdf()
 
-    # 4. Cria uma resposta HTTP com o PDF
-    response = HttpResponse(pdf, content_type='application/pdf')
-    response['Content-Disposition'] = 'attachment; filename="relatorio_auditoria_horas.pdf"'
+def _exportar_auditoria(request, gerar, extensao, content_type):
+    form = FiltroAuditoriaForm(request.GET)
+    if not form.is_valid():
+        for erros in form.errors.values():
+            for erro in erros:
+                messages.error(request, erro)
+        return redirect('auditoria_horas')
 
+    lancamentos = filtrar_lancamentos(**form.cleaned_data)
+    response = StreamingHttpResponse(gerar(linhas_auditoria(lancamentos)), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="auditoria_horas.{extensao}"'
     return response
 
+
 @login_required
 @prodgep_required
-def exportar_edital_pdf(request, edital_pk):
-    edital = get_object_or_404(Edital, pk=edital_pk)
+def exportar_auditoria_csv(request):
+    return _exportar_auditoria(request, gerar_csv, 'csv', 'text/csv; charset=utf-8')
 
-    status_auditaveis = ['Aprovado', 'Recusado', 'Homologado', 'Revertido']
-    lancamentos = LancamentoHoras.objects.filter(
-        edital=edital,
-        status__in=status_auditaveis
-    ).select_related('servidor', 'atividade__tipo', 'validado_por').order_by('servidor__first_name', 'data')
 
-    context = {
-        'lancamentos': lancamentos,
-        'edital': edital
-    }
+@login_required
+@prodgep_required
+def exportar_auditoria_xlsx(request):
+    return _exportar_auditoria(
+        request, gerar_xlsx, 'xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    )
 
-    html_string = render_to_string('relatorios/edital_pdf.html', context)
-    html = HTML(string=html_string)
-    pdf = html.write_pdf()
+# --- RELATÓRIOS GERADOS EM SEGUNDO PLANO (ver comando process_report_jobs) ---
 
-    response = HttpResponse(pdf, content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="relatorio_edital_{edital.numero_edital.replace("/", "-")}.pdf"'
 
-    return response
+def _resposta_de_job_solicitado(request, job):
+    if request.headers.get('Accept', '').startswith('application/json'):
+        return JsonResponse({
+            'id': job.pk,
+            'status': job.status,
+            'status_url': reverse('status_relatorio', args=[job.pk]),
+        }, status=202)
+    messages.info(request, 'Relatório solicitado. Você será notificado pelo sino quando ele estiver pronto.')
+    return redirect('auditoria_horas')
+
+
+@login_required
+@prodgep_required
+def solicitar_relatorio_auditoria(request):
+    if request.method != 'POST':
+        return redirect('auditoria_horas')
+    job = solicitar_relatorio(request.user, 'auditoria')
+    return _resposta_de_job_solicitado(request, job)
+
+
+@login_required
+@prodgep_required
+def solicitar_relatorio_edital(request, edital_pk):
+    edital = get_object_or_404(Edital, pk=edital_pk)
+    if request.method != 'POST':
+        return redirect('auditoria_horas')
+    job = solicitar_relatorio(request.user, 'edital', edital=edital)
+    return _resposta_de_job_solicitado(request, job)
+
+
+@login_required
+def status_relatorio(request, pk):
+    job = get_object_or_404(RelatorioJob, pk=pk, solicitado_por=request.user)
+    return JsonResponse({
+        'id': job.pk,
+        'status': job.status,
+        'download_url': reverse('baixar_relatorio', args=[job.pk]) if job.status == 'Concluído' else None,
+    })
+
+
+@login_required
+def baixar_relatorio(request, pk):
+    job = get_object_or_404(RelatorioJob, pk=pk, solicitado_por=request.user, status='Concluído')
+    caminho = caminho_do_job(job)
+    if not caminho.exists():
+        raise Http404('O arquivo deste relatório não está mais disponível.')
+    return FileResponse(open(caminho, 'rb'), as_attachment=True, filename=job.nome_arquivo, content_type='application/pdf')
 
 @login_required
 def meu_perfil(request):
     return render(request, 'meu_perfil.html')
 
+
+def _etag_notificacoes(request):
+    return resumo_nao_lidas(request.user.pk)['versao']
+
+
 @login_required
+@condition(etag_func=_etag_notificacoes)
 def get_notificacoes_nao_lidas(request):
-    notificacoes = Notificacao.objects.filter(usuario=request.user, lida=False)
-    count = notificacoes.count()    
+    # Com If-None-Match igual à versão em cache, o decorator já respondeu 304 sem consultar o banco
+    resumo = resumo_nao_lidas(request.user.pk)
+    response = JsonResponse({'count': resumo['count'], 'notificacoes': resumo['notificacoes']})
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
-    # Constrói uma lista de dicionários com os dados das notificações 
-    notificacoes_data = [{
-        'id': n.id,
-        'mensagem': n.mensagem,
-        'link': n.link
-    } for n in notificacoes]
 
-    return JsonResponse({'count': count, 'notificacoes': notificacoes_data})
+@login_required
+async def stream_notificacoes(request):
+    # Sem ASGI não há como manter a conexão aberta sem prender um worker. O base.html só
+    # abre o stream sob ASGI (core.context_processors.notificacoes); o 204 cobre quem
+    # chamar a URL mesmo assim e faz o EventSource desistir.
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+
+    usuario = await request.auser()
+    response = StreamingHttpResponse(eventos_do_usuario(usuario.pk), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx: não segurar os eventos em buffer
+    return response
 
 @login_required
 def marcar_notificacoes_como_lidas(request):
     if request.method == 'POST':
         Notificacao.objects.filter(usuario=request.user, lida=False).update(lida=True)
+        registrar_lidas(request.user.pk)
         return JsonResponse({'status': 'ok'})
     return JsonResponse({'status': 'error'}, status=400)
 
@@ -611,4 +816,39 @@ def adicionar_servidor(request):
         form = AdicionarServidorForm()
 
     context = {'form': form}
-    return render(request, 'adicionar_servidor.html', context)
\ No newline at end of file
+    return render(request, 'adicionar_servidor.html', context)
+
+
+@login_required
+@unidade_demandante_required
+def importar_servidores(request):
+    resultado = None
+    if request.method == 'POST':
+        form = ImportarServidoresForm(request.POST, request.FILES)
+        if form.is_valid():
+            try:
+                resultado = importar_servidores_do_csv(
+                    form.cleaned_data['arquivo'].read(),
+                    somente_validar=form.cleaned_data['somente_validar'],
+                    max_linhas=settings.IMPORTACAO_MAX_LINHAS_WEB,
+                )
+            except ValidationError as erro:
+                form.add_error('arquivo', erro)
+            else:
+                if form.cleaned_data['somente_validar']:
+                    messages.info(request, f'{resultado.criados} de {resultado.total} servidor(es) prontos para importar.')
+                elif resultado.criados:
+                    messages.success(request, f'{resultado.criados} servidor(es) importado(s) com sucesso!')
+                if not resultado.erros and not form.cleaned_data['somente_validar']:
+                    return redirect('painel')
+    else:
+        form = ImportarServidoresForm()
+
+    context = {'form': form, 'resultado': resultado}
+    return render(request, 'importar_servidores.html', context)
+
+
+@staff_member_required
+def estatisticas_desempenho(request):
+    # Percentis de tempo, consultas e tamanho por rota, medidos pelo instrumentacao_middleware neste processo
+    return JsonResponse({'rotas': estatisticas()})
@@ -13,4 +13,6 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "geccsystem.settings")
 
+# Sob ASGI, core.views.stream_notificacoes mantém conexões SSE abertas sem ocupar
+# um worker por cliente; o pub/sub usado está em settings.NOTIFICACOES_PUBSUB.
 application = get_asgi_application()
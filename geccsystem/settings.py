@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 import dj_database_url
 from pathlib import Path
 import os
+import sys
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -51,12 +52,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.middleware.instrumentacao_middleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "core.middleware.perfilador_middleware",
     "django.contrib.messages.middleware.MessageMiddleware",
+    "core.middleware.notificacoes_middleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
@@ -72,6 +76,7 @@ TEMPLATES = [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
+                "core.context_processors.notificacoes",
             ],
         },
     },
@@ -98,6 +103,36 @@ else:
     }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+if 'REDIS_URL' in os.environ:
+    # Compartilhado entre os processos (requer o pacote redis)
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    # Em memória, um por processo
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# O LocMemCache é de cada processo: o que um worker grava ou invalida nele não chega aos outros.
+CACHE_COMPARTILHADO = not CACHES['default']['BACKEND'].endswith('LocMemCache')
+
+# Versão do catálogo de tipos de atividade (core/catalogo.py). Com cache compartilhado (REDIS_URL) ela fica
+# no cache. Sem ele, a troca de versão não chegaria aos outros workers: a versão passa para uma linha do
+# banco (VersaoCatalogo), lida por cada processo no máximo a cada CATALOGO_VERIFICAR_SEGUNDOS, que é o
+# atraso máximo para uma alteração no admin valer em todos os workers.
+CATALOGO_VERSAO_NO_BANCO = os.environ.get('CATALOGO_VERSAO_NO_BANCO', str(not CACHE_COMPARTILHADO)) == 'True'
+CATALOGO_VERIFICAR_SEGUNDOS = float(os.environ.get('CATALOGO_VERIFICAR_SEGUNDOS', 5))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -145,6 +180,76 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# Diretório onde o worker da fila de relatórios (process_report_jobs) grava os PDFs gerados
+RELATORIOS_DIR = os.environ.get('RELATORIOS_DIR', BASE_DIR / 'relatorios_gerados')
+
+# Segundos sem concluir após os quais um job "Processando" é considerado abandonado (worker
+# interrompido) e volta para a fila. Deve ser maior que o tempo do relatório mais demorado.
+RELATORIOS_JOB_TIMEOUT = int(os.environ.get('RELATORIOS_JOB_TIMEOUT', 30 * 60))
+
+# Dias que um relatório gerado (job e PDF em RELATORIOS_DIR) fica disponível para download; o worker
+# remove os mais antigos a cada RELATORIOS_LIMPEZA_INTERVALO segundos (ou o comando prune_report_jobs).
+RELATORIOS_RETENCAO_DIAS = int(os.environ.get('RELATORIOS_RETENCAO_DIAS', 7))
+RELATORIOS_LIMPEZA_INTERVALO = int(os.environ.get('RELATORIOS_LIMPEZA_INTERVALO', 60 * 60))
+
+# Linhas por documento WeasyPrint no relatório de auditoria (0 gera tudo de uma vez); limita o pico de memória
+RELATORIOS_LINHAS_POR_BLOCO = int(os.environ.get('RELATORIOS_LINHAS_POR_BLOCO', 500))
+
+# Linhas lidas do banco por vez nas exportações CSV/XLSX da auditoria
+EXPORTACAO_LINHAS_POR_BLOCO = int(os.environ.get('EXPORTACAO_LINHAS_POR_BLOCO', 2000))
+
+# Tamanho máximo do cache de PDFs (RELATORIOS_DIR/cache); os menos usados recentemente são descartados
+RELATORIOS_CACHE_MAX_BYTES = int(os.environ.get('RELATORIOS_CACHE_MAX_BYTES', 200 * 1024 * 1024))
+
+# Pub/sub usado para empurrar notificações por SSE (core/pubsub.py). PubSubLocal só entrega
+# dentro do mesmo processo; com vários processos ASGI, aponte para uma implementação com broker.
+NOTIFICACOES_PUBSUB = os.environ.get('NOTIFICACOES_PUBSUB', 'core.pubsub.PubSubLocal')
+# Intervalo (s) dos comentários de keep-alive do stream e tempo (ms) para o navegador reconectar
+NOTIFICACOES_SSE_KEEPALIVE = int(os.environ.get('NOTIFICACOES_SSE_KEEPALIVE', 25))
+NOTIFICACOES_SSE_RETRY_MS = int(os.environ.get('NOTIFICACOES_SSE_RETRY_MS', 10000))
+
+# Resumo do sino (total de não lidas + últimas N) guardado no cache por usuário (core/notificacoes.py).
+# Sem cache compartilhado, a geração que invalida o resumo fica no banco (GeracaoNotificacoes), para que uma
+# notificação criada em um worker apareça no sino servido pelos outros; cada consulta ao sino lê essa linha.
+NOTIFICACOES_GERACAO_NO_BANCO = os.environ.get('NOTIFICACOES_GERACAO_NO_BANCO', str(not CACHE_COMPARTILHADO)) == 'True'
+NOTIFICACOES_CACHE_TIMEOUT = int(os.environ.get('NOTIFICACOES_CACHE_TIMEOUT', 300))
+NOTIFICACOES_LISTA_MAX = int(os.environ.get('NOTIFICACOES_LISTA_MAX', 10))
+
+# As listagens contam os registros só até este limite ("Mais de N registros"); 0 desliga a contagem
+PAGINACAO_LIMITE_CONTAGEM = int(os.environ.get('PAGINACAO_LIMITE_CONTAGEM', 1000))
+
+# Tempo (s) que o usuário da sessão (com perfil e unidade) fica em cache entre requisições; 0 desliga.
+# Salvar User, ServidorProfile ou Unidade invalida o cache, mas alterações que não passam por save()
+# (QuerySet.update, SQL direto) só aparecem depois que ele expira, então mantenha o valor curto.
+AUTH_USUARIO_CACHE_TIMEOUT = int(os.environ.get('AUTH_USUARIO_CACHE_TIMEOUT', 0))
+
+# Instrumentação das requisições (core/instrumentacao.py): tempo, consultas e tamanho por rota,
+# guardados em memória (últimas N por rota) e expostos em gestao/desempenho/ para a equipe (is_staff).
+INSTRUMENTACAO_ATIVA = os.environ.get('INSTRUMENTACAO_ATIVA', 'True') == 'True'
+INSTRUMENTACAO_AMOSTRAS_POR_VIEW = int(os.environ.get('INSTRUMENTACAO_AMOSTRAS_POR_VIEW', 500))
+# Requisições acima deste tempo (ms) geram uma linha de log em JSON
+INSTRUMENTACAO_LENTA_MS = int(os.environ.get('INSTRUMENTACAO_LENTA_MS', 1000))
+# Orçamento de consultas estourado (@orcamento_consultas): erro quando ligado, só aviso no log quando não.
+# Ligado por padrão ao rodar os testes, para que uma consulta a mais quebre a suíte.
+INSTRUMENTACAO_ORCAMENTO_ESTRITO = os.environ.get(
+    'INSTRUMENTACAO_ORCAMENTO_ESTRITO', str(sys.argv[1:2] == ['test'])
+) == 'True'
+
+# Perfilador por amostragem (core/perfilador.py). Perfila a fração PERFILADOR_TAXA (0 a 1) das requisições
+# às rotas de PERFILADOR_ROTAS (vazio = todas), além das que a equipe pedir com o cabeçalho "X-Perfilar: 1".
+# Os perfis vão para PERFILADOR_DIR (os mais antigos além de PERFILADOR_MAX_ARQUIVOS são apagados);
+# junte-os com o comando collapse_perfis para gerar o flamegraph.
+PERFILADOR_TAXA = float(os.environ.get('PERFILADOR_TAXA', 0))
+PERFILADOR_ROTAS = [rota for rota in os.environ.get('PERFILADOR_ROTAS', '').split(',') if rota]
+PERFILADOR_INTERVALO_MS = int(os.environ.get('PERFILADOR_INTERVALO_MS', 5))
+PERFILADOR_DIR = os.environ.get('PERFILADOR_DIR', BASE_DIR / 'perfis')
+PERFILADOR_MAX_ARQUIVOS = int(os.environ.get('PERFILADOR_MAX_ARQUIVOS', 200))
+
+# Importação de servidores por CSV (core/importacao.py): processos usados para criptografar as senhas
+# e limite de linhas aceito pela tela (arquivos maiores vão pelo comando import_servidores).
+IMPORTACAO_PROCESSOS = int(os.environ.get('IMPORTACAO_PROCESSOS', os.cpu_count() or 1))
+IMPORTACAO_MAX_LINHAS_WEB = int(os.environ.get('IMPORTACAO_MAX_LINHAS_WEB', 500))
+
 LOGIN_REDIRECT_URL = "painel"
 
 LOGOUT_REDIRECT_URL = "login"